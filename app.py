@@ -1,78 +1,95 @@
 import streamlit as st
 import pandas as pd
 import database
-import crawler
-import llm_processor
+import dashboard_data
+import exporter
 
 # --- CONFIG & INIT ---
 st.set_page_config(page_title="VPTI Regulatory Watch", layout="wide")
-database.init_db()
+
+@st.cache_resource
+def init_database():
+    # Schema checks once per server process, not on every rerun
+    database.init_db()
+
+init_database()
 
 # --- SIDEBAR ---
 with st.sidebar:
     st.title("⚙️ Controls")
     
+    # Scans run in the background worker (worker.py); the dashboard only queues them
     if st.button("🔄 Check New Regulation", type="primary"):
-        status = st.empty()
-        
-        with st.spinner("Initializing Scan..."):
-            last_db_date = database.get_latest_date()
-            if not last_db_date: last_db_date = "1900-01-01"
-            
-            status.info(f"Scanning for regulations newer than: **{last_db_date}**")
-            
-            # 1. SCAN INDEX (Find links)
-            new_items = []
-            stop = False
-            
-            # Scan pages 1 to 5 (adjust as needed)
-            for page in range(1, 6):
-                if stop: break
-                
-                page_links = crawler.fetch_links_from_page(page)
-                if not page_links: break
-                
-                for item in page_links:
-                    if item['date'] <= last_db_date:
-                        stop = True
-                        break
-                    new_items.append(item)
-            
-            # 2. DEEP PROCESS (Download PDF & Analyze)
-            if new_items:
-                status.info(f"Found {len(new_items)} new items. Starting Deep Analysis...")
-                progress = st.progress(0)
-                
-                for i, item in enumerate(new_items):
-                    # A. Get PDF Text
-                    pdf_text = crawler.extract_text_from_pdf(item['link'])
-                    
-                    # B. LLM Analyze
-                    analysis = llm_processor.analyze_regulation(pdf_text if pdf_text else item['original_title'])
-                    
-                    # C. Merge & Save
-                    full_record = {**item, **analysis} # Merge dicts
-                    database.save_regulation(full_record)
-                    
-                    progress.progress((i + 1) / len(new_items))
-                
-                status.success("✅ Database Updated!")
+        st.session_state.scan_job = database.enqueue_scan_job("dashboard")
+
+    @st.fragment(run_every=2)
+    def scan_status():
+        job = database.get_latest_job()
+        if not job:
+            return
+        if job["status"] == "queued":
+            st.info(job["message"])
+        elif job["status"] == "running":
+            st.info(job["message"])
+            if job["total"]:
+                st.progress(job["done"] / job["total"])
+        else:
+            finished = st.session_state.get("scan_job") == job["id"]
+            (st.success if job["status"] == "done" else st.error)(job["message"])
+            st.caption(f"Last scan finished {job['finished_at']}")
+            waiting = database.count_dead_letters()
+            if waiting:
+                st.caption(f"📮 {waiting} documents failed to download and will be retried by the next scan")
+            if finished:
+                # Our scan just landed: refresh the table once
+                del st.session_state["scan_job"]
                 st.rerun()
-            else:
-                status.success("✅ System is up to date.")
+
+    scan_status()
 
 # --- MAIN DASHBOARD ---
 st.title("🚢 VPTI Regulatory Watch")
 st.markdown("Automated compliance monitoring for **Trade Regulations**.")
 
-df = database.get_all_regulations()
+# Full-text search over titles, summaries and the extracted PDF text
+search = st.text_input("🔍 Search regulations", placeholder='e.g. HS 1511 or "palm olein"')
+if search:
+    results = database.search_regulations(search)
+    st.caption(f"{len(results)} matching regulations")
+    for _, hit in results.iterrows():
+        st.markdown(
+            f"**[{hit['english_title'] or hit['original_title']}]({hit['raw_link']})** "
+            f"· {hit['regulation_date']} · {hit['vpti_impact']}  \n{hit['snippet']}"
+        )
+    st.divider()
+
+# Filters run in SQL; only the visible page is loaded
+with st.sidebar:
+    st.divider()
+    impact_filter = st.selectbox("Impact", ["All", "High", "Medium", "Low"])
+    commodity_filter = st.selectbox("Commodity", ["All"] + dashboard_data.get_commodities())
+filters = {
+    "impact": None if impact_filter == "All" else impact_filter,
+    "commodity": None if commodity_filter == "All" else commodity_filter,
+}
+
+# Keyset pagination: a stack of (regulation_date, id) cursors, reset when filters change
+if st.session_state.get("page_filters") != filters:
+    st.session_state.page_filters = filters
+    st.session_state.page_cursors = [None]
+cursors = st.session_state.page_cursors
 
-if not df.empty:
+stats = dashboard_data.get_stats(**filters)
+df = dashboard_data.get_page(**filters, after=cursors[-1], limit=database.PAGE_SIZE + 1)
+has_next = len(df) > database.PAGE_SIZE
+df = df.head(database.PAGE_SIZE)
+
+if stats["total"]:
     # Key Metrics
     col1, col2, col3 = st.columns(3)
-    col1.metric("Total Regulations", len(df))
-    col2.metric("Latest Update", df['regulation_date'].max())
-    col3.metric("High Impact", len(df[df['vpti_impact'] == 'High']))
+    col1.metric("Total Regulations", stats["total"])
+    col2.metric("Latest Update", stats["latest_date"])
+    col3.metric("High Impact", stats["high_impact"])
 
     st.divider()
 
@@ -92,9 +109,54 @@ if not df.empty:
         hide_index=True,
         use_container_width=True
     )
+
+    prev_col, page_col, next_col = st.columns([1, 4, 1])
+    if prev_col.button("← Newer", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    page_col.caption(f"Page {len(cursors)} of {max(1, -(-stats['total'] // database.PAGE_SIZE))}")
+    if next_col.button("Older →", disabled=not has_next):
+        last = df.iloc[-1]
+        cursors.append((last["regulation_date"], int(last["id"])))
+        st.rerun()
     
-    # Download Button logic (Same as before)
-    # ... (You can copy the download button code from previous versions) ...
+    # Nearest neighbours in the local embedding index (e.g. earlier issues of a recurring decree)
+    titles = dict(zip(df["id"], df["english_title"].fillna(df["original_title"])))
+    related_to = st.selectbox("🔗 Related regulations", list(titles), index=None,
+                              format_func=titles.get, placeholder="Pick a regulation on this page")
+    if related_to is not None:
+        related = dashboard_data.get_related(int(related_to))
+        if related.empty:
+            st.caption("No related regulations found.")
+        for _, hit in related.iterrows():
+            st.markdown(
+                f"**[{hit['english_title'] or hit['original_title']}]({hit['raw_link']})** "
+                f"· {hit['regulation_date']} · {hit['vpti_impact']} · {hit['similarity']:.0%} similar"
+            )
+
+    # Streamed export: the rows ticked in the table, otherwise everything matching the filters.
+    # The file is only built when the button is clicked.
+    selected_ids = [int(i) for i in edited_df.loc[edited_df["Select"], "id"]]
+    format_col, export_col = st.columns([1, 4])
+    export_format = format_col.selectbox("Format", exporter.available_formats(), label_visibility="collapsed")
+    export_col.download_button(
+        f"⬇️ Export {len(selected_ids) if selected_ids else stats['total']} regulations",
+        data=lambda: exporter.export_bytes(export_format, ids=selected_ids or None, **filters),
+        file_name=f"vpti_regulations_{pd.Timestamp.now():%Y%m%d}.{export_format}",
+        mime=exporter.MIME_TYPES[export_format],
+        on_click="ignore"
+    )
 
 else:
-    st.info("No data yet. Click the button in the sidebar to scan.")
\ No newline at end of file
+    st.info("No data yet. Click the button in the sidebar to scan.")
+
+# Where the last scan spent its time (written by the worker via metrics.export)
+stages, totals = dashboard_data.get_scan_performance()
+if stages is not None:
+    with st.expander(f"⏱️ Scan performance (job #{totals['job_id']}, {totals['recorded_at']})"):
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Downloaded", f"{totals['downloaded_mb']:.1f} MB")
+        m2.metric("Tokens sent / received", f"{totals['prompt_tokens']:,.0f} / {totals['completion_tokens']:,.0f}")
+        m3.metric("Cache hits (HTTP / LLM)", f"{totals['http_cache_hits']:.0f} / {totals['llm_cache_hits']:.0f}")
+        m4.metric("Failures", f"{totals['failures']:.0f}", help=f"{totals['read_failed']:.0f} PDFs unreadable")
+        st.dataframe(stages, use_container_width=True)
@@ -0,0 +1,109 @@
+"""
+Prompt condensing: tokens sent per document with and without condenser.py,
+and whether the operative articles make it into the prompt at all.
+
+    python -m benchmarks.bench_condenser                                    # synthetic decrees
+    python -m benchmarks.bench_condenser --fixtures benchmarks/fixtures/jdih  # recorded PDFs
+
+Synthetic documents follow the published layout: letterhead on every page,
+a long "Mengingat" list, the articles, the signature block and a LAMPIRAN
+price table.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import condenser
+import crawler
+import llm_processor
+from benchmarks.fixtures import FixtureCorpus
+from benchmarks.stub_server import MONTHS
+
+def synthetic_decree(number, laws=30, articles=8, rows=60):
+    lines = [
+        "SALINAN",
+        "MENTERI PERDAGANGAN",
+        "REPUBLIK INDONESIA",
+        f"KEPUTUSAN MENTERI PERDAGANGAN REPUBLIK INDONESIA NOMOR {number} TAHUN 2025",
+        "TENTANG",
+        "HARGA PATOKAN EKSPOR ATAS PRODUK PERTANIAN DAN KEHUTANAN YANG DIKENAKAN BEA KELUAR",
+        "DENGAN RAHMAT TUHAN YANG MAHA ESA",
+        "MENTERI PERDAGANGAN REPUBLIK INDONESIA,",
+        "Menimbang : a. bahwa untuk melaksanakan ketentuan Pasal 3 ayat (1) Peraturan Menteri Keuangan",
+        "mengenai penetapan barang ekspor yang dikenakan bea keluar, perlu menetapkan harga patokan ekspor;",
+        "b. bahwa berdasarkan pertimbangan sebagaimana dimaksud dalam huruf a, perlu menetapkan Keputusan Menteri;",
+        "Mengingat :",
+    ]
+    for i in range(1, laws + 1):
+        lines.append(f"{i}. Undang-Undang Nomor {i + 5} Tahun {1990 + i} tentang Perubahan atas Undang-Undang "
+                     f"Nomor {i} Tahun {1980 + i} (Lembaran Negara Republik Indonesia Tahun {1990 + i} Nomor {i * 7}, "
+                     f"Tambahan Lembaran Negara Republik Indonesia Nomor {3000 + i});")
+        if i % 12 == 0:
+            lines += [f"- {i // 12 + 1} -", "MENTERI PERDAGANGAN", "REPUBLIK INDONESIA"]
+    lines += ["M E M U T U S K A N :",
+              "Menetapkan : KEPUTUSAN MENTERI PERDAGANGAN TENTANG HARGA PATOKAN EKSPOR ATAS PRODUK PERTANIAN."]
+    for i in range(1, articles + 1):
+        lines.append(f"Pasal {i}")
+        lines.append(f"Harga patokan ekspor untuk kelompok produk {i} ditetapkan sebagaimana tercantum dalam "
+                     f"Lampiran yang merupakan bagian tidak terpisahkan dari Keputusan Menteri ini, sebesar "
+                     f"US$ {900 + number % 100 + i}/MT dan berlaku untuk pemberitahuan pabean ekspor.")
+    lines += [f"Ditetapkan di Jakarta pada tanggal {1 + number % 28} {MONTHS[number % 12]} 2025",
+              "MENTERI PERDAGANGAN REPUBLIK INDONESIA,", "ttd.", "BUDI SANTOSO",
+              "Salinan sesuai dengan aslinya", "Kepala Biro Hukum,", "ttd.",
+              f"LAMPIRAN KEPUTUSAN MENTERI PERDAGANGAN NOMOR {number} TAHUN 2025",
+              "NO URAIAN BARANG POS TARIF HARGA PATOKAN EKSPOR (US$/MT)"]
+    lines += [f"{i}. Kelapa sawit dan produk turunan {i} 1511.{i:02d}.00 {800 + i * 3}" for i in range(1, rows + 1)]
+    return "\n".join(lines)
+
+def load_texts(args):
+    if not args.fixtures:
+        return [(f"synthetic decree {n}", synthetic_decree(n, laws=args.laws)) for n in range(2240, 2240 + args.docs)]
+    corpus = FixtureCorpus(args.fixtures)
+    texts = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for path in sorted(p for p in corpus.paths("/") if p.lower().endswith(".pdf")):
+            pdf_path = os.path.join(tmp, "doc.pdf")
+            with open(pdf_path, "wb") as f:
+                f.write(corpus.get(path)[1])
+            texts.append((path, crawler.parse_pdf_text(pdf_path)))
+    return texts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", help="fixture corpus directory (default: synthetic decrees)")
+    parser.add_argument("--docs", type=int, default=20, help="synthetic documents to generate")
+    parser.add_argument("--laws", type=int, default=30, help="'Mengingat' entries per synthetic document")
+    args = parser.parse_args()
+
+    texts = [(name, text) for name, text in load_texts(args) if text.strip()]
+    if not texts:
+        sys.exit("No documents with extractable text.")
+
+    limit = llm_processor.MAX_TEXT_CHARS
+    raw_tokens, condensed_tokens, kept_raw, kept_condensed, durations = [], [], 0, 0, []
+    for name, text in texts:
+        start = time.perf_counter()
+        prompt = condenser.condense(text, limit)
+        durations.append(time.perf_counter() - start)
+        raw = text[:limit]
+        raw_tokens.append(llm_processor.estimate_tokens(raw))
+        condensed_tokens.append(llm_processor.estimate_tokens(prompt))
+        parts = condenser.segment(text)
+        operative = parts["operative"][-200:] if parts else ""
+        kept_raw += bool(operative) and operative in condenser._clean(raw)
+        kept_condensed += bool(operative) and operative in prompt
+        print(f"{name}: {raw_tokens[-1]} -> {condensed_tokens[-1]} tokens  {condenser.metadata(text)}")
+
+    print()
+    print(f"📄 {len(texts)} documents, {sum(1 for name, text in texts if condenser.segment(text))} with a decision part")
+    print(f"🔢 Prompt tokens: {sum(raw_tokens)} raw -> {sum(condensed_tokens)} condensed "
+          f"({1 - sum(condensed_tokens) / sum(raw_tokens):.0%} fewer, "
+          f"median {statistics.median(raw_tokens)} -> {statistics.median(condensed_tokens)} per document)")
+    print(f"📜 End of the operative text inside the prompt: {kept_raw} raw, {kept_condensed} condensed")
+    print(f"⏱️ Condensing: median {statistics.median(durations) * 1000:.2f} ms per document")
+
+if __name__ == "__main__":
+    main()
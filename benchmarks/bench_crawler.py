@@ -0,0 +1,62 @@
+"""
+Compares the old one-connection-per-request crawl with the pooled session.
+
+    python -m benchmarks.bench_crawler --pages 5 --delay 0.05
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import crawler
+from benchmarks.stub_server import StubServer
+
+def crawl_sequential(pages):
+    """
+    The pre-pool behaviour: pages one by one, every request a fresh requests.get.
+    """
+    items = []
+    for page in range(1, pages + 1):
+        items.extend(crawler.fetch_links_from_page(page))
+    for item in items:
+        crawler.fetch_pdf(item['link'])
+    return items
+
+def crawl_pooled(pages):
+    items = [item for page_items in crawler.fetch_index_pages(range(1, pages + 1)) for item in page_items]
+    with ThreadPoolExecutor(max_workers=crawler.MAX_CONNECTIONS_PER_HOST) as pool:
+        list(pool.map(crawler.fetch_pdf, [item['link'] for item in items]))
+    return items
+
+def run(server, crawl, pages):
+    server.reset_counters()
+    start = time.perf_counter()
+    items = crawl(pages)
+    return items, time.perf_counter() - start, server.connections, server.requests
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--delay", type=float, default=0.05, help="simulated server latency (s)")
+    args = parser.parse_args()
+
+    with StubServer(delay=args.delay) as server:
+        crawler.BASE_URL = server.base_url
+        crawler.TARGET_URL_TEMPLATE = server.base_url + "/peraturan?page={}"
+        crawler.USE_HTTP_CACHE = False   # measure the network path, not the cache
+
+        pooled_session = crawler.get_session
+        crawler.get_session = lambda: requests
+        before = run(server, crawl_sequential, args.pages)
+        crawler.get_session = pooled_session
+        after = run(server, crawl_pooled, args.pages)
+
+    assert before[0] == after[0], "pooled crawl returned different items"
+    print(f"\n{'mode':<12}{'items':>7}{'seconds':>10}{'connections':>13}{'requests':>10}")
+    for name, (items, seconds, connections, total) in (("sequential", before), ("pooled", after)):
+        print(f"{name:<12}{len(items):>7}{seconds:>10.2f}{connections:>13}{total:>10}")
+    print(f"\nspeedup x{before[1] / after[1]:.1f}, connections -{100 * (1 - after[2] / before[2]):.0f}%")
+
+if __name__ == "__main__":
+    main()
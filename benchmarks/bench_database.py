@@ -0,0 +1,71 @@
+"""
+Insert throughput of the old per-row connect/commit path vs save_regulations_bulk.
+
+    python -m benchmarks.bench_database --rows 2000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+import database
+
+def sample_records(count):
+    return [{
+        "date": f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}",
+        "original_title": f"Keputusan Menteri Perdagangan Nomor {i} Tahun 2025",
+        "english_title": f"Minister of Trade Decree No. {i} of 2025",
+        "status": "New",
+        "commodity": "Crude Palm Oil",
+        "vpti_impact": ("High", "Medium", "Low")[i % 3],
+        "key_changes": "Sets the export reference price for the period.",
+        "action_required": "Apply the new reference price.",
+        "link": f"https://jdih.kemendag.go.id/peraturan/kepmendag-{i}-2025",
+    } for i in range(count)]
+
+def legacy_save(data):
+    """
+    save_regulation as it was: new connection, one INSERT, commit, close.
+    """
+    conn = sqlite3.connect(database.DB_FILE)
+    conn.execute('''
+        INSERT INTO regulations (
+            timestamp, regulation_date, original_title, english_title,
+            status, commodity, vpti_impact, summary, action_required, raw_link
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', database._regulation_row(data, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    conn.commit()
+    conn.close()
+
+def timed(label, fn, records, db_path):
+    database.DB_FILE = db_path
+    database.init_db()
+    if label == "legacy":
+        # The old database ran in the default rollback-journal mode
+        database.get_connection().execute("PRAGMA journal_mode = DELETE")
+    start = time.perf_counter()
+    fn(records)
+    seconds = time.perf_counter() - start
+    print(f"{label:<22}{len(records):>7}{seconds:>10.3f}{len(records) / seconds:>12.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=10, help="records per bulk transaction")
+    args = parser.parse_args()
+    records = sample_records(args.rows)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"\n{'mode':<22}{'rows':>7}{'seconds':>10}{'rows/sec':>12}")
+        timed("legacy", lambda rs: [legacy_save(r) for r in rs], records, os.path.join(tmp, "legacy.db"))
+        timed("save_regulation", lambda rs: [database.save_regulation(r) for r in rs],
+              records, os.path.join(tmp, "single.db"))
+        timed(f"bulk (batch={args.batch})",
+              lambda rs: [database.save_regulations_bulk(rs[i:i + args.batch]) for i in range(0, len(rs), args.batch)],
+              records, os.path.join(tmp, "bulk.db"))
+        timed("bulk (one batch)", database.save_regulations_bulk, records, os.path.join(tmp, "all.db"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Full-archive export: time and peak Python memory per format, streamed in
+chunks, against the old way of loading everything with get_all_regulations.
+
+    python -m benchmarks.bench_export --rows 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import database
+import exporter
+from benchmarks.bench_database import sample_records
+
+def legacy_export(path):
+    """
+    The whole table as one DataFrame, then to_csv.
+    """
+    df = database.get_all_regulations()
+    df.to_csv(path, index=False)
+    return len(df), path
+
+def measure(label, fn):
+    """
+    fn() -> (rows, output path); run twice.
+    """
+    start = time.perf_counter()
+    rows, path = fn()
+    seconds = time.perf_counter() - start
+    # Second run for memory only: tracing slows allocation-heavy code several-fold
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    size = os.path.getsize(path) / 1e6
+    print(f"{label:<18}{rows:>9}{seconds:>9.2f}{rows / seconds:>11.0f}{peak:>10.1f}{size:>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--chunk", type=int, default=exporter.CHUNK_ROWS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "bench.db")
+        database.init_db()
+        records = sample_records(args.rows)
+        for i in range(0, len(records), 10000):
+            database.save_regulations_bulk(records[i:i + 10000])
+
+        print(f"{'export':<18}{'rows':>9}{'seconds':>9}{'rows/s':>11}{'peak MB':>10}{'file MB':>10}")
+        measure("legacy to_csv", lambda: legacy_export(os.path.join(tmp, "legacy.csv")))
+        for fmt in exporter.available_formats():
+            path = os.path.join(tmp, f"export.{fmt}")
+            measure(f"stream {fmt}", lambda: (exporter.export(path, fmt, chunk_size=args.chunk), path))
+        measure("snapshot", lambda: exporter.snapshot(os.path.join(tmp, "snapshots"))[::-1])
+        print("\n(peak MB is Python allocations traced by tracemalloc; file MB is the output size)")
+
+if __name__ == "__main__":
+    main()
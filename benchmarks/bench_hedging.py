@@ -0,0 +1,82 @@
+"""
+Per-document LLM latency with Groq alone vs Groq hedged with a local backend.
+
+    python -m benchmarks.bench_hedging --docs 60
+    python -m benchmarks.bench_hedging --llama-model models/qwen2.5-0.5b-instruct-q4_k_m.gguf
+
+Both "providers" run offline: a Groq stand-in with a slow tail and
+occasional 500s, and a steadier but slower stand-in for a llama.cpp server.
+With --llama-model the hedge is a real GGUF model run in-process instead
+(needs llama-cpp-python; a sub-1B instruct model is enough to check the
+plumbing and the schema validation).
+"""
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stub_llm import StubLLM
+from benchmarks.stub_server import regulation_text
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def run(texts, workers):
+    import llm_processor
+
+    def timed(text):
+        start = time.perf_counter()
+        result = llm_processor.analyze_regulation(text)
+        return time.perf_counter() - start, result
+
+    with ThreadPoolExecutor(workers) as pool:
+        return list(pool.map(timed, texts))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=60)
+    parser.add_argument("--workers", type=int, default=3, help="concurrent documents, like pipeline.LLM_WORKERS")
+    parser.add_argument("--latency", type=float, default=0.3, help="Groq stand-in typical response time (s)")
+    parser.add_argument("--slow-rate", type=float, default=0.04, help="share of Groq requests in the slow tail")
+    parser.add_argument("--slow-latency", type=float, default=6.0)
+    parser.add_argument("--fail-rate", type=float, default=0.03, help="share of Groq requests answering 500")
+    parser.add_argument("--local-latency", type=float, default=1.0, help="local stand-in response time (s)")
+    parser.add_argument("--llama-model", help="GGUF file for an in-process llama.cpp hedge")
+    args = parser.parse_args()
+
+    with StubLLM(args.latency, slow_rate=args.slow_rate, slow_latency=args.slow_latency,
+                 fail_rate=args.fail_rate) as groq, StubLLM(args.local_latency) as local:
+        os.environ["GROQ_BASE_URL"] = groq.base_url
+        os.environ.setdefault("GROQ_API_KEY", "stub")
+        import llm_backends
+        import llm_processor
+        llm_processor.USE_RESULT_CACHE = False
+
+        texts = ["\n".join(regulation_text(2000 + i)) for i in range(args.docs)]
+        hedge = (llm_backends.LlamaCppBackend(args.llama_model) if args.llama_model else
+                 llm_backends.OpenAICompatibleBackend("local", f"{local.base_url}/v1", "tiny-local"))
+        rows = []
+        for mode, backends in (("groq only", [llm_backends.GroqBackend()]),
+                               ("hedged", [llm_backends.GroqBackend(), hedge])):
+            router = llm_backends.set_backends(backends)
+            start = time.perf_counter()
+            results = run(texts, args.workers)
+            seconds = [s for s, _ in results]
+            failed = sum(1 for _, r in results if r.get("english_title") in ("Error", None))
+            rows.append((mode, time.perf_counter() - start, seconds, failed, router.stats()))
+
+    print(f"\n{'mode':<11}{'total s':>8}{'p50':>7}{'p95':>7}{'p99':>7}{'max':>7}{'failed':>8}")
+    for mode, total, seconds, failed, _ in rows:
+        print(f"{mode:<11}{total:>8.1f}{statistics.median(seconds):>7.2f}{percentile(seconds, 0.95):>7.2f}"
+              f"{percentile(seconds, 0.99):>7.2f}{max(seconds):>7.2f}{failed:>8}")
+    print()
+    for mode, _, _, _, stats in rows:
+        for name, summary in stats.items():
+            p50, p95 = summary["p50"], summary["p95"]
+            print(f"{mode:<11}{name:<7} {summary['requests']:>4} requests, {summary['failures']} failed, "
+                  f"{summary['wins']} answers used, p50 {p50 or 0:.2f}s p95 {p95 or 0:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Legacy CSV import throughput, and a second run to confirm it is idempotent.
+
+    python -m benchmarks.bench_import --rows 500000
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+import database
+import importer
+
+def write_legacy_log(path, rows, duplicate_every=50):
+    """
+    A log shaped like vpti_regulatory_log.csv; every `duplicate_every`-th row
+    re-logs an earlier link, as re-scans of the old script did.
+    """
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(importer.COLUMN_MAP)
+        for i in range(rows):
+            number = i - 1 if duplicate_every and i % duplicate_every == 0 and i else i
+            writer.writerow([
+                f"2025-{1 + i % 12:02d}-{1 + i % 28:02d} 22:00:{i % 60:02d}",
+                f"https://jdih.kemendag.go.id/peraturan/keputusan-menteri-perdagangan-nomor-{number}-tahun-2025"
+                f"-tentang-harga-patokan-ekspor",
+                f"Decision of the Minister of Trade Number {number} of 2025 Regarding Export Reference Prices",
+                "New", "Crude Palm Oil", ("High", "Medium", "Low")[i % 3],
+                "This decision sets the export reference price for the period, taking into account "
+                "the results of coordination meetings with related ministries.",
+                "Surveyors must apply the new reference price.",
+                "Immediately" if i % 7 == 0 else f"2025-{1 + i % 12:02d}-01",
+            ])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--chunk", type=int, default=importer.CHUNK_ROWS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log = os.path.join(tmp, "legacy.csv")
+        write_legacy_log(log, args.rows)
+        size = os.path.getsize(log) / 1e6
+        database.DB_FILE = os.path.join(tmp, "bench.db")
+        database.init_db()
+
+        print(f"{'run':<10}{'rows':>9}{'imported':>10}{'seconds':>9}{'rows/s':>10}{'MB/s':>8}")
+        for run in ("first", "re-run"):
+            start = time.perf_counter()
+            stats = importer.import_csv(log, args.chunk)
+            seconds = time.perf_counter() - start
+            print(f"{run:<10}{stats['read']:>9}{stats['imported']:>10}{seconds:>9.2f}"
+                  f"{stats['read'] / seconds:>10.0f}{size / seconds:>8.1f}")
+        total = database.get_regulation_stats()["total"]
+        searchable = database.get_connection().execute("SELECT COUNT(*) FROM regulations_fts").fetchone()[0]
+        print(f"\n{size:.0f} MB log -> {total} regulations ({searchable} in the search index)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Single-request vs packed-batch analysis against the local Groq stand-in.
+
+    python -m benchmarks.bench_llm --docs 20 --server-rpm 12
+
+The stub enforces a tighter budget than the client assumes, so the run
+also exercises the 429 / rate-limit-header backoff. Expect to wait about
+a minute per exhausted window.
+"""
+import argparse
+import os
+import time
+
+from benchmarks.stub_llm import StubLLM
+from benchmarks.stub_server import regulation_text
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="stub response time (s)")
+    parser.add_argument("--server-rpm", type=int, default=12)
+    parser.add_argument("--server-tpm", type=int, default=20000)
+    args = parser.parse_args()
+
+    with StubLLM(args.latency, args.server_rpm, args.server_tpm) as llm:
+        os.environ["GROQ_BASE_URL"] = llm.base_url
+        os.environ.setdefault("GROQ_API_KEY", "stub")
+        import llm_processor
+        llm_processor.USE_RESULT_CACHE = False
+
+        texts = ["\n".join(regulation_text(2000 + i)) for i in range(args.docs)]
+        rows = []
+        for mode in ("single", "batch"):
+            llm._window.clear()
+            llm.requests = llm.rate_limited = 0
+            limiter = llm_processor.RateLimiter(llm_processor.REQUESTS_PER_MINUTE, llm_processor.TOKENS_PER_MINUTE)
+            start = time.perf_counter()
+            if mode == "single":
+                results = [llm_processor.analyze_regulation(text, limiter) for text in texts]
+            else:
+                results = llm_processor.analyze_regulations_batch(texts, limiter)
+            failed = sum(1 for r in results if r.get("english_title") in ("Error", None))
+            rows.append((mode, time.perf_counter() - start, llm.requests, llm.rate_limited, failed))
+
+    print(f"\n{'mode':<8}{'seconds':>9}{'requests':>10}{'429s':>6}{'failed':>8}")
+    for mode, seconds, requests, limited, failed in rows:
+        print(f"{mode:<8}{seconds:>9.1f}{requests:>10}{limited:>6}{failed:>8}")
+
+if __name__ == "__main__":
+    main()
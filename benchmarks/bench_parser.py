@@ -0,0 +1,87 @@
+"""
+Index-page parsing: the lxml card parser vs the "scan all links" heuristic.
+Checks that parse_index_page (cards, falling back to the heuristic) returns
+the same items as the BeautifulSoup heuristic for every page, then times
+both parsers.
+
+    python -m benchmarks.bench_parser                                    # synthetic + saved pages
+    python -m benchmarks.bench_parser --fixtures benchmarks/fixtures/jdih  # a recorded corpus
+
+The saved pages in benchmarks/fixtures/index_pages cover the card layouts
+the selector has to read beyond the stub server's own markup: multi-class
+and nested cards, titles split by <br>/<span>/comments, absolute links,
+download and image links, undated cards and a table layout without cards.
+Exits 1 when the parsers disagree on any page, so a layout change on the
+site that the card selector misreads shows up here before a scan does.
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+
+import crawler
+from benchmarks.fixtures import FixtureCorpus
+from benchmarks.stub_server import index_page
+
+# --- CONFIGURATION ---
+SAVED_PAGES = os.path.join(os.path.dirname(__file__), "fixtures", "index_pages")
+
+def corpus_pages(directory):
+    corpus = FixtureCorpus(directory)
+    return [(path, corpus.get(path)[1]) for path in sorted(corpus.paths("/peraturan?page="))]
+
+def load_pages(args):
+    if args.fixtures:
+        return corpus_pages(args.fixtures)
+    synthetic = [(f"synthetic page {page}", index_page(page).encode()) for page in range(1, args.pages + 1)]
+    return synthetic + [(f"saved {path}", html) for path, html in corpus_pages(SAVED_PAGES)]
+
+def time_parser(parse, html, repeat):
+    durations = []
+    with contextlib.redirect_stdout(io.StringIO()):   # crawler DEBUG prints
+        for _ in range(repeat):
+            start = time.perf_counter()
+            parse(html)
+            durations.append(time.perf_counter() - start)
+    return statistics.median(durations) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", help="fixture corpus directory (default: synthetic index pages)")
+    parser.add_argument("--pages", type=int, default=5, help="synthetic pages to generate")
+    parser.add_argument("--repeat", type=int, default=50, help="parses per page and parser")
+    args = parser.parse_args()
+
+    if crawler.lxml_html is None:
+        sys.exit("lxml is not installed: only the heuristic parser is available.")
+    pages = load_pages(args)
+    if not pages:
+        sys.exit("No index pages in the corpus.")
+
+    mismatches = 0
+    card_ms, links_ms = [], []
+    for name, html in pages:
+        with contextlib.redirect_stdout(io.StringIO()):
+            items, links = crawler.parse_index_page(html), crawler.parse_index_links(html)
+        if items != links:
+            mismatches += 1
+            print(f"❌ {name}: card parser found {len(items)} items, heuristic {len(links)}")
+        card_ms.append(time_parser(crawler.parse_index_cards, html, args.repeat))
+        links_ms.append(time_parser(crawler.parse_index_links, html, args.repeat))
+
+    card, links = statistics.median(card_ms), statistics.median(links_ms)
+    print(f"\n{len(pages)} index pages, median of {args.repeat} parses each")
+    print(f"{'parser':<12}{'ms/page':>9}")
+    print(f"{'cards':<12}{card:>9.2f}")
+    print(f"{'heuristic':<12}{links:>9.2f}")
+    print(f"speed-up: {links / card:.1f}x")
+    if mismatches:
+        print(f"\n❌ Parsers disagree on {mismatches}/{len(pages)} pages")
+        sys.exit(1)
+    print(f"\n✅ Parsers agree on all {len(pages)} pages")
+
+if __name__ == "__main__":
+    main()
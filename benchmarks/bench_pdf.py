@@ -0,0 +1,110 @@
+"""
+PDF extraction throughput: serial crawler.parse_pdf_text vs the pooled
+pdf_engine, plus the share of documents that would end up "PDF Read Failed".
+
+    python -m benchmarks.bench_pdf                      # synthetic corpus
+    python -m benchmarks.bench_pdf --corpus samples/    # a folder of real PDFs
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pdfplumber
+
+import crawler
+import pdf_engine
+from benchmarks.stub_server import make_pdf, regulation_text
+
+READ_FAILED_CHARS = 50   # less text than this -> the LLM step reports "PDF Read Failed"
+
+def synthetic_corpus(directory, docs, pages, scanned_every):
+    """
+    Writes `docs` PDFs of `pages` pages; every `scanned_every`-th document is image-only.
+    """
+    paths = []
+    for number in range(docs):
+        if scanned_every and number % scanned_every == 0:
+            page_list = [None] * pages
+        else:
+            page_list = [regulation_text(number)] * pages
+        path = os.path.join(directory, f"doc-{number:04d}.pdf")
+        with open(path, "wb") as f:
+            f.write(make_pdf(page_list))
+        paths.append(path)
+    return paths
+
+def count_pages(paths, budget):
+    total = 0
+    for path in paths:
+        with pdfplumber.open(path) as pdf:
+            total += min(len(pdf.pages), budget)
+    return total
+
+def run_serial(paths, budget):
+    """
+    The old in-process path (crawler.iter_pdf_pages), same page budget.
+    """
+    return ["".join(text + "\n" for text in crawler.iter_pdf_pages(path, max_pages=budget)) for path in paths]
+
+def run_pooled(paths, budget, workers, use_ocr):
+    """
+    All documents in flight at once, as in the pipeline's parse stage.
+    """
+    texts = [None] * len(paths)
+    remaining = threading.Semaphore(0)
+
+    def on_done(index):
+        def done(text, stats, error):
+            texts[index] = text
+            remaining.release()
+        return done
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for index, path in enumerate(paths):
+            pdf_engine.extract_async(pool, path, on_done(index), page_budget=budget, use_ocr=use_ocr)
+        for _ in paths:
+            remaining.acquire()
+    return texts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus", help="directory of sample PDFs (default: generate one)")
+    parser.add_argument("--docs", type=int, default=40)
+    parser.add_argument("--pages", type=int, default=6)
+    parser.add_argument("--scanned-every", type=int, default=5, help="every Nth synthetic doc is a scan")
+    parser.add_argument("--budget", type=int, default=pdf_engine.PAGE_BUDGET)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.corpus:
+            paths = sorted(os.path.join(args.corpus, name) for name in os.listdir(args.corpus)
+                           if name.lower().endswith(".pdf"))
+        else:
+            paths = synthetic_corpus(tmp, args.docs, args.pages, args.scanned_every)
+        pages = count_pages(paths, args.budget)
+
+        rows = []
+        for name, run in (("serial", lambda: run_serial(paths, args.budget)),
+                          ("pool", lambda: run_pooled(paths, args.budget, args.workers, use_ocr=False)),
+                          ("pool+ocr", lambda: run_pooled(paths, args.budget, args.workers, use_ocr=True))):
+            if name == "pool+ocr" and pdf_engine.pytesseract is None:
+                continue
+            start = time.perf_counter()
+            texts = run()
+            seconds = time.perf_counter() - start
+            failed = sum(len(text.strip()) < READ_FAILED_CHARS for text in texts)
+            rows.append((name, seconds, failed))
+
+    print(f"\n{len(paths)} documents, {pages} pages within a budget of {args.budget}")
+    print(f"{'mode':<10}{'seconds':>9}{'pages/s':>10}{'read failed':>13}")
+    for name, seconds, failed in rows:
+        print(f"{name:<10}{seconds:>9.2f}{pages / seconds:>10.1f}{100 * failed / len(paths):>12.0f}%")
+    if pdf_engine.pytesseract is None:
+        print("\n(pytesseract not installed: OCR fallback skipped)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Dashboard cold start: import time of the modules app.py needs (pandas
+included), which heavy stacks they drag in, and time to first render of app.py (Streamlit's
+AppTest) against a small database. Every measurement runs in a fresh
+interpreter, like a new container.
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DASHBOARD_MODULES = ("database", "dashboard_data", "exporter")
+OTHER_MODULES = ("crawler", "llm_processor", "pipeline")
+# None of these should load on the dashboard path before a scan or an export runs
+HEAVY = ("requests", "bs4", "lxml", "pdfplumber", "groq", "pyarrow", "xlsxwriter")
+
+IMPORT_SCRIPT = """
+import sys, time
+import streamlit   # already running in a real server; not ours to count
+start = time.perf_counter()
+import pandas      # the table needs it; whatever pandas loads itself is not flagged
+before = set(sys.modules)
+for name in sys.argv[1].split(","):
+    __import__(name)
+print(time.perf_counter() - start)
+print(",".join(m for m in sys.argv[2].split(",") if m in sys.modules and m not in before))
+"""
+
+RENDER_SCRIPT = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+import database
+from benchmarks.bench_database import sample_records
+database.init_db()
+database.save_regulations_bulk(sample_records(int(sys.argv[2])))
+database._local.conn = None     # the app opens its own connection
+start = time.perf_counter()
+app = AppTest.from_file(sys.argv[1], default_timeout=60).run()
+first = time.perf_counter() - start
+start = time.perf_counter()
+app.run()
+rerun = time.perf_counter() - start
+print(json.dumps({"first": first, "rerun": rerun, "errors": [str(e.value) for e in app.exception]}))
+"""
+
+def run_python(script, *args, cwd):
+    env = {**os.environ, "PYTHONPATH": ROOT, "GROQ_API_KEY": os.environ.get("GROQ_API_KEY", "stub")}
+    out = subprocess.run([sys.executable, "-c", script, *args], cwd=cwd, env=env,
+                         capture_output=True, text=True, check=True)
+    return out.stdout.strip().splitlines()
+
+def import_cost(modules, runs, cwd):
+    times, loaded = [], ""
+    for _ in range(runs):
+        lines = run_python(IMPORT_SCRIPT, ",".join(modules), ",".join(HEAVY), cwd=cwd)
+        times.append(float(lines[0]))
+        loaded = lines[1] if len(lines) > 1 else ""
+    return statistics.median(times), loaded
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=500, help="regulations in the test database")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'import':<34}{'ms':>8}   heavy modules loaded")
+        for modules in [DASHBOARD_MODULES] + [(name,) for name in DASHBOARD_MODULES + OTHER_MODULES]:
+            seconds, loaded = import_cost(modules, args.runs, tmp)
+            print(f"{' + '.join(modules):<34}{seconds * 1000:>8.0f}   {loaded or '-'}")
+
+        renders = []
+        for run in range(args.runs):
+            cwd = os.path.join(tmp, f"render-{run}")
+            os.makedirs(cwd)
+            renders.append(json.loads(run_python(RENDER_SCRIPT, os.path.join(ROOT, "app.py"), str(args.rows),
+                                                 cwd=cwd)[-1]))
+        if renders[0]["errors"]:
+            print(f"\n❌ app.py raised: {renders[0]['errors']}")
+        first = statistics.median(r["first"] for r in renders)
+        rerun = statistics.median(r["rerun"] for r in renders)
+        print(f"\napp.py first render: {first * 1000:.0f} ms, rerun: {rerun * 1000:.0f} ms "
+              f"(median of {args.runs} fresh processes, {args.rows} regulations)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Blob store: compression ratio of extracted text and PDFs, and read throughput.
+
+    python -m benchmarks.bench_storage                                    # synthetic decrees + stub PDFs
+    python -m benchmarks.bench_storage --fixtures benchmarks/fixtures/jdih  # recorded PDFs
+
+Texts are stored per document the way the pipeline does it, three ways:
+zlib without a dictionary (what gzip'ing each row would give), the store
+without a dictionary, and the store with a dictionary trained on the first
+--train documents. Every document is stored twice (a re-scan) to show
+deduplication. Synthetic decrees share one template, so their ratios are
+optimistic; use a recorded corpus for real numbers. Finally the texts are
+saved through database.save_regulations_bulk, and the on-disk size of
+regulations.db (search index included) plus its blob store is reported.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+
+import blob_store
+import crawler
+import database
+from benchmarks.bench_condenser import synthetic_decree
+from benchmarks.fixtures import FixtureCorpus
+from benchmarks.stub_server import make_pdf, regulation_text
+
+WORDS = ("ekspor impor barang komoditas kelapa sawit batubara nikel kakao karet kayu tarif bea keluar "
+         "verifikasi penelusuran teknis surveyor persetujuan izin kuota harga patokan referensi").split()
+
+def synthetic_corpus(docs, seed=0):
+    rng = random.Random(seed)
+    texts, pdfs = [], []
+    for n in range(docs):
+        # Vary length and wording so the dictionary cannot memorise one document
+        text = synthetic_decree(2000 + n, laws=rng.randint(5, 40), articles=rng.randint(2, 12), rows=rng.randint(0, 80))
+        filler = " ".join(rng.choice(WORDS) for _ in range(rng.randint(50, 400)))
+        texts.append(f"{text}\n{filler}")
+        if n % 10 == 0:
+            pdfs.append(make_pdf([regulation_text(2000 + n)] * 3))
+    return texts, pdfs
+
+def fixture_corpus(directory):
+    corpus = FixtureCorpus(directory)
+    texts, pdfs = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        for path in sorted(p for p in corpus.paths("/") if p.lower().endswith(".pdf")):
+            pdf = corpus.get(path)[1]
+            pdf_path = os.path.join(tmp, "doc.pdf")
+            with open(pdf_path, "wb") as f:
+                f.write(pdf)
+            pdfs.append(pdf)
+            text = crawler.parse_pdf_text(pdf_path)
+            if text.strip():
+                texts.append(text)
+    return texts, pdfs
+
+def store_texts(root, texts, train):
+    store = blob_store.BlobStore(root)
+    if train:
+        store.train([text.encode("utf-8") for text in texts[:train]])
+    start = time.perf_counter()
+    digests = [store.put_text(text) for text in texts + texts]   # second pass: a re-scan
+    seconds = time.perf_counter() - start
+    return store, digests[:len(texts)], seconds
+
+def read_throughput(store, digests, repeat=3):
+    total, start = 0, time.perf_counter()
+    for _ in range(repeat):
+        for digest in digests:
+            with store.open(digest) as reader:
+                while chunk := reader.read(blob_store.CHUNK_SIZE):
+                    total += len(chunk)
+    return total / (time.perf_counter() - start) / 1e6
+
+def database_footprint(root, texts, train):
+    """
+    Bytes of (regulations.db after VACUUM, its blob store) once every text
+    is saved as a regulation.
+    """
+    os.makedirs(root, exist_ok=True)
+    database.DB_FILE = os.path.join(root, "regulations.db")
+    database.init_db()
+    store = database.get_blob_store()
+    store.train([text.encode("utf-8") for text in texts[:train]])
+    records = [{"link": f"/peraturan/{n}", "original_title": text.split("\n", 1)[0], "extracted_text": text}
+               for n, text in enumerate(texts)]
+    for start in range(0, len(records), 50):
+        database.save_regulations_bulk(records[start:start + 50])
+    conn = database.get_connection()
+    conn.execute("VACUUM")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return os.path.getsize(database.DB_FILE), store.stored_bytes()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", help="fixture corpus directory (default: synthetic documents)")
+    parser.add_argument("--docs", type=int, default=300, help="synthetic documents to generate")
+    parser.add_argument("--train", type=int, default=100, help="documents the dictionary is trained on")
+    args = parser.parse_args()
+
+    texts, pdfs = fixture_corpus(args.fixtures) if args.fixtures else synthetic_corpus(args.docs)
+    if not texts:
+        sys.exit("No documents with extractable text.")
+    raw = sum(len(text.encode("utf-8")) for text in texts)
+    print(f"📄 {len(texts)} texts ({raw / 1e6:.2f} MB), {len(pdfs)} PDFs, codec "
+          f"{'zstd' if blob_store.zstd else 'zlib (zstandard not installed)'}")
+
+    gzip_size = sum(len(zlib.compress(text.encode("utf-8"), 6)) for text in texts)
+    print(f"   zlib per row, no dictionary : ratio {raw / gzip_size:5.2f}x")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, label, train in (("plain", "store, no dictionary", 0),
+                                   ("trained", f"store, dictionary ({args.train} docs)", args.train)):
+            root = os.path.join(tmp, name)
+            store, digests, seconds = store_texts(root, texts, train)
+            stored = store.stored_bytes()
+            objects = len(list(store.digests()))
+            print(f"   {label:28}: ratio {raw / stored:5.2f}x, {objects} objects for {2 * len(texts)} puts, "
+                  f"write {2 * len(texts) / seconds:,.0f} docs/s, read {read_throughput(store, digests):,.0f} MB/s")
+
+        pdf_dir = os.path.join(tmp, "pdf")
+        store = blob_store.BlobStore(pdf_dir)
+        pdf_digests = []
+        for i, pdf in enumerate(pdfs):
+            path = os.path.join(tmp, f"{i}.pdf")
+            with open(path, "wb") as f:
+                f.write(pdf)
+            pdf_digests.append(store.put_file(path)[0])
+        if pdfs:
+            raw_pdf = sum(len(pdf) for pdf in pdfs)
+            print(f"   PDFs                        : ratio {raw_pdf / store.stored_bytes():5.2f}x "
+                  f"({raw_pdf / 1e6:.2f} MB), read {read_throughput(store, pdf_digests):,.0f} MB/s")
+
+        db_bytes, blob_bytes = database_footprint(os.path.join(tmp, "db"), texts, args.train)
+        print(f"   regulations.db + blob store : {db_bytes / 1e6:.2f} MB + {blob_bytes / 1e6:.2f} MB "
+              f"= {(db_bytes + blob_bytes) / 1e6:.2f} MB for {raw / 1e6:.2f} MB of text")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Fixture corpus for the benchmarks: index pages, detail pages and PDFs
+stored on disk and replayed by StubServer(fixtures=...).
+
+    python -m benchmarks.fixtures record benchmarks/fixtures/jdih --pages 2
+    python -m benchmarks.fixtures generate benchmarks/fixtures/synthetic --pages 3
+
+`record` captures the live JDIH site once (absolute links are rewritten to
+relative ones so replays never leave localhost); `generate` writes the same
+deterministic pages the stub server builds, with every `--scanned-every`-th
+PDF image-only.
+"""
+import argparse
+import hashlib
+import json
+import os
+from urllib.parse import urlsplit
+
+# --- CONFIGURATION ---
+MANIFEST = "manifest.json"
+
+class FixtureCorpus:
+    """
+    A directory of recorded responses: manifest.json maps a request path
+    (path + query) to {"file", "content_type"}.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+            self.entries = json.load(f)
+
+    def get(self, path):
+        """
+        Returns (content_type, body) for a recorded path, or None.
+        """
+        entry = self.entries.get(path)
+        if not entry:
+            return None
+        with open(os.path.join(self.directory, entry["file"]), "rb") as f:
+            return entry["content_type"], f.read()
+
+    def paths(self, prefix=""):
+        return [path for path in self.entries if path.startswith(prefix)]
+
+class FixtureWriter:
+    def __init__(self, directory):
+        self.directory = directory
+        self.entries = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def add(self, path, content_type, body):
+        extension = ".pdf" if content_type == "application/pdf" else ".html"
+        name = hashlib.sha1(path.encode("utf-8")).hexdigest()[:16] + extension
+        with open(os.path.join(self.directory, name), "wb") as f:
+            f.write(body)
+        self.entries[path] = {"file": name, "content_type": content_type}
+
+    def close(self):
+        with open(os.path.join(self.directory, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        return len(self.entries)
+
+def _request_path(url):
+    parts = urlsplit(url)
+    return parts.path + (f"?{parts.query}" if parts.query else "")
+
+def record(directory, pages):
+    """
+    Captures index pages 1..pages, every detail page they link and its PDF.
+    """
+    import crawler
+
+    origin = crawler.BASE_URL
+    writer = FixtureWriter(directory)
+    headers = crawler.BROWSER_HEADERS
+
+    def capture(url, content_type):
+        body = crawler.http_get(url, headers=headers, timeout=60).content
+        if content_type == "text/html":
+            body = body.replace(origin.encode(), b"")
+        writer.add(_request_path(url), content_type, body)
+        return body
+
+    for page in range(1, pages + 1):
+        html = capture(crawler.TARGET_URL_TEMPLATE.format(page), "text/html")
+        for item in crawler.parse_index_page(html):
+            try:
+                capture(item["link"], "text/html")
+                pdf_url = crawler.find_pdf_url(item["link"], headers)
+                if pdf_url:
+                    capture(pdf_url, "application/pdf")
+            except Exception as e:
+                print(f"   ⚠️ Skipped {item['link']}: {e}")
+    return writer.close()
+
+def generate(directory, pages, pdf_pages=3, scanned_every=0):
+    """
+    Writes the stub server's synthetic site as a fixture corpus.
+    """
+    from benchmarks import stub_server
+
+    writer = FixtureWriter(directory)
+    for page in range(1, pages + 1):
+        writer.add(f"/peraturan?page={page}", "text/html", stub_server.index_page(page).encode())
+        for i in range(stub_server.ITEMS_PER_PAGE):
+            number = 3000 - (page - 1) * stub_server.ITEMS_PER_PAGE - i
+            slug = f"keputusan-menteri-perdagangan-nomor-{number}-tahun-2025"
+            writer.add(f"/peraturan/{slug}", "text/html", stub_server.detail_page(slug).encode())
+            scanned = scanned_every and number % scanned_every == 0
+            pdf = stub_server.make_pdf([None if scanned else stub_server.regulation_text(number)] * pdf_pages)
+            writer.add(f"/files/peraturan/kepmendag-{number}.pdf", "application/pdf", pdf)
+    return writer.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("record", "generate"):
+        command = sub.add_parser(name)
+        command.add_argument("directory")
+        command.add_argument("--pages", type=int, default=2)
+        if name == "generate":
+            command.add_argument("--pdf-pages", type=int, default=3)
+            command.add_argument("--scanned-every", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        count = record(args.directory, args.pages)
+    else:
+        count = generate(args.directory, args.pages, args.pdf_pages, args.scanned_every)
+    print(f"Wrote {count} responses to {args.directory}")
+
+if __name__ == "__main__":
+    main()
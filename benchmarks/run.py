@@ -0,0 +1,233 @@
+"""
+Scan benchmark harness: times each stage of crawl -> extract -> analyze ->
+store against the local site stand-in and the stub LLM, and compares the
+numbers with a stored baseline.
+
+    python -m benchmarks.run                                        # synthetic site
+    python -m benchmarks.run --fixtures benchmarks/fixtures/jdih    # recorded corpus
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json    # exit 1 on regression
+
+Stages run one after another so each one's latency percentiles, throughput
+and peak Python memory (tracemalloc) are its own. Later rounds re-save the
+same links, so save_regulation measures the upsert path after round one.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.fixtures import FixtureCorpus
+from benchmarks.stub_llm import StubLLM
+from benchmarks.stub_server import StubServer
+
+# --- CONFIGURATION ---
+TOLERANCE = 0.5                  # allowed slowdown vs the baseline
+NOISE_FLOOR = {                  # absolute changes below these are never regressions
+    "p50_ms": 2.0,
+    "p90_ms": 2.0,
+    "ms_per_call": 2.0,          # derived from per_second
+    "peak_mb": 0.5,
+}
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q / 100 * (len(ordered) - 1)))]
+
+class Stage:
+    """
+    Times each call of one stage (across rounds) and tracks how far traced
+    memory peaks above what was allocated when the stage started.
+    """
+    def __init__(self, name, quiet=True):
+        self.name = name
+        self.quiet = quiet
+        self.durations = []
+        self.seconds = 0.0
+        self.peak_mb = 0.0
+
+    def __enter__(self):
+        tracemalloc.reset_peak()
+        self.baseline = tracemalloc.get_traced_memory()[0]
+        self.started = time.perf_counter()
+        return self
+
+    def call(self, fn, *args):
+        sink = io.StringIO() if self.quiet else sys.stdout
+        with contextlib.redirect_stdout(sink):   # crawler DEBUG prints
+            start = time.perf_counter()
+            result = fn(*args)
+            self.durations.append(time.perf_counter() - start)
+        return result
+
+    def __exit__(self, *exc):
+        self.seconds += time.perf_counter() - self.started
+        self.peak_mb = max(self.peak_mb, (tracemalloc.get_traced_memory()[1] - self.baseline) / 1e6)
+
+    def summary(self):
+        ms = [d * 1000 for d in self.durations] or [0.0]
+        return {
+            "calls": len(self.durations),
+            "p50_ms": round(percentile(ms, 50), 2),
+            "p90_ms": round(percentile(ms, 90), 2),
+            "p99_ms": round(percentile(ms, 99), 2),
+            "max_ms": round(max(ms), 2),
+            "per_second": round(len(self.durations) / self.seconds, 2) if self.seconds else 0.0,
+            "peak_mb": round(self.peak_mb, 2),
+        }
+
+STAGES = ("fetch_links_from_page", "extract_text_from_pdf", "analyze_regulation", "save_regulation")
+
+def run_round(args, stages, limiter):
+    import crawler
+    import database
+    import llm_processor
+
+    with stages["fetch_links_from_page"] as stage:
+        items = [item for page in range(1, args.pages + 1)
+                 for item in stage.call(crawler.fetch_links_from_page, page)]
+    items = items[:args.docs] if args.docs else items
+
+    with stages["extract_text_from_pdf"] as stage:
+        texts = [stage.call(crawler.extract_text_from_pdf, item["link"]) for item in items]
+
+    with stages["analyze_regulation"] as stage:
+        analyses = [stage.call(llm_processor.analyze_regulation, text, limiter) for text in texts]
+
+    with stages["save_regulation"] as stage:
+        for item, analysis in zip(items, analyses):
+            stage.call(database.save_regulation, {**item, **analysis})
+    return items, analyses
+
+def warm_up():
+    """
+    Loads what the stages import lazily on first use (pdfplumber, the Groq
+    SDK and its client), so one-off import cost stays out of the per-stage
+    time and memory peaks, as it was when these were imported eagerly.
+    """
+    import pdfplumber
+    import llm_backends
+
+    for backend in llm_backends.get_router().backends:
+        if isinstance(backend, llm_backends.GroqBackend):
+            backend.client()
+
+def run_benchmark(args, site, llm):
+    import crawler
+    import database
+    import llm_processor
+
+    crawler.BASE_URL = site.base_url
+    crawler.TARGET_URL_TEMPLATE = site.base_url + "/peraturan?page={}"
+    crawler.USE_HTTP_CACHE = False          # measure the network path, not the cache
+    llm_processor.USE_RESULT_CACHE = False
+    limiter = llm_processor.RateLimiter(10 ** 6, 10 ** 9)
+    database.init_db()
+    warm_up()
+
+    stages = {name: Stage(name, quiet=not args.verbose) for name in STAGES}
+    for _ in range(args.rounds):
+        items, analyses = run_round(args, stages, limiter)
+
+    read_failed = sum(1 for a in analyses if a.get("english_title") == "PDF Read Failed")
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "corpus": args.fixtures or "synthetic",
+            "pages": args.pages,
+            "documents": len(items),
+            "rounds": args.rounds,
+            "llm_latency": args.llm_latency,
+            "site_delay": args.delay,
+        },
+        "stages": {name: stage.summary() for name, stage in stages.items()},
+        "sqlite_rows_per_second": stages["save_regulation"].summary()["per_second"],
+        "read_failed": read_failed,
+        "site_requests": site.requests,
+        "llm_requests": llm.requests,
+    }
+
+def compare(results, baseline, tolerance):
+    """
+    Returns human-readable regressions of `results` against `baseline`.
+    """
+    regressions = []
+    for name, base in baseline["stages"].items():
+        current = results["stages"].get(name)
+        if not current:
+            continue
+        for metric, floor in NOISE_FLOOR.items():
+            if metric == "ms_per_call":
+                before, after = (1000 / s["per_second"] if s["per_second"] else 0.0 for s in (base, current))
+            else:
+                before, after = base[metric], current[metric]
+            if after > before * (1 + tolerance) and after - before > floor:
+                regressions.append(f"{name} {metric}: {before:.2f} -> {after:.2f}")
+    if baseline.get("environment") != results["environment"]:
+        print("⚠️ Baseline was recorded with a different setup; comparison is indicative only.")
+    return regressions
+
+def print_report(results):
+    print(f"\n{'stage':<24}{'calls':>6}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}{'per s':>9}{'peak MB':>9}")
+    for name, s in results["stages"].items():
+        print(f"{name:<24}{s['calls']:>6}{s['p50_ms']:>9.1f}{s['p90_ms']:>9.1f}{s['p99_ms']:>9.1f}"
+              f"{s['max_ms']:>9.1f}{s['per_second']:>9.1f}{s['peak_mb']:>9.2f}")
+    print(f"\nSQLite writes: {results['sqlite_rows_per_second']:.0f} rows/s, "
+          f"PDF Read Failed: {results['read_failed']}/{results['environment']['documents']}, "
+          f"site requests: {results['site_requests']}, LLM requests: {results['llm_requests']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", help="fixture corpus directory (default: synthetic stub site)")
+    parser.add_argument("--pages", type=int, default=2, help="index pages to crawl")
+    parser.add_argument("--docs", type=int, default=0, help="cap on documents (0 = all found)")
+    parser.add_argument("--rounds", type=int, default=3, help="repeat the scan to steady the percentiles")
+    parser.add_argument("--delay", type=float, default=0.0, help="simulated site latency (s)")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="stub LLM response time (s)")
+    parser.add_argument("--baseline", help="compare with this baseline JSON")
+    parser.add_argument("--save-baseline", help="write the results as a new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--json", help="also write the results here")
+    parser.add_argument("--verbose", action="store_true", help="show crawler output")
+    args = parser.parse_args()
+
+    fixtures = FixtureCorpus(args.fixtures) if args.fixtures else None
+    with tempfile.TemporaryDirectory() as tmp, \
+            StubServer(delay=args.delay, fixtures=fixtures) as site, \
+            StubLLM(latency=args.llm_latency) as llm:
+        os.environ["GROQ_BASE_URL"] = llm.base_url
+        os.environ.setdefault("GROQ_API_KEY", "stub")
+        import database
+        database.DB_FILE = os.path.join(tmp, "bench.db")
+
+        tracemalloc.start()
+        results = run_benchmark(args, site, llm)
+        tracemalloc.stop()
+
+    print_report(results)
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+            print(f"Results written to {path}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"\n✅ Within {args.tolerance:.0%} of {args.baseline}")
+
+if __name__ == "__main__":
+    main()
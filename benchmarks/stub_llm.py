@@ -0,0 +1,145 @@
+"""
+Local stand-in for the Groq chat completions API (OpenAI-compatible).
+
+Answers POST /openai/v1/chat/completions with a canned JSON analysis (or
+one entry per "### DOCUMENT n" block for packed requests), after a
+configurable latency (a `slow_rate` share of requests takes
+`slow_latency` instead, and a `fail_rate` share answers 500, to model
+a provider's tail and outages). It enforces a requests-per-minute and
+tokens-per-minute budget like the real service: x-ratelimit-* headers on
+every reply and 429 + retry-after once a budget is exhausted.
+
+    with StubLLM(latency=0.2) as llm:
+        os.environ["GROQ_BASE_URL"] = llm.base_url   # before importing llm_processor
+"""
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def fake_analysis(text):
+    number = re.search(r"NOMOR (\d+)", text)
+    return {
+        "english_title": f"Minister of Trade Decree No. {number.group(1) if number else '?'}",
+        "status": "New",
+        "commodity": "Crude Palm Oil" if "Palm" in text else "General",
+        "vpti_impact": "Medium",
+        "key_changes": "Sets the export reference price.",
+        "action_required": "Apply the new reference price."
+    }
+
+class StubLLM:
+    def __init__(self, latency=0.0, requests_per_minute=None, tokens_per_minute=None,
+                 slow_rate=0.0, slow_latency=0.0, fail_rate=0.0, seed=0):
+        self.latency = latency
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.fail_rate = fail_rate
+        self.failures = 0
+        self._random = random.Random(seed)
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.requests = 0
+        self.rate_limited = 0
+        self.documents = 0
+        self._window = deque()
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def _admit(self, tokens):
+        """
+        Returns (allowed, headers) under the sliding one-minute budgets.
+        """
+        with self._lock:
+            now = time.monotonic()
+            while self._window and now - self._window[0][0] >= 60:
+                self._window.popleft()
+            used = sum(t for _, t in self._window)
+            reset = f"{60 - (now - self._window[0][0]):.2f}s" if self._window else "0s"
+            over_requests = self.requests_per_minute and len(self._window) >= self.requests_per_minute
+            over_tokens = self.tokens_per_minute and used + tokens > self.tokens_per_minute and self._window
+            headers = {}
+            if self.requests_per_minute:
+                headers["x-ratelimit-remaining-requests"] = str(max(0, self.requests_per_minute - len(self._window) - 1))
+                headers["x-ratelimit-reset-requests"] = reset
+            if self.tokens_per_minute:
+                headers["x-ratelimit-remaining-tokens"] = str(max(0, self.tokens_per_minute - used - tokens))
+                headers["x-ratelimit-reset-tokens"] = reset
+            if over_requests or over_tokens:
+                self.rate_limited += 1
+                headers["retry-after"] = reset[:-1]
+                return False, headers
+            self._window.append((now, tokens))
+            self.requests += 1
+            return True, headers
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                user = body["messages"][-1]["content"]
+                allowed, headers = stub._admit(len(json.dumps(body)) // 4)
+                if not allowed:
+                    return self._reply(429, {"error": {"message": "Rate limit reached", "type": "tokens"}}, headers)
+
+                with stub._lock:
+                    roll = stub._random.random()
+                    slow = stub._random.random() < stub.slow_rate
+                    stub.failures += roll < stub.fail_rate
+                if roll < stub.fail_rate:
+                    return self._reply(500, {"error": {"message": "Internal server error"}}, headers)
+                latency = stub.slow_latency if slow else stub.latency
+                if latency:
+                    time.sleep(latency)
+                blocks = re.split(r"### DOCUMENT (\d+)\n", user)
+                if len(blocks) > 1:
+                    results = [{"doc_id": int(doc_id), **fake_analysis(text)}
+                               for doc_id, text in zip(blocks[1::2], blocks[2::2])]
+                    content = {"results": results}
+                else:
+                    results = [None]
+                    content = fake_analysis(user)
+                with stub._lock:
+                    stub.documents += len(results)
+                self._reply(200, {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": json.dumps(content)}}],
+                    "usage": {"prompt_tokens": len(user) // 4, "completion_tokens": 60 * len(results),
+                              "total_tokens": len(user) // 4 + 60 * len(results)},
+                }, headers)
+
+            def _reply(self, status, payload, headers):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,210 @@
+"""
+Local stand-in for jdih.kemendag.go.id used by the benchmarks.
+
+Serves canned index pages, detail pages and small generated PDFs (or a
+recorded fixture corpus, see benchmarks/fixtures.py) over HTTP/1.1
+keep-alive with ETags (If-None-Match -> 304), with an optional
+per-request delay to mimic a remote server and an optional share of 503
+answers to mimic a flaky one, and counts connections, requests, 304s,
+failures and body bytes sent.
+"""
+import hashlib
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import time
+
+ITEMS_PER_PAGE = 10
+
+MONTHS = ["Januari", "Februari", "Maret", "April", "Mei", "Juni", "Juli",
+          "Agustus", "September", "Oktober", "November", "Desember"]
+
+def make_pdf(pages):
+    """
+    Builds a minimal valid PDF (Helvetica text, one string list per page).
+    A page given as None is an image-only "scanned" page with no text layer.
+    """
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        if lines is None:
+            pixels = "".join(chr(0x40 + (i % 0x80)) for i in range(64 * 64))
+            objects.append(f"<< /Type /XObject /Subtype /Image /Width 64 /Height 64 /ColorSpace /DeviceGray "
+                           f"/BitsPerComponent 8 /Length {len(pixels)} >>\nstream\n{pixels}\nendstream")
+            image_id = len(objects)
+            stream = "q 495 0 0 742 50 50 cm /Im1 Do Q"
+            resources = f"<< /XObject << /Im1 {image_id} 0 R >> >>"
+        else:
+            stream = "BT /F1 10 Tf 50 780 Td 12 TL\n"
+            for line in lines:
+                escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+                stream += f"({escaped}) Tj T*\n"
+            stream += "ET"
+            resources = "<< /Font << /F1 3 0 R >> >>"
+        objects.append(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+        content_id = len(objects)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources {resources} /Contents {content_id} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref_at = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_at}\n%%EOF\n".encode("latin-1")
+    return out
+
+def regulation_text(number, year=2025):
+    return [
+        "MENTERI PERDAGANGAN REPUBLIK INDONESIA",
+        f"KEPUTUSAN MENTERI PERDAGANGAN NOMOR {number} TAHUN {year}",
+        "TENTANG HARGA PATOKAN EKSPOR ATAS PRODUK PERTANIAN DAN KEHUTANAN",
+        "Menimbang : bahwa untuk melaksanakan ketentuan Pasal 3 ayat (1)",
+        "Mengingat : Undang-Undang Nomor 7 Tahun 2014 tentang Perdagangan",
+        "MEMUTUSKAN:",
+        "Menetapkan : KEPUTUSAN MENTERI PERDAGANGAN TENTANG HARGA PATOKAN EKSPOR",
+        f"KESATU : Harga Referensi Crude Palm Oil ditetapkan sebesar US$ {900 + number % 100}/MT.",
+        "KEDUA : Keputusan Menteri ini mulai berlaku pada tanggal ditetapkan.",
+        f"Ditetapkan di Jakarta pada tanggal {1 + number % 28} {MONTHS[number % 12]} {year}",
+    ]
+
+def index_page(page, items_per_page=ITEMS_PER_PAGE):
+    cards = []
+    for i in range(items_per_page):
+        number = 3000 - (page - 1) * items_per_page - i
+        day = 1 + number % 28
+        month = MONTHS[number % 12]
+        cards.append(f"""
+        <div class="card">
+          <div class="card-body">
+            <span class="badge">Keputusan Menteri</span>
+            <a href="/peraturan/keputusan-menteri-perdagangan-nomor-{number}-tahun-2025">
+              Keputusan Menteri Perdagangan Nomor {number} Tahun 2025 tentang Harga Patokan Ekspor
+            </a>
+            <p class="text-muted">Ditetapkan {day} {month} 2025</p>
+            <a href="/peraturan/keputusan-menteri-perdagangan-nomor-{number}-tahun-2025">DETAIL</a>
+          </div>
+        </div>""")
+    nav = "".join(f'<a href="/peraturan?page={p}">{p}</a>' for p in range(1, 6))
+    return f"<html><body><nav>{nav}</nav>{''.join(cards)}</body></html>"
+
+def detail_page(slug):
+    number = slug.split("nomor-")[-1].split("-")[0]
+    return (f"<html><body><h1>{slug}</h1>"
+            f'<a href="/files/peraturan/kepmendag-{number}.pdf">Unduh</a></body></html>')
+
+class StubServer:
+    """
+    Runs the stand-in site on 127.0.0.1 in a background thread.
+
+        with StubServer(delay=0.05) as server:
+            crawler.BASE_URL = server.base_url
+    """
+    def __init__(self, delay=0.0, pdf_pages=3, fixtures=None, fail_rate=0.0, seed=0):
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.failures = 0
+        self._random = random.Random(seed)
+        self.pdf_pages = pdf_pages
+        self.fixtures = fixtures
+        self.connections = 0
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._pdf_cache = {}
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def pdf_for(self, number):
+        if number not in self._pdf_cache:
+            self._pdf_cache[number] = make_pdf([regulation_text(number)] * self.pdf_pages)
+        return self._pdf_cache[number]
+
+    def route(self, path):
+        """
+        Returns (status, content_type, body) for a request path.
+        """
+        if self.fixtures:
+            recorded = self.fixtures.get(path)
+            if recorded:
+                return (200, *recorded)
+            if path.startswith("/peraturan?page="):
+                return 200, "text/html", b"<html><body></body></html>"   # past the recorded pages
+            return 404, "text/plain", b"not found"
+        if path.startswith("/peraturan?page="):
+            return 200, "text/html", index_page(int(path.split("=")[-1])).encode()
+        if path.startswith("/peraturan/"):
+            return 200, "text/html", detail_page(path.rsplit("/", 1)[-1]).encode()
+        if path.startswith("/files/") and path.endswith(".pdf"):
+            number = int(path.rsplit("-", 1)[-1][:-4])
+            return 200, "application/pdf", self.pdf_for(number)
+        return 404, "text/plain", b"not found"
+
+    def reset_counters(self):
+        with self._lock:
+            self.connections = 0
+            self.requests = 0
+            self.not_modified = 0
+            self.failures = 0
+            self.bytes_sent = 0
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                if server.delay:
+                    time.sleep(server.delay)
+                with server._lock:
+                    fail = server.fail_rate and server._random.random() < server.fail_rate
+                    server.failures += bool(fail)
+                status, content_type, body = (503, "text/plain", b"busy") if fail else server.route(self.path)
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                if status == 200 and self.headers.get("If-None-Match") == etag:
+                    with server._lock:
+                        server.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                if status == 200:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+                with server._lock:
+                    server.bytes_sent += len(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
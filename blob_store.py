@@ -0,0 +1,350 @@
+"""
+Compressed, content-addressed archive of source PDFs and extracted text.
+
+Objects live on disk next to regulations.db (the database only stores their
+SHA-256 in regulation_blobs), so the hot tables stay small:
+
+    blobs/objects/3f/3fa9...e1.zst     one compressed object per distinct content
+    blobs/dictionaries/<id>.zstd       trained dictionaries, by dictionary id
+
+The same content is stored once however many regulations or re-scans point
+at it. Texts are compressed with a dictionary trained on earlier texts
+(decrees share letterheads, recitals and legal formulas, so small documents
+compress several times better); each object records the id of its
+dictionary, so retraining never breaks older objects. Objects are read
+back as streams over an mmap of the file.
+
+zstd needs the `zstandard` package (`pip install zstandard`); without it
+objects are zlib streams with a preset dictionary (".zz"), which any Python
+can read.
+
+    python blob_store.py train     # retrain the text dictionary on stored texts
+    python blob_store.py stats
+    python blob_store.py gc        # drop objects no regulation points at
+
+The first dictionary is trained by the scan that stores DICT_MIN_SAMPLES
+texts (database.train_text_dictionary).
+"""
+import argparse
+import collections
+import contextlib
+import hashlib
+import io
+import mmap
+import os
+import tempfile
+import threading
+import time
+import zlib
+
+try:
+    import zstandard as zstd
+except ImportError:    # zlib fallback, see module docstring
+    zstd = None
+
+# --- CONFIGURATION ---
+BLOB_DIR = "blobs"
+ZSTD_LEVEL = 9
+ZLIB_LEVEL = 9
+DICT_SIZE = 64 * 1024          # zlib only uses the last 32 KB of its preset dictionary
+DICT_MIN_SAMPLES = 20          # texts needed before a dictionary is worth training
+DICT_SAMPLES = 2000            # most recent texts a dictionary is trained on
+CHUNK_SIZE = 64 * 1024
+
+class _InflateReader(io.RawIOBase):
+    """
+    Read-only stream decompressing a zlib buffer (e.g. an mmap) chunk by chunk.
+    """
+    def __init__(self, buffer, zdict=None):
+        self._view = memoryview(buffer)
+        self._offset = 0
+        self._inflater = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+        self._pending = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while not self._pending and not self._inflater.eof and self._offset < len(self._view):
+            chunk = self._view[self._offset:self._offset + CHUNK_SIZE]
+            self._offset += len(chunk)
+            self._pending = self._inflater.decompress(chunk)
+        data, self._pending = self._pending[:len(target)], self._pending[len(target):]
+        target[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self._view.release()
+        super().close()
+
+def _zlib_dictionary_id(header):
+    # RFC 1950: FDICT (bit 5 of FLG) announces a 4-byte Adler-32 of the dictionary
+    return int.from_bytes(header[2:6], "big") if len(header) >= 6 and header[1] & 0x20 else None
+
+def _frequent_lines(samples, size):
+    """
+    zlib preset dictionary: the lines most texts share, the most common last
+    (closest to the data, so cheapest to reference).
+    """
+    counts = collections.Counter()
+    for sample in samples:
+        counts.update({line.strip() for line in sample.decode("utf-8", "replace").splitlines() if len(line) > 8})
+    common = [line for line, count in counts.most_common() if count > 1]
+    chosen, total = [], 0
+    for line in common:
+        total += len(line.encode("utf-8")) + 1
+        if total > size:
+            break
+        chosen.append(line)
+    return "\n".join(reversed(chosen)).encode("utf-8")
+
+class BlobStore:
+    """
+    Objects addressed by the SHA-256 of their content. Safe to share between
+    threads: objects are written to a temp file and renamed into place.
+    """
+    def __init__(self, root=BLOB_DIR):
+        self.root = root
+        self.codec = "zstd" if zstd else "zlib"
+        self.suffix = ".zst" if zstd else ".zz"
+        self.object_dir = os.path.join(root, "objects")
+        self.dictionary_dir = os.path.join(root, "dictionaries")
+        os.makedirs(self.object_dir, exist_ok=True)
+        os.makedirs(self.dictionary_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._dictionaries = {}        # (codec, id) -> bytes
+        self._current = self._read_current()
+
+    # --- dictionaries ---
+    def _dictionary_path(self, codec, dictionary_id):
+        return os.path.join(self.dictionary_dir, f"{dictionary_id}.{codec}")
+
+    def _read_current(self):
+        try:
+            with open(os.path.join(self.dictionary_dir, f"CURRENT.{self.codec}")) as f:
+                return int(f.read().strip())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _dictionary(self, codec, dictionary_id):
+        key = (codec, dictionary_id)
+        with self._lock:
+            if key not in self._dictionaries:
+                try:
+                    with open(self._dictionary_path(codec, dictionary_id), "rb") as f:
+                        self._dictionaries[key] = f.read()
+                except FileNotFoundError:
+                    raise LookupError(f"{codec} dictionary {dictionary_id} is missing from {self.dictionary_dir}")
+            return self._dictionaries[key]
+
+    def train(self, samples, size=DICT_SIZE):
+        """
+        Trains a text dictionary on `samples` (bytes) and makes it the one new
+        texts are compressed with. Returns its id, or None with too few samples.
+        """
+        samples = [s for s in samples if s]
+        if len(samples) < DICT_MIN_SAMPLES:
+            return None
+        if zstd:
+            try:
+                data = zstd.train_dictionary(size, samples).as_bytes()
+            except zstd.ZstdError:
+                return None    # not enough distinct content to learn from
+            dictionary_id = zstd.ZstdCompressionDict(data).dict_id()
+        else:
+            data = _frequent_lines(samples, min(size, 32 * 1024))
+            if not data:
+                return None
+            dictionary_id = zlib.adler32(data)
+        self._write_atomic(self._dictionary_path(self.codec, dictionary_id), [data])
+        self._write_atomic(os.path.join(self.dictionary_dir, f"CURRENT.{self.codec}"),
+                           [str(dictionary_id).encode()])
+        with self._lock:
+            self._current = dictionary_id
+        return dictionary_id
+
+    @property
+    def dictionary_id(self):
+        return self._current
+
+    # --- objects ---
+    def object_path(self, digest, suffix=None):
+        return os.path.join(self.object_dir, digest[:2], digest + (suffix or self.suffix))
+
+    def _find(self, digest):
+        for suffix in (".zst", ".zz"):
+            path = self.object_path(digest, suffix)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def exists(self, digest):
+        return self._find(digest) is not None
+
+    def _reuse(self, digest):
+        """
+        True if the object is already stored; its mtime is bumped so gc
+        treats it as just written.
+        """
+        path = self._find(digest)
+        if path is None:
+            return False
+        try:
+            os.utime(path)
+        except FileNotFoundError:   # pruned meanwhile
+            return False
+        return True
+
+    def _write_atomic(self, path, chunks):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                for chunk in chunks:
+                    tmp.write(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _compressed(self, chunks, use_dictionary):
+        """
+        Yields the compressed form of a stream of byte chunks.
+        """
+        dictionary_id = self._current if use_dictionary else None
+        zdict = self._dictionary(self.codec, dictionary_id) if dictionary_id is not None else None
+        if zstd:
+            params = {"dict_data": zstd.ZstdCompressionDict(zdict)} if zdict else {}
+            compressor = zstd.ZstdCompressor(level=ZSTD_LEVEL, **params).compressobj()
+        else:
+            compressor = zlib.compressobj(ZLIB_LEVEL, zdict=zdict) if zdict else zlib.compressobj(ZLIB_LEVEL)
+        for chunk in chunks:
+            out = compressor.compress(chunk)
+            if out:
+                yield out
+        yield compressor.flush()
+
+    def put(self, data, use_dictionary=True):
+        """
+        Stores bytes (compressed with the text dictionary unless told not
+        to) and returns their digest. Storing known content is a no-op.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        if not self._reuse(digest):
+            self._write_atomic(self.object_path(digest), self._compressed([data], use_dictionary))
+        return digest
+
+    def put_text(self, text):
+        return self.put(text.encode("utf-8"))
+
+    def put_file(self, path, digest=None):
+        """
+        Streams a file (e.g. a downloaded PDF) into the store without a
+        dictionary. `digest` skips re-hashing when the caller already has the
+        file's SHA-256. Returns (digest, size in bytes).
+        """
+        if digest is None:
+            sha = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    sha.update(chunk)
+            digest = sha.hexdigest()
+        if not self._reuse(digest):
+            with open(path, "rb") as f:
+                self._write_atomic(self.object_path(digest),
+                                   self._compressed(iter(lambda: f.read(CHUNK_SIZE), b""), use_dictionary=False))
+        return digest, os.path.getsize(path)
+
+    @contextlib.contextmanager
+    def open(self, digest):
+        """
+        A readable stream of one object's original bytes, decompressed on
+        the fly from an mmap of the stored file. Raises KeyError if unknown.
+        """
+        path = self._find(digest)
+        if path is None:
+            raise KeyError(digest)
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if path.endswith(".zst"):
+                if zstd is None:
+                    raise RuntimeError(f"{path} is zstd-compressed: pip install zstandard")
+                dictionary_id = zstd.get_frame_parameters(mapped[:18]).dict_id
+                params = {"dict_data": zstd.ZstdCompressionDict(self._dictionary("zstd", dictionary_id))} \
+                    if dictionary_id else {}
+                reader = zstd.ZstdDecompressor(**params).stream_reader(mapped)
+            else:
+                dictionary_id = _zlib_dictionary_id(mapped[:6])
+                zdict = self._dictionary("zlib", dictionary_id) if dictionary_id is not None else None
+                reader = io.BufferedReader(_InflateReader(mapped, zdict), CHUNK_SIZE)
+            try:
+                yield reader
+            finally:
+                reader.close()
+
+    def get(self, digest):
+        with self.open(digest) as reader:
+            return reader.read()
+
+    def get_text(self, digest):
+        return self.get(digest).decode("utf-8")
+
+    def digests(self):
+        for prefix in os.listdir(self.object_dir):
+            for name in os.listdir(os.path.join(self.object_dir, prefix)):
+                if not name.endswith(".part"):
+                    yield os.path.splitext(name)[0]
+
+    def stored_bytes(self):
+        return sum(os.path.getsize(self._find(digest)) for digest in self.digests())
+
+    def prune(self, keep, written_before=None):
+        """
+        Deletes every object whose digest is not in `keep`, sparing those
+        written (or re-stored) at or after `written_before` (Unix time) that
+        a running scan may not have linked yet. Returns how many.
+        """
+        removed = 0
+        for digest in list(self.digests()):
+            path = self._find(digest)
+            if digest in keep or path is None:
+                continue
+            if written_before is not None and os.path.getmtime(path) >= written_before:
+                continue
+            os.remove(path)
+            removed += 1
+        return removed
+
+def main():
+    import database   # the store itself never needs the database
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["train", "stats", "gc"])
+    args = parser.parse_args()
+
+    database.init_db()
+    store = database.get_blob_store()
+    if args.command == "train":
+        samples = [store.get(digest) for digest in database.get_blob_digests("text", limit=DICT_SAMPLES)]
+        dictionary_id = store.train(samples)
+        if dictionary_id is None:
+            print(f"⚠️ Not enough stored texts to train on ({len(samples)}, need {DICT_MIN_SAMPLES}).")
+        else:
+            print(f"📚 Trained {store.codec} dictionary {dictionary_id} on {len(samples)} texts.")
+    elif args.command == "stats":
+        stats = database.get_blob_stats()
+        stored = store.stored_bytes()
+        for kind, row in stats.items():
+            print(f"{kind}: {row['references']} references to {row['objects']} objects, {row['bytes'] / 1e6:.1f} MB raw")
+        raw = sum(row["bytes"] for row in stats.values())
+        print(f"📦 {stored / 1e6:.1f} MB on disk in {store.root} ({store.codec}, "
+              f"dictionary {store.dictionary_id}), ratio {raw / stored if stored else 0:.1f}x")
+    else:
+        # Objects from a scan still running may not be linked to their regulation yet
+        started = database.get_running_job_start()
+        cutoff = min(started, time.time()) if started else time.time()
+        removed = store.prune(set(database.get_blob_digests()), written_before=cutoff)
+        print(f"🧹 Removed {removed} unreferenced objects.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Deterministic pre-LLM condenser for JDIH regulation text.
+
+An Indonesian ministerial regulation is laid out as
+
+    letterhead + title  (KEPUTUSAN MENTERI PERDAGANGAN ... NOMOR .. TAHUN .. TENTANG ..)
+    Menimbang           considerations
+    Mengingat           list of prior laws (often pages long)
+    Memperhatikan       (optional)
+    MEMUTUSKAN / Menetapkan
+    KESATU.. / Pasal 1..    the operative text
+    Ditetapkan di Jakarta pada tanggal ..   + signature / "Salinan sesuai" block
+    LAMPIRAN            appendix (price tables, HS code lists)
+
+condense() keeps a metadata header (kind, number, year, subject, issuing
+date), the first consideration, the operative text and as much appendix as
+fits, and drops the rest. Text without this structure, or already
+annotated with a "[...]" note line like the pipeline's amendment and
+recurring-decree prompts, is returned unchanged, only capped.
+"""
+import re
+
+# --- CONFIGURATION ---
+CONSIDERATION_CHARS = 300      # of the first "Menimbang" point, for the purpose
+APPENDIX_SHARE = 0.3           # of the budget the appendix may use when the operative text is long
+
+MONTHS = {
+    "januari": "01", "februari": "02", "maret": "03", "april": "04", "mei": "05", "juni": "06",
+    "juli": "07", "agustus": "08", "september": "09", "oktober": "10", "november": "11", "desember": "12"
+}
+
+FLAGS = re.IGNORECASE | re.MULTILINE
+MENIMBANG = re.compile(r"^\s*Menimbang\b\s*:?", FLAGS)
+MENGINGAT = re.compile(r"^\s*Mengingat\b", FLAGS)
+MEMPERHATIKAN = re.compile(r"^\s*Memperhatikan\b", FLAGS)
+# Often letter-spaced in the PDF: "M E M U T U S K A N :"
+MEMUTUSKAN = re.compile(r"^\s*M\s*E\s*M\s*U\s*T\s*U\s*S\s*K\s*A\s*N\s*:?", FLAGS)
+# Case-sensitive with its colon: a wrapped recital line may start with "menetapkan Keputusan ..."
+MENETAPKAN = re.compile(r"^\s*Menetapkan\s*:", re.MULTILINE)
+CLOSING = re.compile(r"^\s*(?:Ditetapkan|Diundangkan)\s+di\b", FLAGS)
+APPENDIX = re.compile(r"^\s*LAMPIRAN\b", re.MULTILINE)   # upper case: "Lampiran" mid-sentence is a reference
+
+KIND = re.compile(r"^\s*((?:PERATURAN|KEPUTUSAN|INSTRUKSI|SURAT\s+EDARAN)\s+[A-Z ]+?)\s*(?:\bNOMOR\b|$)",
+                  re.MULTILINE)
+NUMBER = re.compile(r"\bNOMOR\s*:?\s*([\w./-]+)\s+TAHUN\s+(\d{4})", re.IGNORECASE)
+SUBJECT = re.compile(r"\bTENTANG\s+(.+?)\s*(?:DENGAN\s+RAHMAT|$)", re.IGNORECASE | re.DOTALL)
+ISSUED = re.compile(r"(?:Ditetapkan|Diundangkan)\s+di\s+\w+\s+pada\s+tanggal\s+(\d{1,2})\s+(\w+)\s+(\d{4})",
+                    re.IGNORECASE)
+
+# Lines that repeat on every page or only carry layout
+NOISE_LINES = re.compile(
+    r"^\s*(?:-\s*\d+\s*-|\d+\s*/\s*\d+|halaman\s+\d+.*|www\.\S+|SALINAN|ttd\.?|Paraf.*)\s*$", FLAGS)
+SIGNATURE_TAIL = re.compile(r"^\s*Salinan\s+sesuai\s+dengan\s+aslinya\b", FLAGS)
+NOTE_LINE = re.compile(r"^\[", re.MULTILINE)
+
+def _first(pattern, text, start=0):
+    match = pattern.search(text, start)
+    return match.start() if match else None
+
+def _clean(text):
+    text = NOISE_LINES.sub("", text)
+    text = re.sub(r"[ \t]+", " ", text)
+    return re.sub(r"\n\s*\n+", "\n", text).strip()
+
+def metadata(text):
+    """
+    {kind, number, year, subject, issued} read from the title block and the
+    closing "Ditetapkan di .. pada tanggal .." line; missing ones are left out.
+    """
+    head_end = _first(MENIMBANG, text)
+    head = text[:head_end] if head_end is not None else text[:1500]
+    meta = {}
+    kind = KIND.search(head)
+    if kind:
+        meta["kind"] = re.sub(r"\s+", " ", kind.group(1))
+    number = NUMBER.search(head)
+    if number:
+        meta["number"], meta["year"] = number.groups()
+    subject = SUBJECT.search(head)
+    if subject:
+        meta["subject"] = re.sub(r"\s+", " ", subject.group(1)).strip()[:300]
+    issued = ISSUED.search(text)
+    if issued and issued.group(2).lower() in MONTHS:
+        day, month, year = issued.groups()
+        meta["issued"] = f"{year}-{MONTHS[month.lower()]}-{day.zfill(2)}"
+    return meta
+
+def segment(text):
+    """
+    Splits regulation text into {consideration, legal_basis, operative,
+    appendix}; returns None when there is no "MEMUTUSKAN/Menetapkan" part
+    or a note line precedes it.
+    """
+    decide = _first(MEMUTUSKAN, text)
+    if decide is None:
+        decide = _first(MENETAPKAN, text)
+    if decide is None or NOTE_LINE.search(text, 0, decide):
+        return None
+    closing = _first(CLOSING, text, decide)
+    appendix = _first(APPENDIX, text, closing if closing is not None else decide)
+    end = closing if closing is not None else appendix if appendix is not None else len(text)
+
+    considering = _first(MENIMBANG, text)
+    basis = _first(MENGINGAT, text)
+    consideration = ""
+    if considering is not None and considering < decide:
+        stops = [p for p in (basis, _first(MEMPERHATIKAN, text), _first(MEMUTUSKAN, text), decide)
+                 if p is not None and p > considering]
+        consideration = text[considering:min(stops)]
+    tail = text[appendix:] if appendix is not None else ""
+    signature = _first(SIGNATURE_TAIL, tail)
+    return {
+        "consideration": _clean(MENIMBANG.sub("", consideration, count=1)),
+        "legal_basis": _clean(text[basis:decide]) if basis is not None and basis < decide else "",
+        "operative": _clean(text[decide:end]),
+        "appendix": _clean(tail[:signature] if signature else tail),
+    }
+
+def condense(text, max_chars):
+    """
+    The prompt text for one document: metadata header, purpose, operative
+    text and appendix, at most `max_chars` long.
+    """
+    parts = segment(text)
+    if parts is None:
+        return text[:max_chars]
+
+    meta = metadata(text)
+    header = []
+    if meta.get("kind") or meta.get("number"):
+        header.append(" ".join(filter(None, [meta.get("kind"), meta.get("number") and
+                                             f"Nomor {meta['number']} Tahun {meta['year']}"])))
+    if meta.get("subject"):
+        header.append(f"Tentang: {meta['subject']}")
+    if meta.get("issued"):
+        header.append(f"Ditetapkan: {meta['issued']}")
+    if parts["consideration"]:
+        header.append(f"Menimbang: {parts['consideration'][:CONSIDERATION_CHARS]}")
+    head = "\n".join(header) + "\n\n"
+
+    budget = max_chars - len(head)
+    appendix = parts["appendix"]
+    operative_budget = budget - min(len(appendix), int(budget * APPENDIX_SHARE)) if appendix else budget
+    operative = parts["operative"][:max(operative_budget, 0)]
+    appendix_budget = budget - len(operative) - len("\n\n")
+    body = operative
+    if appendix and appendix_budget > 0:
+        body += "\n\n" + appendix[:appendix_budget]
+    return (head + body)[:max_chars]
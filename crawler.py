@@ -1,129 +1,540 @@
 import requests
-from bs4 import BeautifulSoup
-import pdfplumber
-import io
-import datetime
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup, UnicodeDammit
+import os
+import random
 import re
+import tempfile
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from http_cache import HttpCache
+import metrics
+
+try:
+    from lxml import html as lxml_html
+except ImportError:
+    lxml_html = None
 
 # --- CORRECTED CONFIGURATION ---
 BASE_URL = "https://jdih.kemendag.go.id"
 # RESTORED TO THE PATTERN THAT WORKS:
 TARGET_URL_TEMPLATE = "https://jdih.kemendag.go.id/peraturan?page={}" 
 
+# --- CONNECTION POOL ---
+MAX_CONNECTIONS_PER_HOST = 4   # keep-alive sockets per host, also caps concurrency
+INDEX_FETCH_WORKERS = 4        # index pages fetched in parallel
+
+# --- RESILIENCE ---
+HTTP_MAX_ATTEMPTS = 4              # per request, on connection errors / timeouts / 429 / 5xx
+RETRY_BASE_DELAY = 1.0             # seconds; doubles per attempt, full jitter
+RETRY_MAX_DELAY = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+BREAKER_THRESHOLD = 5              # consecutive failures that open a host's circuit
+BREAKER_COOLDOWN = 60              # seconds an open circuit pauses traffic to the host
+PDF_TIMEOUT = (10, 30)             # (connect, per-read) seconds for PDF downloads
+DOCUMENT_DEADLINE = 180            # total seconds for one document's detail page + PDF
+
+# --- PDF EXTRACTION ---
+MAX_PDF_BYTES = 50 * 1024 * 1024   # refuse downloads bigger than this
+PDF_MAX_PAGES = 3                  # only the opening pages carry the decision
+PDF_PAGE_TIMEOUT = 20              # seconds per page (enforced in worker processes)
+MAX_TEXT_CHARS = 15000             # what analyze_regulation sends to the LLM
+SPOOL_PREFIX = "jdih-pdf-"
+
+BROWSER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """
+    Shared requests.Session so index pages, detail pages and PDFs reuse
+    keep-alive connections instead of a new TCP+TLS handshake per request.
+    pool_block=True makes callers wait for a free socket, which caps
+    per-host concurrency at MAX_CONNECTIONS_PER_HOST.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_CONNECTIONS_PER_HOST, pool_block=True)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+class CircuitOpenError(requests.ConnectionError):
+    pass
+
+class Deadline:
+    """
+    A total time budget shared by every request made for one unit of work.
+    """
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self):
+        return self.expires - time.monotonic()
+
+    def check(self):
+        if self.remaining() <= 0:
+            raise DeadlineExceeded(f"gave up after the {self.seconds}s deadline")
+
+    def cap(self, timeout):
+        """
+        Shrinks a requests timeout (number or (connect, read) pair) to what is left.
+        """
+        self.check()
+        left = self.remaining()
+        if isinstance(timeout, tuple):
+            return tuple(min(t, left) for t in timeout)
+        return min(timeout, left) if timeout else left
+
+class CircuitBreaker:
+    """
+    Per-host circuit: after BREAKER_THRESHOLD consecutive failures the host
+    is left alone for BREAKER_COOLDOWN seconds, then one success closes it.
+    """
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = {}
+        self._opened_at = {}
+
+    def wait_time(self, host):
+        with self._lock:
+            opened_at = self._opened_at.get(host)
+        return max(0.0, opened_at + self.cooldown - time.monotonic()) if opened_at else 0.0
+
+    def record_success(self, host):
+        with self._lock:
+            self._failures.pop(host, None)
+            self._opened_at.pop(host, None)
+
+    def record_failure(self, host):
+        with self._lock:
+            self._failures[host] = self._failures.get(host, 0) + 1
+            if self._failures[host] >= self.threshold:
+                if host not in self._opened_at:
+                    print(f"   🔌 Circuit open for {host}: pausing {self.cooldown}s")
+                    metrics.incr("circuit_open_total", host=host)
+                self._opened_at[host] = time.monotonic()
+
+breaker = CircuitBreaker()
+
+def _sleep(seconds, deadline):
+    if deadline and seconds >= deadline.remaining():
+        raise DeadlineExceeded(f"no time left to wait {seconds:.1f}s before retrying")
+    time.sleep(seconds)
+
+def _retry_delay(attempt, resp=None):
+    retry_after = resp.headers.get("Retry-After") if resp is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), RETRY_MAX_DELAY)
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+def http_get(url, headers=None, timeout=15, stream=False, deadline=None):
+    """
+    GET over the shared session with jittered exponential retries on
+    connection errors, timeouts, 429 and 5xx. Requests to a host whose
+    circuit is open wait for the cooldown (within the deadline, if any).
+    The last response is returned as-is, so callers still check its status.
+    """
+    host = urlsplit(url).netloc
+    for attempt in range(1, HTTP_MAX_ATTEMPTS + 1):
+        pause = breaker.wait_time(host)
+        if pause:
+            if deadline and pause >= deadline.remaining():
+                raise CircuitOpenError(f"circuit open for {host}")
+            time.sleep(pause)
+        request_timeout = deadline.cap(timeout) if deadline else timeout
+        try:
+            resp = get_session().get(url, headers=headers, timeout=request_timeout, stream=stream)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            breaker.record_failure(host)
+            metrics.incr("http_retries_total", reason=type(e).__name__)
+            if attempt == HTTP_MAX_ATTEMPTS:
+                raise
+            _sleep(_retry_delay(attempt), deadline)
+            continue
+
+        if resp.status_code not in RETRY_STATUSES:
+            breaker.record_success(host)
+            return resp
+        breaker.record_failure(host)
+        if attempt == HTTP_MAX_ATTEMPTS:
+            return resp
+        metrics.incr("http_retries_total", reason=str(resp.status_code))
+        delay = _retry_delay(attempt, resp)
+        resp.close()
+        _sleep(delay, deadline)
+
+# --- HTTP CACHE ---
+USE_HTTP_CACHE = True
+
+_http_cache = None
+
+def get_http_cache():
+    global _http_cache
+    with _session_lock:
+        if _http_cache is None:
+            _http_cache = HttpCache()
+        return _http_cache
+
+def cached_get(url, headers=None, timeout=15, deadline=None):
+    """
+    GET through the on-disk cache and return the body bytes. A cached URL is
+    revalidated with If-None-Match / If-Modified-Since; a 304 costs no body.
+    Error statuses raise requests.HTTPError instead of returning the error page.
+    """
+    if not USE_HTTP_CACHE:
+        resp = http_get(url, headers=headers, timeout=timeout, deadline=deadline)
+        resp.raise_for_status()
+        metrics.incr("http_bytes_total", len(resp.content), source="network")
+        return resp.content
+
+    cache = get_http_cache()
+    entry = cache.lookup(url)
+    request_headers = {**(headers or {}), **cache.validators(entry)}
+    resp = http_get(url, headers=request_headers, timeout=timeout, stream=True, deadline=deadline)
+
+    with resp:
+        if resp.status_code == 304 and entry:
+            cache.touch(url)
+            metrics.incr("http_cache_total", result="hit")
+            return cache.read(entry)
+        resp.raise_for_status()
+        metrics.incr("http_cache_total", result="miss")
+        if resp.status_code == 200 and (resp.headers.get("ETag") or resp.headers.get("Last-Modified")):
+            body = cache.read(cache.store(url, resp, deadline=deadline))
+        else:
+            body = resp.content
+        metrics.incr("http_bytes_total", len(body), source="network")
+        return body
+
+# --- INDEX PARSER ---
+# Each regulation on the index is a Bootstrap card holding the title link and
+# a "Ditetapkan <date>" line; the card parser reads only those, via lxml.
+USE_CARD_PARSER = True
+CARD_XPATH = "//div[contains(concat(' ', normalize-space(@class), ' '), ' card ')]"
+
+MONTHS = {
+    "Januari": "01", "Februari": "02", "Maret": "03", "April": "04",
+    "Mei": "05", "Juni": "06", "Juli": "07", "Agustus": "08",
+    "September": "09", "Oktober": "10", "November": "11", "Desember": "12"
+}
+# Only real month names match, so '99 Tahun 2025' is never mistaken for a date
+DATE_PATTERN = re.compile(r"(\d{1,2})\s+(" + "|".join(MONTHS) + r")\s+(\d{4})")
+
 def parse_indonesian_date(text):
     """
     Strictly extracts date like '20 Januari 2024'.
     Ignores false positives like '99 Tahun 2025'.
+    Returns None when the text has no date.
+    """
+    match = DATE_PATTERN.search(text)
+    if match:
+        day, month_name, year = match.groups()
+        return f"{year}-{MONTHS[month_name]}-{day.zfill(2)}"
+    return None
+
+def _is_regulation_href(href):
+    return ("/peraturan/" in href or "/dokumen-hukum/" in href) and "download" not in href.lower()
+
+def _text(element):
+    # Same joining as BeautifulSoup's get_text(" ", strip=True)
+    return " ".join(piece.strip() for piece in element.itertext() if piece.strip())
+
+def parse_index_cards(html):
     """
-    month_map = {
-        "Januari": "01", "Februari": "02", "Maret": "03", "April": "04",
-        "Mei": "05", "Juni": "06", "Juli": "07", "Agustus": "08",
-        "September": "09", "Oktober": "10", "November": "11", "Desember": "12"
-    }
+    Fast path: reads the regulation cards with lxml. Returns [] when the page
+    has no cards (layout changed) so the caller can fall back.
+    """
+    if isinstance(html, bytes):
+        try:
+            html = html.decode("utf-8")
+        except UnicodeDecodeError:
+            html = UnicodeDammit(html).unicode_markup
+
+    items = []
+    found_links = set()
+    for card in lxml_html.fromstring(html).xpath(CARD_XPATH):
+        for link_tag in card.iterfind(".//a[@href]"):
+            href = link_tag.get("href")
+            if href in found_links or not _is_regulation_href(href):
+                continue
+            title = _text(link_tag)
+            if len(title) < 10:
+                continue
+            found_links.add(href)
+            items.append({
+                "original_title": title,
+                "date": parse_indonesian_date(_text(link_tag.getparent())),
+                "link": href if href.startswith("http") else BASE_URL + href
+            })
+    return items
+
+def parse_index_links(html):
+    """
+    Fallback: the layout-agnostic "scan all links" heuristic.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
     
-    # Iterate through ALL patterns that look like dates
-    matches = re.finditer(r"(\d{1,2})\s+([A-Za-z]+)\s+(\d{4})", text)
+    items = []
+    found_links = set()
     
-    for match in matches:
-        day, month_name, year = match.groups()
+    # Robust "Scan All Links" strategy
+    all_link_tags = soup.find_all('a', href=True)
+    print(f"   -> Found {len(all_link_tags)} raw links on page. Filtering...") # DEBUG PRINT
+
+    for link_tag in all_link_tags:
+        href = link_tag['href']
+        
+        # Filter: Must be a regulation link
+        if href in found_links or not _is_regulation_href(href): continue
+        
+        full_link = href if href.startswith("http") else BASE_URL + href
+        title = link_tag.get_text(" ", strip=True)
+        
+        # Skip tiny titles (usually navigation buttons)
+        if len(title) < 10: continue
+        
+        # Find date in parent container
+        iso_date = parse_indonesian_date(link_tag.parent.get_text(" ", strip=True))
         
-        # CRITICAL CHECK: Is the word actually a month?
-        if month_name in month_map:
-            month = month_map[month_name]
-            return f"{year}-{month}-{day.zfill(2)}"
-            
-    # If no valid month is found, fallback to today
-    return datetime.datetime.now().strftime("%Y-%m-%d")
+        found_links.add(href)
+        items.append({
+            "original_title": title,
+            "date": iso_date,
+            "link": full_link
+        })
+        
+    return items
 
-def fetch_links_from_page(page_number):
+def parse_index_page(html):
+    """
+    Turns the HTML of one index page into regulation item dicts: the card
+    parser when lxml is available, the link heuristic if it finds nothing.
+    """
+    items = []
+    if USE_CARD_PARSER and lxml_html is not None:
+        try:
+            items = parse_index_cards(html)
+        except Exception as e:
+            print(f"   -> Card parser failed ({e}), using the link heuristic.")
+    if not items:
+        items = parse_index_links(html)
+    print(f"   -> ✅ Valid Regulations Found: {len(items)}")
+    return items
+
+def fetch_index_page(page_number):
     """
-    Step 1: Get the list of regulations from the index page.
+    Step 1: Get the list of regulations from the index page. Raises if the
+    page could not be fetched, so callers can tell an outage from the end
+    of the list.
     """
     url = TARGET_URL_TEMPLATE.format(page_number)
     print(f"DEBUG: Scanning Index {url}...")
-    
+    with metrics.span("index_fetch"):
+        html = cached_get(url, headers=BROWSER_HEADERS, timeout=15)
+    with metrics.span("index_parse"):
+        return parse_index_page(html)
+
+def fetch_links_from_page(page_number):
+    """
+    Step 1 (lenient): like fetch_index_page, but an error yields [].
+    """
     try:
-        # Added headers to look like a real browser
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        response = requests.get(url, headers=headers, timeout=15)
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        items = []
-        found_links = set()
-        
-        # Robust "Scan All Links" strategy
-        all_link_tags = soup.find_all('a', href=True)
-        print(f"   -> Found {len(all_link_tags)} raw links on page. Filtering...") # DEBUG PRINT
-
-        for link_tag in all_link_tags:
-            href = link_tag['href']
-            
-            # Filter: Must be a regulation link
-            if "/peraturan/" not in href and "/dokumen-hukum/" not in href: continue
-            if href in found_links or "download" in href.lower(): continue
-            
-            full_link = href if href.startswith("http") else BASE_URL + href
-            title = link_tag.get_text(" ", strip=True)
-            
-            # Skip tiny titles (usually navigation buttons)
-            if len(title) < 10: continue
-            
-            # Find date in parent container
-            iso_date = parse_indonesian_date(link_tag.parent.get_text(" ", strip=True))
-            
-            found_links.add(href)
-            items.append({
-                "original_title": title,
-                "date": iso_date,
-                "link": full_link
-            })
-            
-        print(f"   -> ✅ Valid Regulations Found: {len(items)}")
-        return items
+        return fetch_index_page(page_number)
     except Exception as e:
         print(f"❌ Error scanning page {page_number}: {e}")
         return []
 
+def _fetch_index_page_or_error(page_number):
+    try:
+        return fetch_index_page(page_number)
+    except Exception as e:
+        return e
+
+def fetch_index_pages(page_numbers, lenient=True):
+    """
+    Step 1 (parallel): Fetches several index pages at once over the shared
+    session. Returns one item list per page, in the order requested; with
+    lenient=False a page that failed comes back as its exception instead
+    of [].
+    """
+    page_numbers = list(page_numbers)
+    fetch = fetch_links_from_page if lenient else _fetch_index_page_or_error
+    with ThreadPoolExecutor(max_workers=INDEX_FETCH_WORKERS) as pool:
+        return list(pool.map(fetch, page_numbers))
+
+def find_pdf_url(url, headers=None, deadline=None):
+    """
+    Step 2a: Open the detail page and locate the PDF download link.
+    """
+    headers = headers or {"User-Agent": "Mozilla/5.0"}
+    with metrics.span("detail_page"):
+        soup = BeautifulSoup(cached_get(url, headers=headers, timeout=10, deadline=deadline), 'html.parser')
+
+    pdf_url = None
+    for a in soup.find_all('a', href=True):
+        if a['href'].lower().endswith('.pdf') or "unduh" in a.get_text().lower():
+            pdf_url = a['href']
+            break
+
+    if not pdf_url:
+        return None
+
+    if not pdf_url.startswith("http"):
+        pdf_url = BASE_URL + "/" + pdf_url.lstrip("/")
+    return pdf_url
+
+def _spool_to_tempfile(resp, max_bytes, deadline=None):
+    fd, path = tempfile.mkstemp(prefix=SPOOL_PREFIX, suffix=".pdf")
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in resp.iter_content(64 * 1024):
+                if deadline:
+                    deadline.check()
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(f"PDF exceeds {max_bytes} bytes")
+                f.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+def download_pdf(pdf_url, headers=None, max_bytes=MAX_PDF_BYTES, deadline=None):
+    """
+    Streams a PDF to disk in chunks, never holding it in memory.
+    Returns a file path: the HTTP cache blob when the server sends validators,
+    otherwise a temp spool file (delete it with release_pdf). A stalled
+    socket times out after PDF_TIMEOUT; a slow trickle hits the deadline.
+    """
+    with metrics.span("pdf_download"):
+        return _download_pdf(pdf_url, headers, max_bytes, deadline)
+
+def _download_pdf(pdf_url, headers, max_bytes, deadline):
+    cache = get_http_cache() if USE_HTTP_CACHE else None
+    entry = cache.lookup(pdf_url) if cache else None
+    request_headers = {**(headers or {}), **(cache.validators(entry) if cache else {})}
+
+    with http_get(pdf_url, headers=request_headers, timeout=PDF_TIMEOUT, stream=True, deadline=deadline) as resp:
+        if resp.status_code == 304 and entry:
+            cache.touch(pdf_url)
+            metrics.incr("http_cache_total", result="hit")
+            return cache.blob_path(entry["body_hash"])
+        resp.raise_for_status()
+
+        declared = int(resp.headers.get("Content-Length") or 0)
+        if declared > max_bytes:
+            raise ValueError(f"PDF is {declared} bytes, limit is {max_bytes}")
+
+        if cache:
+            metrics.incr("http_cache_total", result="miss")
+        if cache and (resp.headers.get("ETag") or resp.headers.get("Last-Modified")):
+            path = cache.blob_path(cache.store(pdf_url, resp, max_body_bytes=max_bytes, deadline=deadline)["body_hash"])
+        else:
+            path = _spool_to_tempfile(resp, max_bytes, deadline)
+        metrics.incr("http_bytes_total", os.path.getsize(path), source="network")
+        return path
+
+def release_pdf(pdf_path):
+    """
+    Deletes a temp spool file; cached blobs are left for the cache to manage.
+    """
+    if pdf_path and os.path.basename(pdf_path).startswith(SPOOL_PREFIX):
+        try:
+            os.remove(pdf_path)
+        except FileNotFoundError:
+            pass
+
+def fetch_document(url, deadline_seconds=DOCUMENT_DEADLINE):
+    """
+    Step 2b: Network half of the extraction - detail page + PDF download,
+    under one total deadline. Returns the PDF path, or None when the page
+    has no PDF link; network failures raise.
+    """
+    headers = {"User-Agent": "Mozilla/5.0"}
+    deadline = Deadline(deadline_seconds)
+    pdf_url = find_pdf_url(url, headers, deadline)
+    if not pdf_url:
+        print("      ⚠️ No PDF link found on page.")
+        return None
+    return download_pdf(pdf_url, headers=headers, deadline=deadline)
+
+def fetch_pdf(url):
+    """
+    Lenient fetch_document: returns None if nothing could be downloaded.
+    """
+    try:
+        return fetch_document(url)
+    except Exception as e:
+        print(f"      ⚠️ PDF Download Failed: {e}")
+        return None
+
+def iter_pdf_pages(pdf_path, max_pages=PDF_MAX_PAGES, page_timeout=PDF_PAGE_TIMEOUT):
+    """
+    Yields the text of each page, parsing one page at a time from disk.
+    Pages that time out or fail are skipped; each page's layout objects are
+    released before the next one is parsed so memory stays flat.
+    """
+    import pdfplumber   # only the PDF path pays for pdfminer
+    from pdf_engine import time_limit
+
+    with pdfplumber.open(pdf_path, pages=range(1, max_pages + 1)) as pdf:
+        for page in pdf.pages:
+            try:
+                with time_limit(page_timeout):
+                    extracted = page.extract_text()
+            except TimeoutError as e:
+                print(f"      ⏱️ Skipped page {page.page_number}: {e}")
+                extracted = None
+            finally:
+                page.close()
+            if extracted:
+                yield extracted
+
+def parse_pdf_text(pdf_path, max_chars=MAX_TEXT_CHARS):
+    """
+    Step 2c: CPU half of the extraction - lazily parses the opening pages
+    until max_chars of text are collected. Kept at module level so it can
+    run inside a process pool.
+    """
+    text_content = ""
+    for page_text in iter_pdf_pages(pdf_path):
+        text_content += page_text + "\n"
+        if len(text_content) >= max_chars:
+            break
+    return text_content
+
 def extract_text_from_pdf(url):
     """
     Step 2: Go to the detail page, find the PDF, and extract text.
     """
     print(f"   🔎 Extracting PDF text from: {url}")
+    pdf_path = fetch_pdf(url)
+    if not pdf_path:
+        return None
+
     try:
-        headers = {"User-Agent": "Mozilla/5.0"}
-        resp = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(resp.content, 'html.parser')
-        
-        pdf_url = None
-        for a in soup.find_all('a', href=True):
-            if a['href'].lower().endswith('.pdf') or "unduh" in a.get_text().lower():
-                pdf_url = a['href']
-                break
-        
-        if not pdf_url: 
-            print("      ⚠️ No PDF link found on page.")
-            return None
-            
-        if not pdf_url.startswith("http"): 
-            pdf_url = BASE_URL + "/" + pdf_url.lstrip("/")
-
-        # Download PDF to Memory
-        pdf_resp = requests.get(pdf_url, headers=headers, stream=True)
-        
-        # Extract Text (First 3 pages)
-        text_content = ""
-        with pdfplumber.open(io.BytesIO(pdf_resp.content)) as pdf:
-            max_pages = min(3, len(pdf.pages))
-            for i in range(max_pages):
-                extracted = pdf.pages[i].extract_text()
-                if extracted: 
-                    text_content += extracted + "\n"
-        
+        with metrics.span("pdf_parse"):
+            text_content = parse_pdf_text(pdf_path)
         print(f"      📄 Extracted {len(text_content)} chars.")
         return text_content
     except Exception as e:
         print(f"      ⚠️ PDF Extraction Failed: {e}")
-        return None
\ No newline at end of file
+        return None
+    finally:
+        release_pdf(pdf_path)
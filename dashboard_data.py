@@ -0,0 +1,158 @@
+"""
+Cached, incremental data layer for the Streamlit dashboard.
+
+Every rerun (each checkbox click in the table included) asks SQLite only for
+the change markers in regulation_stats. Unchanged data is served from the
+snapshot; when only inserts happened, just the rows newer than the snapshot
+are fetched and merged; any update/delete reloads the affected page.
+Metrics come from the trigger-maintained running aggregates; the scan
+performance panel reads the last scan's rows in scan_metrics. The embedding
+index behind "related regulations" is reloaded only when the data changes.
+"""
+import json
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+import database
+
+MAX_SNAPSHOTS = 64   # cached (filters, page) combinations
+
+class PageSnapshot:
+    def __init__(self, version, rows):
+        self.version = version
+        self.rows = rows
+
+class DashboardCache:
+    """
+    Shared across sessions (st.cache_resource); keyed by filters + page cursor.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pages = OrderedDict()
+        self._values = {}
+
+    def _remember(self, key, snapshot):
+        self._pages[key] = snapshot
+        self._pages.move_to_end(key)
+        while len(self._pages) > MAX_SNAPSHOTS:
+            self._pages.popitem(last=False)
+
+    def page(self, impact, commodity, after, limit):
+        """
+        Returns up to `limit` rows for the page (newest first).
+        """
+        key = (impact, commodity, after, limit)
+        with self._lock:
+            snapshot = self._pages.get(key)
+
+        # Version and rows from one snapshot: a row saved in between would
+        # otherwise be cached under the old version and merged in again later
+        with database.read_snapshot():
+            version = database.get_data_version()
+            if snapshot and snapshot.version == version:
+                rows = snapshot.rows
+            elif snapshot and _only_inserts(snapshot.version, version):
+                new_rows = database.query_regulations(impact, commodity, after=after, limit=limit,
+                                                      newer_than_id=snapshot.version["max_id"])
+                rows = (pd.concat([new_rows, snapshot.rows], ignore_index=True)
+                          .sort_values(["regulation_date", "id"], ascending=False)
+                          .head(limit)
+                          .reset_index(drop=True))
+            else:
+                rows = database.query_regulations(impact, commodity, after=after, limit=limit)
+
+        with self._lock:
+            self._remember(key, PageSnapshot(version, rows))
+        return rows.copy()
+
+    def versioned(self, key, loader):
+        """
+        Caches loader() until the database changes.
+        """
+        version = database.get_data_version()
+        with self._lock:
+            cached = self._values.get(key)
+        if cached and cached[0] == version:
+            return cached[1]
+        value = loader()
+        with self._lock:
+            self._values[key] = (version, value)
+        return value
+
+def _only_inserts(old, new):
+    # Every revision since the snapshot was an insert -> existing rows are untouched
+    return new["revision"] - old["revision"] == new["inserts"] - old["inserts"]
+
+@st.cache_resource
+def get_cache():
+    return DashboardCache()
+
+def get_page(impact=None, commodity=None, after=None, limit=database.PAGE_SIZE):
+    return get_cache().page(impact, commodity, after, limit)
+
+def get_stats(impact=None, commodity=None):
+    return get_cache().versioned(("stats", impact, commodity),
+                                 lambda: database.get_regulation_stats(impact, commodity))
+
+def get_commodities():
+    return get_cache().versioned(("commodities",), database.get_commodities)
+
+def get_related(regulation_id, limit=None):
+    """
+    The regulations most similar to one row, best first, with a Similarity column.
+    """
+    import embeddings   # NumPy index, loaded once someone asks for related rows
+
+    # Synced in memory only; the file belongs to the scan worker
+    index = get_cache().versioned(("embeddings",), lambda: embeddings.load_synced(save=False))
+    matches = index.related(regulation_id, limit or embeddings.RELATED_LIMIT)
+    rows = database.get_regulations_by_ids([regulation_id for regulation_id, _ in matches])
+    if not rows.empty:
+        rows["similarity"] = rows["id"].map(dict(matches))
+    return rows
+
+def get_scan_performance(job_id=None):
+    """
+    The latest instrumented scan as (per-stage DataFrame, headline totals).
+    """
+    rows = database.get_scan_metrics(job_id)
+    if rows.empty:
+        return None, {}
+    labels = rows["labels"].map(json.loads)
+    rows = rows.assign(stage=labels.map(lambda l: l.get("stage")),
+                       label=labels.map(lambda l: next(iter(l.values()), None)))
+
+    def total(name, label=None):
+        selected = rows[rows["name"] == name]
+        if label is not None:
+            selected = selected[selected["label"] == label]
+        return selected["value"].sum()
+
+    by_stage = rows[rows["stage"].notna()].pivot_table(index="stage", columns="name", values="value", aggfunc="sum")
+    # Busy time is summed over parallel workers, so stages can add up to more than the scan
+    stages = pd.DataFrame({
+        "Calls": by_stage.get("stage_calls_total", 0),
+        "Busy (s)": by_stage.get("stage_seconds_total", 0.0),
+        "Failures": by_stage.get("failures_total", 0),
+    }).fillna(0).astype({"Calls": int, "Failures": int})
+    stages["Avg (ms)"] = (1000 * stages["Busy (s)"] / stages["Calls"].where(stages["Calls"] > 0)).round(1)
+    stages["Busy (s)"] = stages["Busy (s)"].round(2)
+    stages = stages.sort_values("Busy (s)", ascending=False)
+
+    totals = {
+        "job_id": rows["job_id"].iloc[0],
+        "recorded_at": rows["recorded_at"].iloc[0],
+        "downloaded_mb": total("http_bytes_total") / 1e6,
+        "http_cache_hits": total("http_cache_total", "hit"),
+        "http_cache_misses": total("http_cache_total", "miss"),
+        "prompt_tokens": total("llm_tokens_total", "prompt"),
+        "completion_tokens": total("llm_tokens_total", "completion"),
+        "llm_cache_hits": total("llm_cache_total", "hit"),
+        "llm_cache_misses": total("llm_cache_total", "miss"),
+        "failures": total("failures_total"),
+        "read_failed": total("documents_total", "read_failed"),
+    }
+    return stages, totals
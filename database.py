@@ -1,46 +1,369 @@
+import contextlib
+import json
+import os
+import re
 import sqlite3
+import threading
+import time
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
+
+import blob_store
 
 DB_FILE = "regulations.db"
 
+PAGE_SIZE = 50
+
+# --- LLM RESULT CACHE ---
+LLM_CACHE_TTL_DAYS = 180
+LLM_CACHE_MAX_ROWS = 50000
+
+# --- SCAN JOBS ---
+STALE_JOB_SECONDS = 15 * 60   # a running job without a heartbeat this long is dead
+
+# --- DEAD LETTERS ---
+DEAD_LETTER_RETRY_MINUTES = 30   # first retry delay; doubles per failed attempt
+DEAD_LETTER_MAX_DELAY_HOURS = 24
+
+# --- CONNECTION MANAGER ---
+# One long-lived connection per thread (sqlite3 connections must not be shared
+# across threads). WAL lets the dashboard read while a scan writes, and
+# busy_timeout makes a second writer wait instead of failing with
+# "database is locked".
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 30000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -20000",
+)
+
+_local = threading.local()
+
+_blob_store = None
+_blob_store_lock = threading.Lock()
+
+def get_connection():
+    """
+    Returns this thread's connection to DB_FILE, opening it on first use.
+    Connections run in autocommit mode; use transaction() to group writes.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.db_file != DB_FILE:
+        conn = sqlite3.connect(DB_FILE, timeout=30, isolation_level=None)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        # The search view reads extracted text back out of the blob store
+        conn.create_function("blob_text", 1, _blob_text, deterministic=True)
+        _local.conn = conn
+        _local.db_file = DB_FILE
+    return conn
+
+def get_blob_store():
+    """
+    The compressed store of extracted text and PDFs, kept in
+    blob_store.BLOB_DIR beside DB_FILE.
+    """
+    global _blob_store
+    root = os.path.join(os.path.dirname(os.path.abspath(DB_FILE)), blob_store.BLOB_DIR)
+    with _blob_store_lock:
+        if _blob_store is None or _blob_store.root != root:
+            _blob_store = blob_store.BlobStore(root)
+        return _blob_store
+
+@contextlib.contextmanager
+def transaction():
+    """
+    BEGIN IMMEDIATE ... COMMIT on this thread's connection. Taking the write
+    lock up front avoids the deadlock-prone read-then-upgrade pattern.
+    """
+    conn = get_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+@contextlib.contextmanager
+def read_snapshot():
+    """
+    Groups reads on this thread's connection into one deferred transaction,
+    so they all see the database as of the first of them (WAL snapshot).
+    """
+    conn = get_connection()
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.execute("COMMIT")
+
 def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    # Updated Schema to match your "Correct" script
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS regulations (
+    with transaction() as conn:
+        # Updated Schema to match your "Correct" script
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS regulations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT,
+                regulation_date TEXT,
+                original_title TEXT,
+                english_title TEXT,
+                status TEXT,
+                commodity TEXT,
+                vpti_impact TEXT,
+                summary TEXT,
+                action_required TEXT,
+                raw_link TEXT
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS crawl_state (
+                url TEXT PRIMARY KEY,
+                fingerprint TEXT,
+                first_seen TEXT,
+                last_seen TEXT,
+                processed_at TEXT
+            )
+        ''')
+    init_llm_cache()
+    migrate()
+
+def _migration_1_indexes(conn):
+    # Older scans could insert the same link twice; keep the newest row
+    conn.execute('''
+        DELETE FROM regulations WHERE id NOT IN (SELECT MAX(id) FROM regulations GROUP BY raw_link)
+    ''')
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_regulations_link ON regulations(raw_link)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_regulations_date ON regulations(regulation_date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_regulations_impact ON regulations(vpti_impact, regulation_date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_regulations_commodity ON regulations(commodity, regulation_date)")
+
+def _migration_2_search(conn):
+    # Extracted PDF text lives beside the hot table; the FTS index shares regulation ids
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS regulation_texts (
+            regulation_id INTEGER PRIMARY KEY,
+            extracted_text TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS regulations_fts USING fts5(
+            original_title, english_title, summary, action_required, extracted_text,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO regulations_fts (rowid, original_title, english_title, summary, action_required, extracted_text)
+        SELECT id, original_title, english_title, summary, action_required, '' FROM regulations
+    ''')
+
+def _migration_3_scan_jobs(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS scan_jobs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            regulation_date TEXT, 
-            original_title TEXT,
-            english_title TEXT,
-            status TEXT,
-            commodity TEXT,
-            vpti_impact TEXT,
-            summary TEXT,
-            action_required TEXT,
-            raw_link TEXT
+            status TEXT NOT NULL,          -- queued / running / done / failed
+            requested_by TEXT,
+            requested_at TEXT,
+            started_at TEXT,
+            finished_at TEXT,
+            heartbeat_at TEXT,
+            worker TEXT,
+            done INTEGER DEFAULT 0,
+            total INTEGER DEFAULT 0,
+            message TEXT
         )
     ''')
-    conn.commit()
-    conn.close()
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_scan_jobs_status ON scan_jobs(status, id)")
 
-def save_regulation(data):
+def _migration_4_running_stats(conn):
+    # Single-row running aggregates kept exact by triggers, plus change counters
+    # the dashboard cache uses to decide what to reload.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS regulation_stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total INTEGER NOT NULL,
+            high_impact INTEGER NOT NULL,
+            revision INTEGER NOT NULL,   -- bumped by every insert/update/delete
+            inserts INTEGER NOT NULL     -- bumped by inserts only
+        )
+    ''')
+    conn.execute('''
+        INSERT OR REPLACE INTO regulation_stats (id, total, high_impact, revision, inserts)
+        SELECT 1, COUNT(*), COALESCE(SUM(vpti_impact = 'High'), 0), 0, 0 FROM regulations
+    ''')
+    _create_stats_triggers(conn)
+
+def _create_stats_triggers(conn):
+    # IS, not =: a NULL vpti_impact (older rows hold some) must count as 0, not NULL
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_regulations_insert AFTER INSERT ON regulations BEGIN
+            UPDATE regulation_stats SET total = total + 1, high_impact = high_impact + (NEW.vpti_impact IS 'High'),
+                revision = revision + 1, inserts = inserts + 1 WHERE id = 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_regulations_update AFTER UPDATE ON regulations BEGIN
+            UPDATE regulation_stats SET
+                high_impact = high_impact - (OLD.vpti_impact IS 'High') + (NEW.vpti_impact IS 'High'),
+                revision = revision + 1 WHERE id = 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_regulations_delete AFTER DELETE ON regulations BEGIN
+            UPDATE regulation_stats SET total = total - 1, high_impact = high_impact - (OLD.vpti_impact IS 'High'),
+                revision = revision + 1 WHERE id = 1;
+        END
+    ''')
+
+def _migration_5_scan_metrics(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS scan_metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER,
+            recorded_at TEXT,
+            name TEXT NOT NULL,
+            labels TEXT,              -- JSON object, e.g. {"stage": "pdf_download"}
+            value REAL
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_scan_metrics_job ON scan_metrics(job_id)")
+
+def _migration_6_dead_letters(conn):
+    # Documents whose download failed; later scans put them back on the frontier
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS dead_letters (
+            url TEXT PRIMARY KEY,
+            item TEXT NOT NULL,           -- JSON of the index item (title, date, fingerprint)
+            stage TEXT,
+            error TEXT,
+            attempts INTEGER NOT NULL,
+            first_failed_at TEXT,
+            last_failed_at TEXT,
+            next_attempt_at TEXT
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_dead_letters_due ON dead_letters(next_attempt_at)")
+
+def _migration_7_fingerprints(conn):
+    # Content fingerprints of the stored version, used to spot amended documents
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS regulation_fingerprints (
+            regulation_id INTEGER PRIMARY KEY,
+            pdf_hash TEXT,                -- sha256 of the PDF file
+            text_hash TEXT,               -- sha256 of the normalized text
+            sketch TEXT,                  -- JSON list of bottom-k shingle hashes
+            updated_at TEXT
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_regulation_fingerprints_pdf ON regulation_fingerprints(pdf_hash)")
+
+def _migration_8_effective_date(conn):
+    # When a regulation takes effect; filled by the legacy CSV import (importer.py)
+    conn.execute("ALTER TABLE regulations ADD COLUMN effective_date TEXT")
+
+def _migration_9_blobs(conn):
+    # Extracted text moves from regulation_texts into the compressed blob
+    # store (PDFs are archived there too); the FTS index kept its own copy until migration 11
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS regulation_blobs (
+            regulation_id INTEGER,
+            kind TEXT,                    -- 'text' or 'pdf'
+            digest TEXT,                  -- sha256 of the content, its name in the blob store
+            size INTEGER,                 -- uncompressed bytes
+            PRIMARY KEY (regulation_id, kind)
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_regulation_blobs_digest ON regulation_blobs(digest)")
+    store = get_blob_store()
+    if store.dictionary_id is None:
+        samples = conn.execute("SELECT extracted_text FROM regulation_texts ORDER BY regulation_id DESC LIMIT ?",
+                               (blob_store.DICT_SAMPLES,))
+        store.train([text.encode("utf-8") for (text,) in samples if text])
+    for regulation_id, text in conn.execute("SELECT regulation_id, extracted_text FROM regulation_texts"):
+        if text:
+            _store_text(conn, regulation_id, text)
+    conn.execute("DROP TABLE regulation_texts")
+
+def _migration_10_null_safe_stats(conn):
+    # The first stats triggers added NULL for a NULL vpti_impact and failed high_impact NOT NULL
+    for trigger in ("trg_regulations_insert", "trg_regulations_update", "trg_regulations_delete"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    _create_stats_triggers(conn)
+
+def _migration_11_external_search(conn):
+    # The FTS index kept its own uncompressed copy of every text. It now only
+    # holds the index and reads column values (for snippets) through a view:
+    # titles from regulations, text from the blob store via blob_text()
+    conn.execute("DROP TABLE IF EXISTS regulations_fts")
+    conn.execute('''
+        CREATE VIEW IF NOT EXISTS regulation_search AS
+        SELECT r.id, r.original_title, r.english_title, r.summary, r.action_required,
+               blob_text(b.digest) AS extracted_text
+        FROM regulations r
+        LEFT JOIN regulation_blobs b ON b.regulation_id = r.id AND b.kind = 'text'
+    ''')
+    conn.execute('''
+        CREATE VIRTUAL TABLE regulations_fts USING fts5(
+            original_title, english_title, summary, action_required, extracted_text,
+            content = 'regulation_search', content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    ''')
+    conn.execute("INSERT INTO regulations_fts (regulations_fts) VALUES ('rebuild')")
+
+def _migration_12_import_dates(conn):
+    # The first CSV import copied effective_date into regulation_date; date
+    # those rows by their scan day instead, as the importer now does
+    conn.execute('''
+        UPDATE regulations SET regulation_date =
+            CASE WHEN timestamp GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*' THEN substr(timestamp, 1, 10)
+                 ELSE 'Unknown' END
+        WHERE effective_date IS NOT NULL AND regulation_date = effective_date
+    ''')
+
+# Schema migrations, applied in order; PRAGMA user_version records the last one run.
+MIGRATIONS = [
+    _migration_1_indexes,
+    _migration_2_search,
+    _migration_3_scan_jobs,
+    _migration_4_running_stats,
+    _migration_5_scan_metrics,
+    _migration_6_dead_letters,
+    _migration_7_fingerprints,
+    _migration_8_effective_date,
+    _migration_9_blobs,
+    _migration_10_null_safe_stats,
+    _migration_11_external_search,
+    _migration_12_import_dates,
+]
+
+def migrate():
     """
-    Saves a dictionary of data to the DB.
+    Brings the schema up to date. Each migration runs in its own transaction.
     """
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    c.execute('''
-        INSERT INTO regulations (
-            timestamp, regulation_date, original_title, english_title, 
-            status, commodity, vpti_impact, summary, action_required, raw_link
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        timestamp, 
+    conn = get_connection()
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        with transaction() as conn:
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+
+def init_llm_cache():
+    get_connection().execute('''
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            cache_key TEXT PRIMARY KEY,
+            model TEXT,
+            response TEXT,
+            created_at REAL,
+            last_hit REAL,
+            hits INTEGER DEFAULT 0
+        )
+    ''')
+
+def _regulation_row(data, timestamp):
+    return (
+        timestamp,
         data.get('date', 'Unknown'),
         data.get('original_title', 'Unknown'),
         data.get('english_title', 'N/A'),
@@ -50,20 +373,591 @@ def save_regulation(data):
         data.get('key_changes', 'No summary'), # Mapping 'key_changes' to 'summary'
         data.get('action_required', 'None'),
         data.get('link', '')
-    ))
-    conn.commit()
-    conn.close()
+    )
+
+def _link_blob(conn, regulation_id, kind, digest, size):
+    conn.execute("INSERT OR REPLACE INTO regulation_blobs (regulation_id, kind, digest, size) VALUES (?, ?, ?, ?)",
+                 (regulation_id, kind, digest, size))
+
+def _store_text(conn, regulation_id, text):
+    data = text.encode("utf-8")
+    _link_blob(conn, regulation_id, "text", get_blob_store().put(data), len(data))
+
+def _blob_text(digest):
+    if not digest:
+        return ""
+    try:
+        return get_blob_store().get_text(digest)
+    except LookupError:
+        return ""
+
+def _load_text(row):
+    """
+    Replaces a row's text_digest with the extracted_text it names (None when
+    there is none or its object is missing from the store).
+    """
+    digest = row.pop("text_digest")
+    try:
+        row["extracted_text"] = get_blob_store().get_text(digest) if digest else None
+    except LookupError:   # the object, or the dictionary it was compressed with
+        row["extracted_text"] = None
+    return row
+
+def _unindex_for_search(conn, regulation_id):
+    """
+    Removes a regulation from the FTS index. Runs before its row or text
+    changes: an external-content index is told the exact values it indexed.
+    """
+    conn.execute('''
+        INSERT INTO regulations_fts (regulations_fts, rowid, original_title, english_title, summary,
+                                     action_required, extracted_text)
+        SELECT 'delete', id, original_title, english_title, summary, action_required, extracted_text
+        FROM regulation_search WHERE id = ?
+    ''', (regulation_id,))
+
+def _index_for_search(conn, regulation_id, extracted_text):
+    """
+    Indexes one regulation (after _unindex_for_search if it was indexed).
+    New text is stored when given; otherwise the stored text stays searchable.
+    """
+    if extracted_text:
+        _store_text(conn, regulation_id, extracted_text)
+    conn.execute('''
+        INSERT INTO regulations_fts (rowid, original_title, english_title, summary, action_required, extracted_text)
+        SELECT id, original_title, english_title, summary, action_required, extracted_text
+        FROM regulation_search WHERE id = ?
+    ''', (regulation_id,))
+
+def _save_fingerprint(conn, regulation_id, data):
+    conn.execute('''
+        INSERT OR REPLACE INTO regulation_fingerprints (regulation_id, pdf_hash, text_hash, sketch, updated_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (regulation_id, data.get('pdf_hash'), data['text_hash'], data.get('sketch'), _now()))
+
+def save_regulations_bulk(records):
+    """
+    Saves many records in one transaction. A record whose link is already
+    stored updates that row instead of inserting a duplicate. The search
+    index, content fingerprints and archived text / PDF references are
+    updated in the same transaction.
+    """
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with transaction() as conn:
+        for data in records:
+            row = _regulation_row(data, timestamp)
+            stored = conn.execute("SELECT id FROM regulations WHERE raw_link = ?", (row[-1],)).fetchone()
+            if stored:
+                _unindex_for_search(conn, stored[0])
+            regulation_id = conn.execute('''
+                INSERT INTO regulations (
+                    timestamp, regulation_date, original_title, english_title,
+                    status, commodity, vpti_impact, summary, action_required, raw_link
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(raw_link) DO UPDATE SET
+                    timestamp = excluded.timestamp, regulation_date = excluded.regulation_date,
+                    original_title = excluded.original_title, english_title = excluded.english_title,
+                    status = excluded.status, commodity = excluded.commodity,
+                    vpti_impact = excluded.vpti_impact, summary = excluded.summary,
+                    action_required = excluded.action_required
+                RETURNING id
+            ''', row).fetchone()[0]
+            _index_for_search(conn, regulation_id, data.get('extracted_text'))
+            if data.get('text_hash'):
+                _save_fingerprint(conn, regulation_id, data)
+            if data.get('pdf_size'):
+                _link_blob(conn, regulation_id, "pdf", data['pdf_hash'], data['pdf_size'])
+
+def save_regulation(data):
+    """
+    Saves a dictionary of data to the DB.
+    """
+    save_regulations_bulk([data])
+
+def get_stored_version(link, with_text=True):
+    """
+    Analysis title, fingerprints and extracted text of the stored regulation
+    at `link` (english_title, pdf_hash, text_hash, sketch, extracted_text),
+    or None if it is new. with_text=False skips reading the text from the
+    blob store.
+    """
+    cursor = get_connection().execute('''
+        SELECT r.english_title, f.pdf_hash, f.text_hash, f.sketch, b.digest AS text_digest
+        FROM regulations r
+        LEFT JOIN regulation_fingerprints f ON f.regulation_id = r.id
+        LEFT JOIN regulation_blobs b ON b.regulation_id = r.id AND b.kind = 'text'
+        WHERE r.raw_link = ?
+    ''', (link,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    row = dict(zip([d[0] for d in cursor.description], row))
+    if not with_text:
+        row.pop("text_digest")
+        return row
+    return _load_text(row)
+
+def update_fingerprints(records):
+    """
+    Refreshes the fingerprints of unchanged documents (e.g. a re-encoded PDF
+    with the same text) without touching their analysis.
+    """
+    with transaction() as conn:
+        for data in records:
+            row = conn.execute("SELECT id FROM regulations WHERE raw_link = ?", (data['link'],)).fetchone()
+            if row and data.get('text_hash'):
+                _save_fingerprint(conn, row[0], data)
+            if row and data.get('pdf_size'):
+                _link_blob(conn, row[0], "pdf", data['pdf_hash'], data['pdf_size'])
+
+def get_embedding_sources(since=None, after_id=0, text_chars=4000):
+    """
+    Titles and the start of the extracted text of regulations whose
+    (timestamp, id) comes after the `since` pair or whose id is above
+    `after_id` (all of them when `since` is None), as dicts.
+    """
+    since_at, since_id = since or ("", 0)
+    cursor = get_connection().execute('''
+        SELECT r.id, r.timestamp, r.original_title, b.digest AS text_digest
+        FROM regulations r
+        LEFT JOIN regulation_blobs b ON b.regulation_id = r.id AND b.kind = 'text'
+        WHERE (r.timestamp, r.id) > (?, ?) OR r.id > ?
+        ORDER BY r.id
+    ''', (since_at, since_id, after_id))
+    columns = [d[0] for d in cursor.description]
+    rows = [_load_text(dict(zip(columns, row))) for row in cursor.fetchall()]
+    for row in rows:
+        row["extracted_text"] = (row["extracted_text"] or "")[:text_chars] or None
+    return rows
+
+def get_regulation(regulation_id):
+    """
+    One regulation row as a dict, with its extracted text, or None.
+    """
+    cursor = get_connection().execute('''
+        SELECT r.*, b.digest AS text_digest
+        FROM regulations r
+        LEFT JOIN regulation_blobs b ON b.regulation_id = r.id AND b.kind = 'text'
+        WHERE r.id = ?
+    ''', (regulation_id,))
+    row = cursor.fetchone()
+    return _load_text(dict(zip([d[0] for d in cursor.description], row))) if row else None
+
+def get_blob_digests(kind=None, limit=None):
+    """
+    Distinct digests referenced by regulations (of one kind), newest first.
+    """
+    where = "WHERE kind = ?" if kind else ""
+    params = [kind] if kind else []
+    rows = get_connection().execute(
+        f"SELECT digest FROM regulation_blobs {where} GROUP BY digest ORDER BY MAX(regulation_id) DESC LIMIT ?",
+        params + [limit if limit is not None else -1])
+    return [digest for (digest,) in rows]
+
+def train_text_dictionary():
+    """
+    Trains the blob store's text dictionary if it has none yet and enough
+    texts are stored (a fresh install starts without one). Returns the new
+    dictionary id, or None.
+    """
+    store = get_blob_store()
+    if store.dictionary_id is not None:
+        return None
+    digests = get_blob_digests("text", limit=blob_store.DICT_SAMPLES)
+    if len(digests) < blob_store.DICT_MIN_SAMPLES:
+        return None
+    return store.train([store.get(digest) for digest in digests])
+
+def get_blob_stats():
+    """
+    {kind: {"references", "objects", "bytes"}}; bytes counts each object once.
+    """
+    rows = get_connection().execute('''
+        SELECT kind, SUM(refs), COUNT(*), SUM(size)
+        FROM (SELECT kind, digest, COUNT(*) AS refs, MAX(size) AS size FROM regulation_blobs GROUP BY kind, digest)
+        GROUP BY kind
+    ''')
+    return {kind: {"references": refs, "objects": objects, "bytes": size or 0} for kind, refs, objects, size in rows}
+
+def get_regulations_by_ids(ids):
+    """
+    The given regulations, in the order of `ids` (missing ones left out).
+    """
+    if not ids:
+        return pd.DataFrame()
+    placeholders = ",".join("?" * len(ids))
+    rows = pd.read_sql_query(f"SELECT * FROM regulations WHERE id IN ({placeholders})",
+                             get_connection(), params=list(ids))
+    return rows.set_index("id").reindex([i for i in ids if i in set(rows["id"])]).reset_index()
+
+def iter_regulations(columns, impact=None, commodity=None, ids=None, chunk_size=5000):
+    """
+    Streams regulations as lists of row tuples (the given columns), oldest
+    first, `chunk_size` rows at a time. Keyset pagination on id keeps every
+    chunk as cheap as the first, so memory stays bounded for any archive size.
+    """
+    clauses, params = _filter_clause(impact, commodity)
+    if ids is not None:
+        clauses.append(f"id IN ({','.join('?' * len(ids))})")
+        params.extend(ids)
+    where = "".join(f" AND {clause}" for clause in clauses)
+    conn = get_connection()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            f"SELECT id, {', '.join(columns)} FROM regulations WHERE id > ?{where} ORDER BY id LIMIT ?",
+            [last_id] + params + [chunk_size]).fetchall()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield [row[1:] for row in rows]
+
+def import_regulations(chunks):
+    """
+    Bulk-loads rows of (timestamp, regulation_date, original_title,
+    english_title, status, commodity, vpti_impact, summary, action_required,
+    raw_link, effective_date) in ONE transaction. Links already stored are
+    left untouched (a re-run imports nothing); a link repeated within the
+    import keeps its last row. Returns the number of regulations added.
+    """
+    with transaction() as conn:
+        start_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM regulations").fetchone()[0]
+        for rows in chunks:
+            conn.executemany('''
+                INSERT INTO regulations (
+                    timestamp, regulation_date, original_title, english_title, status, commodity,
+                    vpti_impact, summary, action_required, raw_link, effective_date
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(raw_link) DO UPDATE SET
+                    timestamp = excluded.timestamp, regulation_date = excluded.regulation_date,
+                    original_title = excluded.original_title, english_title = excluded.english_title,
+                    status = excluded.status, commodity = excluded.commodity,
+                    vpti_impact = excluded.vpti_impact, summary = excluded.summary,
+                    action_required = excluded.action_required, effective_date = excluded.effective_date
+                WHERE regulations.id > ?
+            ''', [row + (start_id,) for row in rows])
+        # One pass at the end makes every imported row searchable
+        conn.execute('''
+            INSERT INTO regulations_fts (rowid, original_title, english_title, summary, action_required, extracted_text)
+            SELECT id, original_title, english_title, summary, action_required, extracted_text
+            FROM regulation_search WHERE id > ?
+        ''', (start_id,))
+        return conn.execute("SELECT COUNT(*) FROM regulations WHERE id > ?", (start_id,)).fetchone()[0]
 
 def get_all_regulations():
-    conn = sqlite3.connect(DB_FILE)
-    df = pd.read_sql_query("SELECT * FROM regulations ORDER BY regulation_date DESC", conn)
-    conn.close()
-    return df
+    return pd.read_sql_query("SELECT * FROM regulations ORDER BY regulation_date DESC", get_connection())
 
 def get_latest_date():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT MAX(regulation_date) FROM regulations")
-    result = c.fetchone()[0]
-    conn.close()
-    return result
\ No newline at end of file
+    return get_connection().execute("SELECT MAX(regulation_date) FROM regulations").fetchone()[0]
+
+def _filter_clause(impact=None, commodity=None):
+    clauses, params = [], []
+    if impact:
+        clauses.append("vpti_impact = ?")
+        params.append(impact)
+    if commodity:
+        clauses.append("commodity = ?")
+        params.append(commodity)
+    return clauses, params
+
+def query_regulations(impact=None, commodity=None, after=None, limit=PAGE_SIZE, newer_than_id=None):
+    """
+    One page of regulations, newest first, filtered in SQL.
+    Keyset pagination: pass the (regulation_date, id) of the last row of the
+    previous page as `after`, so deep pages cost the same as the first one.
+    `newer_than_id` restricts the page to rows inserted after that id.
+    """
+    clauses, params = _filter_clause(impact, commodity)
+    if after:
+        clauses.append("(regulation_date < ? OR (regulation_date = ? AND id < ?))")
+        params.extend([after[0], after[0], after[1]])
+    if newer_than_id is not None:
+        clauses.append("id > ?")
+        params.append(newer_than_id)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return pd.read_sql_query(
+        f"SELECT * FROM regulations {where} ORDER BY regulation_date DESC, id DESC LIMIT ?",
+        get_connection(), params=params + [limit])
+
+def get_regulation_stats(impact=None, commodity=None):
+    """
+    Aggregate counts for the dashboard metrics: total, latest date, high impact.
+    """
+    conn = get_connection()
+    clauses, params = _filter_clause(impact, commodity)
+    if not clauses:
+        # Unfiltered: read the trigger-maintained running totals (O(1))
+        total, high = conn.execute("SELECT total, high_impact FROM regulation_stats WHERE id = 1").fetchone()
+        return {"total": total, "latest_date": get_latest_date(), "high_impact": high}
+    where = f"WHERE {' AND '.join(clauses)}"
+    total, latest, high = conn.execute(f'''
+        SELECT COUNT(*), MAX(regulation_date), COALESCE(SUM(vpti_impact = 'High'), 0)
+        FROM regulations {where}
+    ''', params).fetchone()
+    return {"total": total, "latest_date": latest, "high_impact": high}
+
+def _fts_query(text):
+    """
+    Turns a free-text search ("HS 1511 or palm olein") into a safe FTS5 query:
+    every term is quoted, "quoted phrases" are kept, OR is honoured and
+    terms are otherwise ANDed.
+    """
+    parts = []
+    for token in re.findall(r'"[^"]+"|\S+', text):
+        if token.upper() == "OR" and parts and parts[-1] != "OR":
+            parts.append("OR")
+        elif token.upper() != "AND":
+            parts.append('"%s"' % token.strip('"').replace('"', '""'))
+    if parts and parts[-1] == "OR":
+        parts.pop()
+    return " ".join(parts)
+
+def search_regulations(query, limit=20):
+    """
+    Ranked full-text search over titles, summaries, actions and PDF text.
+    Title matches weigh most. Returns rows with a highlighted snippet.
+    """
+    match = _fts_query(query)
+    if not match:
+        return pd.DataFrame()
+    return pd.read_sql_query('''
+        SELECT r.id, r.regulation_date, r.original_title, r.english_title, r.vpti_impact, r.raw_link,
+               snippet(regulations_fts, -1, '**', '**', ' … ', 16) AS snippet,
+               bm25(regulations_fts, 5.0, 5.0, 2.0, 1.0, 1.0) AS rank
+        FROM regulations_fts
+        JOIN regulations r ON r.id = regulations_fts.rowid
+        WHERE regulations_fts MATCH ?
+        ORDER BY rank
+        LIMIT ?
+    ''', get_connection(), params=(match, limit))
+
+def get_data_version():
+    """
+    Cheap change markers: revision (any write), inserts and max id.
+    """
+    revision, inserts, max_id = get_connection().execute(
+        "SELECT revision, inserts, (SELECT COALESCE(MAX(id), 0) FROM regulations) "
+        "FROM regulation_stats WHERE id = 1").fetchone()
+    return {"revision": revision, "inserts": inserts, "max_id": max_id}
+
+def get_commodities():
+    rows = get_connection().execute(
+        "SELECT DISTINCT commodity FROM regulations WHERE commodity IS NOT NULL ORDER BY commodity")
+    return [commodity for (commodity,) in rows]
+
+def get_cached_analysis(cache_key):
+    """
+    Returns the cached LLM response (JSON string) for a key, or None if it
+    is missing or older than LLM_CACHE_TTL_DAYS.
+    """
+    conn = get_connection()
+    oldest = time.time() - LLM_CACHE_TTL_DAYS * 86400
+    row = conn.execute(
+        "SELECT response FROM llm_cache WHERE cache_key = ? AND created_at >= ?", (cache_key, oldest)
+    ).fetchone()
+    if row:
+        conn.execute("UPDATE llm_cache SET hits = hits + 1, last_hit = ? WHERE cache_key = ?", (time.time(), cache_key))
+    return row[0] if row else None
+
+def save_cached_analysis(cache_key, model, response):
+    """
+    Stores an LLM response and trims the cache (expired rows first, then the
+    least recently used ones beyond LLM_CACHE_MAX_ROWS).
+    """
+    now = time.time()
+    with transaction() as conn:
+        conn.execute('''
+            INSERT OR REPLACE INTO llm_cache (cache_key, model, response, created_at, last_hit, hits)
+            VALUES (?, ?, ?, ?, ?, 0)
+        ''', (cache_key, model, response, now, now))
+        conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - LLM_CACHE_TTL_DAYS * 86400,))
+        conn.execute('''
+            DELETE FROM llm_cache WHERE cache_key IN (
+                SELECT cache_key FROM llm_cache ORDER BY last_hit DESC LIMIT -1 OFFSET ?
+            )
+        ''', (LLM_CACHE_MAX_ROWS,))
+
+def get_crawl_state(urls):
+    """
+    Returns {url: fingerprint} for the URLs we already know. URLs that only
+    exist in the regulations table (processed before crawl_state existed)
+    map to None so the caller can adopt them instead of re-processing.
+    """
+    if not urls:
+        return {}
+    conn = get_connection()
+    placeholders = ",".join("?" * len(urls))
+    known = {url: None for (url,) in conn.execute(
+        f"SELECT raw_link FROM regulations WHERE raw_link IN ({placeholders})", urls)}
+    known.update(conn.execute(
+        f"SELECT url, fingerprint FROM crawl_state WHERE url IN ({placeholders}) AND processed_at IS NOT NULL", urls))
+    return known
+
+def touch_crawl_state(seen):
+    """
+    Records that (url, fingerprint) pairs were seen on the index today.
+    Only last_seen is updated for known URLs; fingerprints change on processing.
+    """
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with transaction() as conn:
+        conn.executemany('''
+            INSERT INTO crawl_state (url, fingerprint, first_seen, last_seen) VALUES (?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET last_seen = excluded.last_seen
+        ''', [(url, fingerprint, now, now) for url, fingerprint in seen])
+
+def mark_crawled(url, fingerprint):
+    """
+    Marks a detail page as fully processed with the given content fingerprint.
+    """
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    get_connection().execute('''
+        INSERT INTO crawl_state (url, fingerprint, first_seen, last_seen, processed_at) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(url) DO UPDATE SET fingerprint = excluded.fingerprint,
+            last_seen = excluded.last_seen, processed_at = excluded.processed_at
+    ''', (url, fingerprint, now, now, now))
+
+def add_dead_letter(item, stage, error):
+    """
+    Records (or re-records) a failed document and schedules its retry with
+    exponential backoff. Returns the number of failed attempts so far.
+    """
+    with transaction() as conn:
+        row = conn.execute("SELECT attempts FROM dead_letters WHERE url = ?", (item['link'],)).fetchone()
+        attempts = (row[0] if row else 0) + 1
+        delay = min(DEAD_LETTER_RETRY_MINUTES * 2 ** (attempts - 1), DEAD_LETTER_MAX_DELAY_HOURS * 60)
+        next_attempt = (datetime.now() + timedelta(minutes=delay)).strftime("%Y-%m-%d %H:%M:%S")
+        stored = {key: item[key] for key in ("original_title", "date", "link", "fingerprint") if key in item}
+        conn.execute('''
+            INSERT INTO dead_letters (url, item, stage, error, attempts, first_failed_at, last_failed_at, next_attempt_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET item = excluded.item, stage = excluded.stage, error = excluded.error,
+                attempts = excluded.attempts, last_failed_at = excluded.last_failed_at,
+                next_attempt_at = excluded.next_attempt_at
+        ''', (item['link'], json.dumps(stored), stage, error[:500], attempts, _now(), _now(), next_attempt))
+    return attempts
+
+def get_due_dead_letters(limit=50):
+    """
+    Failed documents whose retry time has come, as index items carrying
+    their previous number of `attempts`.
+    """
+    rows = get_connection().execute(
+        "SELECT item, attempts FROM dead_letters WHERE next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+        (_now(), limit)).fetchall()
+    return [{**json.loads(item), "attempts": attempts} for item, attempts in rows]
+
+def get_dead_letters(urls):
+    """
+    Returns {url: {"attempts", "next_attempt_at", "due"}} for the URLs that
+    failed before; `due` is whether their retry time has come.
+    """
+    if not urls:
+        return {}
+    placeholders = ",".join("?" * len(urls))
+    rows = get_connection().execute(
+        f"SELECT url, attempts, next_attempt_at, next_attempt_at <= ? FROM dead_letters WHERE url IN ({placeholders})",
+        [_now(), *urls])
+    return {url: {"attempts": attempts, "next_attempt_at": next_attempt_at, "due": bool(due)}
+            for url, attempts, next_attempt_at, due in rows}
+
+def resolve_dead_letter(url):
+    get_connection().execute("DELETE FROM dead_letters WHERE url = ?", (url,))
+
+def count_dead_letters():
+    return get_connection().execute("SELECT COUNT(*) FROM dead_letters").fetchone()[0]
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+def enqueue_scan_job(requested_by):
+    """
+    Queues a scan unless one is already queued or running (single flight).
+    Returns the id of the job that will do the work.
+    """
+    with transaction() as conn:
+        active = conn.execute(
+            "SELECT id FROM scan_jobs WHERE status IN ('queued', 'running') ORDER BY id LIMIT 1").fetchone()
+        if active:
+            return active[0]
+        return conn.execute(
+            "INSERT INTO scan_jobs (status, requested_by, requested_at, message) VALUES ('queued', ?, ?, ?)",
+            (requested_by, _now(), "Waiting for the scan worker...")).lastrowid
+
+def claim_next_job(worker):
+    """
+    Atomically moves the oldest queued job to running, or returns None if
+    nothing is queued or another worker is already running a job. Running
+    jobs whose heartbeat went stale are failed first.
+    """
+    stale_before = datetime.fromtimestamp(time.time() - STALE_JOB_SECONDS).strftime("%Y-%m-%d %H:%M:%S")
+    with transaction() as conn:
+        conn.execute('''
+            UPDATE scan_jobs SET status = 'failed', finished_at = ?, message = 'Worker stopped responding.'
+            WHERE status = 'running' AND heartbeat_at < ?
+        ''', (_now(), stale_before))
+        if conn.execute("SELECT 1 FROM scan_jobs WHERE status = 'running'").fetchone():
+            return None
+        row = conn.execute("SELECT id FROM scan_jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+        if not row:
+            return None
+        conn.execute('''
+            UPDATE scan_jobs SET status = 'running', worker = ?, started_at = ?, heartbeat_at = ?
+            WHERE id = ?
+        ''', (worker, _now(), _now(), row[0]))
+        return row[0]
+
+def update_job_progress(job_id, done, total, message):
+    get_connection().execute(
+        "UPDATE scan_jobs SET done = ?, total = ?, message = ?, heartbeat_at = ? WHERE id = ?",
+        (done, total, message, _now(), job_id))
+
+def touch_job(job_id):
+    """
+    Refreshes a running job's heartbeat without changing its progress.
+    """
+    get_connection().execute(
+        "UPDATE scan_jobs SET heartbeat_at = ? WHERE id = ? AND status = 'running'", (_now(), job_id))
+
+def finish_job(job_id, status, message):
+    get_connection().execute(
+        "UPDATE scan_jobs SET status = ?, message = ?, finished_at = ?, heartbeat_at = ? WHERE id = ?",
+        (status, message, _now(), _now(), job_id))
+
+def get_running_job_start():
+    """
+    When the running scan job started (Unix time), or None if none runs.
+    """
+    row = get_connection().execute(
+        "SELECT MIN(started_at) FROM scan_jobs WHERE status = 'running'").fetchone()
+    return datetime.strptime(row[0], "%Y-%m-%d %H:%M:%S").timestamp() if row[0] else None
+
+def get_latest_job(requested_by=None):
+    """
+    The most recent scan job as a dict (optionally only those from one requester).
+    """
+    conn = get_connection()
+    where, params = ("WHERE requested_by = ?", (requested_by,)) if requested_by else ("", ())
+    cursor = conn.execute(f"SELECT * FROM scan_jobs {where} ORDER BY id DESC LIMIT 1", params)
+    row = cursor.fetchone()
+    return dict(zip([d[0] for d in cursor.description], row)) if row else None
+
+def save_scan_metrics(job_id, rows):
+    """
+    Stores one scan's metrics: rows of (name, labels JSON, value).
+    """
+    recorded_at = _now()
+    with transaction() as conn:
+        conn.executemany(
+            "INSERT INTO scan_metrics (job_id, recorded_at, name, labels, value) VALUES (?, ?, ?, ?, ?)",
+            [(job_id, recorded_at, name, labels, value) for name, labels, value in rows])
+
+def get_scan_metrics(job_id=None):
+    """
+    Metrics of one job (default: the most recent job that recorded any).
+    """
+    conn = get_connection()
+    if job_id is None:
+        row = conn.execute("SELECT MAX(job_id) FROM scan_metrics").fetchone()
+        job_id = row[0] if row else None
+    return pd.read_sql_query(
+        "SELECT job_id, recorded_at, name, labels, value FROM scan_metrics WHERE job_id IS ? ORDER BY id",
+        conn, params=(job_id,))
@@ -0,0 +1,154 @@
+"""
+Local embedding index over stored regulations, for "related regulations" and
+for spotting recurring decrees (e.g. the monthly Harga Patokan Ekspor).
+
+Vectors come from feature hashing of words and word pairs (no model to
+download, CPU only, deterministic), so a document is embedded in about a
+millisecond. The index is one float32 matrix searched with a single
+matrix-vector product and persisted to INDEX_FILE; sync() only embeds rows
+added or re-saved since the last sync.
+"""
+import os
+import tempfile
+import threading
+import zlib
+
+import numpy as np
+
+import database
+import fingerprint
+
+# --- CONFIGURATION ---
+INDEX_FILE = "regulation_embeddings.npz"
+DIMENSIONS = 1024
+TEXT_CHARS = 4000          # extracted text embedded per document, after the title
+RELATED_LIMIT = 5
+
+def embed(text):
+    """
+    Unit-length vector for a text: signed hashed counts of its words and
+    word pairs, log-scaled so boilerplate repeated on every page does not dominate.
+    """
+    words = fingerprint.normalize_text(text).split()
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    if not features:
+        return vector
+    hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in features), dtype=np.uint32, count=len(features))
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+    vector += np.bincount(hashes % DIMENSIONS, weights=signs, minlength=DIMENSIONS).astype(np.float32)
+    vector = np.sign(vector) * np.log1p(np.abs(vector))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def document_text(original_title, extracted_text=None):
+    return f"{original_title} {(extracted_text or '')[:TEXT_CHARS]}"
+
+class EmbeddingIndex:
+    """
+    Regulation ids and their vectors (one row each), plus the sync cursor:
+    the last (regulations.timestamp, id) embedded and the highest id.
+    Safe to share between threads.
+    """
+    def __init__(self, path=INDEX_FILE):
+        self.path = path
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.vectors = np.zeros((0, DIMENSIONS), dtype=np.float32)
+        self.synced_at = ""
+        self.synced_at_id = 0
+        self.synced_id = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=INDEX_FILE):
+        index = cls(path)
+        if path and os.path.exists(path):
+            with np.load(path) as data:
+                if data["vectors"].shape[1] == DIMENSIONS:
+                    index.ids, index.vectors = data["ids"], data["vectors"]
+                    index.synced_at = str(data["synced_at"])
+                    # Indexes saved before ids were tracked: everything up to their newest row
+                    index.synced_id = int(data["synced_id"]) if "synced_id" in data.files else int(index.ids.max(initial=0))
+                    if "synced_at_id" in data.files:
+                        index.synced_at_id = int(data["synced_at_id"])
+        return index
+
+    def save(self):
+        with self._lock:
+            # A temp file of our own: another process may be saving the same index
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)),
+                                             prefix=os.path.basename(self.path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.savez(f, ids=self.ids, vectors=self.vectors, synced_at=np.array(self.synced_at),
+                             synced_at_id=np.array(self.synced_at_id), synced_id=np.array(self.synced_id))
+                os.replace(temp_path, self.path)   # readers never see a half-written index
+            except BaseException:
+                os.remove(temp_path)
+                raise
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, ids, vectors):
+        """
+        Inserts or replaces the vectors of the given regulation ids.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        with self._lock:
+            keep = ~np.isin(self.ids, ids)
+            self.ids = np.concatenate([self.ids[keep], ids])
+            self.vectors = np.vstack([self.vectors[keep], np.asarray(vectors, dtype=np.float32)])
+
+    def vector(self, regulation_id):
+        with self._lock:
+            rows = np.flatnonzero(self.ids == regulation_id)
+            return self.vectors[rows[0]] if len(rows) else None
+
+    def search(self, vector, limit=RELATED_LIMIT, exclude=()):
+        """
+        The `limit` most similar regulations as [(id, cosine similarity)], best first.
+        """
+        with self._lock:
+            ids, vectors = self.ids, self.vectors
+        if not len(ids):
+            return []
+        scores = vectors @ vector
+        if exclude:
+            scores[np.isin(ids, list(exclude))] = -np.inf
+        limit = min(limit, len(ids))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+    def related(self, regulation_id, limit=RELATED_LIMIT):
+        vector = self.vector(regulation_id)
+        return [] if vector is None else self.search(vector, limit, exclude=(regulation_id,))
+
+def sync(index):
+    """
+    Embeds every regulation added or re-saved since the index's last sync.
+    New rows are found by id, since imported ones keep their old timestamps;
+    re-saved rows by timestamp. Returns the number of documents embedded.
+    """
+    rows = database.get_embedding_sources(since=(index.synced_at, index.synced_at_id) if index.synced_id else None,
+                                          after_id=index.synced_id, text_chars=TEXT_CHARS)
+    if not rows:
+        return 0
+    index.add([row["id"] for row in rows],
+              np.stack([embed(document_text(row["original_title"], row["extracted_text"])) for row in rows]))
+    index.synced_at, index.synced_at_id = max((index.synced_at, index.synced_at_id),
+                                              *((row["timestamp"] or "", row["id"]) for row in rows))
+    index.synced_id = max(index.synced_id, *(row["id"] for row in rows))
+    return len(rows)
+
+def load_synced(path=INDEX_FILE, save=True):
+    """
+    The persisted index brought up to date with the database, and saved if
+    it changed. Readers such as the dashboard pass save=False and leave
+    the file to the scan that owns it.
+    """
+    index = EmbeddingIndex.load(path)
+    if sync(index) and path and save:
+        index.save()
+    return index
@@ -0,0 +1,156 @@
+"""
+Streaming exports of the regulations archive to CSV, Parquet and XLSX.
+
+Rows are read from SQLite CHUNK_ROWS at a time (keyset on id) and written
+out chunk by chunk, so memory stays bounded however long the history is:
+
+    python exporter.py export regulations.parquet --impact High
+    python exporter.py snapshot                  # compressed copy for BI tools
+
+Parquet needs pyarrow and XLSX needs xlsxwriter (`pip install pyarrow
+xlsxwriter`); CSV always works. Both load on first use, never when the
+dashboard merely renders. Snapshots are zstd Parquet files (gzip CSV
+without pyarrow) in SNAPSHOT_DIR, of which the newest SNAPSHOT_KEEP are kept.
+"""
+import argparse
+import csv
+import gzip
+import importlib.util
+import os
+import tempfile
+from datetime import datetime
+
+import database
+
+# --- CONFIGURATION ---
+CHUNK_ROWS = 5000
+COLUMNS = ("id", "regulation_date", "original_title", "english_title", "status", "commodity",
+           "vpti_impact", "summary", "action_required", "effective_date", "raw_link", "timestamp")
+SNAPSHOT_DIR = "snapshots"
+SNAPSHOT_KEEP = 14
+SNAPSHOT_PREFIX = "regulations-"
+
+MIME_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+def _write_csv(path, chunks, compress=False):
+    opener = gzip.open if compress else open
+    rows = 0
+    with opener(path, "wt", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for chunk in chunks:
+            writer.writerows(chunk)
+            rows += len(chunk)
+    return rows
+
+def _write_parquet(path, chunks):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # One row group per chunk; zstd keeps snapshots small and fast to read
+    schema = pa.schema([("id", pa.int64())] + [(name, pa.string()) for name in COLUMNS[1:]])
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for chunk in chunks:
+            columns = [pa.array(values, type=field.type) for values, field in zip(zip(*chunk), schema)]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+            rows += len(chunk)
+        if not rows:
+            writer.write_table(schema.empty_table())
+    return rows
+
+def _write_xlsx(path, chunks):
+    import xlsxwriter
+
+    # constant_memory flushes each row to disk as soon as the next one starts
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True, "strings_to_urls": False})
+    sheet = workbook.add_worksheet("Regulations")
+    sheet.write_row(0, 0, COLUMNS, workbook.add_format({"bold": True}))
+    rows = 0
+    for chunk in chunks:
+        for row in chunk:
+            rows += 1
+            sheet.write_row(rows, 0, row)
+    workbook.close()
+    return rows
+
+WRITERS = {"csv": _write_csv, "parquet": _write_parquet, "xlsx": _write_xlsx}
+REQUIRES = {"parquet": "pyarrow", "xlsx": "xlsxwriter"}
+
+def available_formats():
+    # find_spec only looks the package up; nothing heavy is imported
+    return [fmt for fmt in WRITERS if fmt not in REQUIRES or importlib.util.find_spec(REQUIRES[fmt])]
+
+def export(path, fmt="csv", impact=None, commodity=None, ids=None, chunk_size=CHUNK_ROWS):
+    """
+    Writes the regulations matching the filters (or only `ids`) to `path`.
+    Returns the number of rows written.
+    """
+    if fmt not in available_formats():
+        raise ValueError(f"{fmt} export is not available (supported here: {', '.join(available_formats())})")
+    chunks = database.iter_regulations(COLUMNS, impact, commodity, ids=ids, chunk_size=chunk_size)
+    return WRITERS[fmt](path, chunks)
+
+def export_bytes(fmt="csv", **filters):
+    """
+    export() into memory, for download buttons. Rows still stream from
+    SQLite; only the (compressed, for Parquet/XLSX) file is held.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"export.{fmt}")
+        export(path, fmt, **filters)
+        with open(path, "rb") as f:
+            return f.read()
+
+def list_snapshots(directory=SNAPSHOT_DIR):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.startswith(SNAPSHOT_PREFIX) and not name.endswith(".tmp"))
+
+def snapshot(directory=SNAPSHOT_DIR, keep=SNAPSHOT_KEEP):
+    """
+    Writes a compressed snapshot of the whole archive and prunes old ones.
+    Returns (path, rows).
+    """
+    os.makedirs(directory, exist_ok=True)
+    parquet = "parquet" in available_formats()
+    extension = "parquet" if parquet else "csv.gz"
+    path = os.path.join(directory, f"{SNAPSHOT_PREFIX}{datetime.now():%Y%m%d-%H%M%S}.{extension}")
+    temp_path = f"{path}.tmp"
+    chunks = database.iter_regulations(COLUMNS, chunk_size=CHUNK_ROWS)
+    rows = _write_parquet(temp_path, chunks) if parquet else _write_csv(temp_path, chunks, compress=True)
+    os.replace(temp_path, path)   # BI tools never pick up a half-written file
+
+    for old in list_snapshots(directory)[:-keep] if keep else []:
+        os.remove(old)
+    return path, rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_parser = sub.add_parser("export", help="export (filtered) regulations to a file")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--format", choices=list(WRITERS), help="default: from the file extension")
+    export_parser.add_argument("--impact")
+    export_parser.add_argument("--commodity")
+    snapshot_parser = sub.add_parser("snapshot", help="write a compressed snapshot of the archive")
+    snapshot_parser.add_argument("--directory", default=SNAPSHOT_DIR)
+    snapshot_parser.add_argument("--keep", type=int, default=SNAPSHOT_KEEP)
+    args = parser.parse_args()
+
+    database.init_db()
+    if args.command == "export":
+        fmt = args.format or os.path.splitext(args.path)[1].lstrip(".").lower()
+        rows = export(args.path, fmt, args.impact, args.commodity)
+        print(f"💾 Exported {rows} regulations to {args.path}")
+    else:
+        path, rows = snapshot(args.directory, args.keep)
+        print(f"📦 Snapshot of {rows} regulations written to {path}")
+
+if __name__ == "__main__":
+    main()
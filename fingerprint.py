@@ -0,0 +1,122 @@
+"""
+Content fingerprints for change detection on already-stored regulations.
+
+Every saved document keeps three fingerprints next to its regulations row:
+
+    pdf_hash   - sha256 of the downloaded file (same bytes -> skip everything)
+    text_hash  - sha256 of the normalized text (re-encoded PDF, same words)
+    sketch     - bottom-k hashes of its word shingles, an estimate of how
+                 much of the wording two versions share (Jaccard)
+
+A re-fetched document that matches exactly or nearly is not analyzed again;
+one that really changed is diffed against the stored text and only the
+changed sections are sent to the LLM.
+"""
+import difflib
+import hashlib
+import heapq
+import json
+import re
+
+# --- CONFIGURATION ---
+SHINGLE_WORDS = 5              # words per shingle
+SKETCH_SIZE = 256              # smallest shingle hashes kept per document
+NEAR_DUPLICATE = 0.99          # estimated similarity treated as "same document" (OCR noise)
+DIFF_MAX_SHARE = 0.6           # diffs larger than this share of the text: send it all
+DIFF_MAX_CHARS = 6000
+
+# Indonesian regulations are organised in articles ("Pasal 5"); a new section
+# also starts at chapter headings ("BAB II") and at the list of appendices.
+SECTION_PATTERN = re.compile(r"^\s*(?:Pasal\s+\d+[A-Z]?|BAB\s+[IVXLC]+|LAMPIRAN)\b", re.MULTILINE)
+WORD_PATTERN = re.compile(r"\w+")
+
+def file_hash(path, chunk_size=1 << 16):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def normalize_text(text):
+    """
+    Lower-cased words only, so line breaks, spacing and punctuation noise
+    from PDF extraction do not count as changes.
+    """
+    return " ".join(WORD_PATTERN.findall(text.lower()))
+
+def text_hash(text):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+def _shingle_hash(shingle):
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+
+def sketch(text):
+    """
+    Bottom-k MinHash sketch: the SKETCH_SIZE smallest hashes of the text's
+    word shingles, ascending.
+    """
+    words = normalize_text(text).split()
+    if len(words) < SHINGLE_WORDS:
+        shingles = {" ".join(words)} if words else set()
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    return heapq.nsmallest(SKETCH_SIZE, {_shingle_hash(s) for s in shingles})
+
+def similarity(a, b):
+    """
+    Estimated Jaccard similarity of two documents from their sketches.
+    """
+    if not a or not b:
+        return 0.0
+    a, b = set(a), set(b)
+    union = heapq.nsmallest(SKETCH_SIZE, a | b)
+    return sum(1 for h in union if h in a and h in b) / len(union)
+
+def fingerprint(text, pdf_hash=None):
+    """
+    The fingerprint fields stored with a regulation.
+    """
+    return {"pdf_hash": pdf_hash, "text_hash": text_hash(text), "sketch": json.dumps(sketch(text))}
+
+def is_same_document(new, stored):
+    """
+    True when fingerprint dicts `new` and `stored` describe the same content.
+    """
+    if new.get("pdf_hash") and new["pdf_hash"] == stored.get("pdf_hash"):
+        return True
+    if new["text_hash"] == stored.get("text_hash"):
+        return True
+    if not stored.get("sketch"):
+        return False
+    return similarity(json.loads(new["sketch"]), json.loads(stored["sketch"])) >= NEAR_DUPLICATE
+
+def split_sections(text):
+    """
+    Splits regulation text at article / chapter headings; text without them
+    falls back to lines.
+    """
+    starts = [m.start() for m in SECTION_PATTERN.finditer(text)]
+    if len(starts) < 2:
+        return [line.strip() for line in text.splitlines() if line.strip()]
+    bounds = [0] + starts if starts[0] else starts
+    return [text[a:b].strip() for a, b in zip(bounds, bounds[1:] + [len(text)]) if text[a:b].strip()]
+
+def changed_sections(old_text, new_text):
+    """
+    The sections of `new_text` that were added or rewritten since
+    `old_text`, plus the headings of removed ones. Returns None when the
+    change is too broad for a diff to be worth it (analyze everything).
+    """
+    old, new = split_sections(old_text), split_sections(new_text)
+    matcher = difflib.SequenceMatcher(None, [normalize_text(s) for s in old],
+                                      [normalize_text(s) for s in new], autojunk=False)
+    parts = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag in ("replace", "insert"):
+            parts.extend(new[j1:j2])
+        elif tag == "delete":
+            parts.append("[Removed] " + "; ".join(s.splitlines()[0][:80] for s in old[i1:i2]))
+    changed = "\n\n".join(parts)
+    if not changed or len(changed) > DIFF_MAX_SHARE * len(new_text):
+        return None
+    return changed[:DIFF_MAX_CHARS]
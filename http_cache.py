@@ -0,0 +1,162 @@
+"""
+Persistent HTTP cache for the crawler.
+
+Entries are keyed by URL and remember the ETag / Last-Modified validators
+so repeat requests become conditional GETs (304 = reuse the stored body).
+Bodies live on disk content-addressed by SHA-256, so the same PDF served
+under two URLs is stored once. The cache is kept under a byte budget by
+evicting the least recently used URLs.
+"""
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+# --- CONFIGURATION ---
+CACHE_DIR = "http_cache"
+CACHE_MAX_BYTES = 512 * 1024 * 1024   # 512 MB of bodies on disk
+CHUNK_SIZE = 64 * 1024
+
+class HttpCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.blob_dir = os.path.join(cache_dir, "blobs")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self.db_path = os.path.join(cache_dir, "index.db")
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS entries (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    body_hash TEXT,
+                    size INTEGER,
+                    last_access REAL
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_access ON entries(last_access)")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def blob_path(self, body_hash):
+        return os.path.join(self.blob_dir, body_hash[:2], body_hash)
+
+    def lookup(self, url):
+        """
+        Returns the cached entry for a URL (dict) or None if absent/incomplete.
+        """
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT etag, last_modified, body_hash, size FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+        if not row:
+            return None
+        entry = dict(zip(("etag", "last_modified", "body_hash", "size"), row))
+        if not os.path.exists(self.blob_path(entry["body_hash"])):
+            return None
+        return entry
+
+    def validators(self, entry):
+        """
+        Conditional request headers for a cached entry.
+        """
+        headers = {}
+        if entry and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def touch(self, url):
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE entries SET last_access = ? WHERE url = ?", (time.time(), url))
+
+    def read(self, entry):
+        with open(self.blob_path(entry["body_hash"]), "rb") as f:
+            return f.read()
+
+    def store(self, url, response, max_body_bytes=None, deadline=None):
+        """
+        Streams a 200 response body to disk and records its validators.
+        Returns the entry dict (body_hash, size, ...). Raises ValueError if
+        the body grows past max_body_bytes; `deadline.check()` (if given) runs
+        before every chunk so a slow body can be abandoned.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    if deadline:
+                        deadline.check()
+                    digest.update(chunk)
+                    size += len(chunk)
+                    if max_body_bytes and size > max_body_bytes:
+                        raise ValueError(f"body exceeds {max_body_bytes} bytes: {url}")
+                    tmp.write(chunk)
+            body_hash = digest.hexdigest()
+            path = self.blob_path(body_hash)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path):
+                os.remove(tmp_path)   # identical body already stored
+            else:
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        entry = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "body_hash": body_hash,
+            "size": size,
+        }
+        with self._lock, self._connect() as conn:
+            old = conn.execute("SELECT body_hash FROM entries WHERE url = ?", (url,)).fetchone()
+            conn.execute('''
+                INSERT OR REPLACE INTO entries (url, etag, last_modified, body_hash, size, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (url, entry["etag"], entry["last_modified"], body_hash, size, time.time()))
+            if old and old[0] != body_hash:
+                self._drop_blob_if_orphaned(conn, old[0])
+            self._evict(conn, keep=url)
+        return entry
+
+    def _drop_blob_if_orphaned(self, conn, body_hash):
+        in_use = conn.execute("SELECT 1 FROM entries WHERE body_hash = ? LIMIT 1", (body_hash,)).fetchone()
+        if not in_use:
+            try:
+                os.remove(self.blob_path(body_hash))
+            except FileNotFoundError:
+                pass
+
+    def _evict(self, conn, keep=None):
+        """
+        Drops least recently used URLs until the stored bodies fit the budget.
+        The entry just stored (`keep`) is never evicted by its own write.
+        """
+        total = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT body_hash, size FROM entries)"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, body_hash in conn.execute(
+            "SELECT url, body_hash FROM entries ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            if url == keep:
+                continue
+            conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+            shared = conn.execute("SELECT 1 FROM entries WHERE body_hash = ? LIMIT 1", (body_hash,)).fetchone()
+            if not shared:
+                size = os.path.getsize(self.blob_path(body_hash)) if os.path.exists(self.blob_path(body_hash)) else 0
+                self._drop_blob_if_orphaned(conn, body_hash)
+                total -= size
@@ -0,0 +1,115 @@
+"""
+One-shot import of the legacy `watchdog analyzer.py` log into the
+regulations table, so its analyses show up on the dashboard and are never
+sent to Groq again (the pipeline adopts links that are already stored).
+
+    python importer.py                            # vpti_regulatory_log.csv
+    python importer.py old_logs/*.csv --chunk 20000
+
+The CSV is streamed CHUNK_ROWS rows at a time and loaded in one transaction:
+an interrupted import leaves nothing behind, and a re-run skips every link
+that is already stored.
+"""
+import argparse
+import csv
+import re
+import time
+
+import database
+
+# --- CONFIGURATION ---
+LEGACY_CSV = "vpti_regulatory_log.csv"
+CHUNK_ROWS = 10000
+MAX_FIELD_CHARS = 10 * 1024 * 1024
+
+# legacy column -> regulations column
+COLUMN_MAP = {
+    "scan_date": "timestamp",
+    "original_url": "raw_link",
+    "english_title": "english_title",
+    "status": "status",
+    "commodity": "commodity",
+    "vpti_impact": "vpti_impact",
+    "key_changes": "summary",
+    "action_required": "action_required",
+    "effective_date": "effective_date",
+}
+ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+def title_from_link(link):
+    """
+    The legacy log has no original title; JDIH slugs spell it out
+    ('.../keputusan-menteri-perdagangan-nomor-2243-tahun-2025-tentang-...').
+    """
+    slug = link.rstrip("/").rsplit("/", 1)[-1]
+    return " ".join(word.capitalize() for word in slug.split("-") if word)
+
+def to_row(record):
+    """
+    One legacy CSV record as a regulations row tuple, or None if it has no link.
+    """
+    data = {column: (record.get(legacy) or "").strip() for legacy, column in COLUMN_MAP.items()}
+    if not data["raw_link"]:
+        return None
+    # The log has no regulation date. Like an undated index card in the
+    # pipeline, the row is dated by the day it was scanned; effective_date
+    # (a different date) stays in its own column
+    regulation_date = data["timestamp"][:10] if ISO_DATE.match(data["timestamp"][:10]) else None
+    return (
+        data["timestamp"],
+        regulation_date or "Unknown",
+        (record.get("original_title") or "").strip() or title_from_link(data["raw_link"]),
+        data["english_title"] or "N/A",
+        data["status"] or "New",
+        data["commodity"] or "General",
+        data["vpti_impact"] or "Low",
+        data["summary"] or "No summary",
+        data["action_required"] or "None",
+        data["raw_link"],
+        data["effective_date"] or None,
+    )
+
+def read_chunks(path, stats, chunk_size=CHUNK_ROWS):
+    """
+    Yields lists of row tuples; counts read and skipped records in `stats`.
+    """
+    csv.field_size_limit(MAX_FIELD_CHARS)
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        chunk = []
+        for record in csv.DictReader(f):
+            stats["read"] += 1
+            row = to_row(record)
+            if row is None:
+                stats["skipped"] += 1
+                continue
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+def import_csv(path=LEGACY_CSV, chunk_size=CHUNK_ROWS):
+    """
+    Imports one legacy log. Returns {"read", "skipped", "imported"}.
+    """
+    stats = {"read": 0, "skipped": 0}
+    stats["imported"] = database.import_regulations(read_chunks(path, stats, chunk_size))
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", default=[LEGACY_CSV])
+    parser.add_argument("--chunk", type=int, default=CHUNK_ROWS, help="rows per executemany batch")
+    args = parser.parse_args()
+
+    database.init_db()
+    for path in args.paths:
+        start = time.perf_counter()
+        stats = import_csv(path, args.chunk)
+        print(f"📥 {path}: {stats['imported']} regulations imported from {stats['read']} rows "
+              f"({stats['read'] - stats['skipped'] - stats['imported']} already stored or repeated, "
+              f"{stats['skipped']} without a link) in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
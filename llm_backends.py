@@ -0,0 +1,512 @@
+"""
+LLM backends behind one interface, with hedged requests between them.
+
+    groq             Groq's API (GROQ_API_KEY), the default primary
+    name=URL         any OpenAI-compatible /chat/completions endpoint
+                     (key in NAME_API_KEY, model in NAME_MODEL)
+    local            a llama.cpp server on this machine (LOCAL_LLM_URL, e.g.
+                     http://127.0.0.1:8080/v1), or with LLAMA_MODEL_PATH set a
+                     GGUF model run in-process on the CPU (`pip install
+                     llama-cpp-python`); neither needs the network
+
+LLM_BACKENDS lists the ones to use ("groq,local" by default; unconfigured
+ones are left out). Every answer must be valid JSON that passes the caller's
+schema check. Otherwise it counts as a failure and the next backend is
+tried.
+
+A request goes to the backend with the best recent latency and success
+rate. If it has not answered after its own p95 latency, the same request is
+sent to the runner-up as well, and the first valid answer wins. A slow or
+failing provider then costs one p95 of delay, not a timeout or an "Error" row.
+Time spent waiting for our own rate-limit budget is not part of an attempt:
+the budget is reserved before the attempt's clock starts, and an attempt
+still queued locally is never hedged.
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import metrics
+
+# --- CONFIGURATION ---
+BACKENDS = os.environ.get("LLM_BACKENDS", "groq,local")
+GROQ_MODEL = "llama-3.1-8b-instant"
+LOCAL_LLM_URL = os.environ.get("LOCAL_LLM_URL")
+LOCAL_LLM_MODEL = os.environ.get("LOCAL_LLM_MODEL", "local")
+LLAMA_MODEL_PATH = os.environ.get("LLAMA_MODEL_PATH")
+LLAMA_CONTEXT = 8192            # tokens; the longest prompt is ~4k (MAX_TEXT_CHARS / 4)
+MAX_OUTPUT_TOKENS = 1024
+REQUEST_TIMEOUT = 120           # seconds, for HTTP backends without their own
+MAX_ATTEMPTS = 5                # Groq: per request, on 429 / timeouts / 5xx
+
+# --- ROUTING ---
+STATS_WINDOW = 50               # recent attempts per backend that routing looks at
+STATS_MIN_SAMPLES = 5           # below this, a backend's expected latency is used instead
+HEDGE_DEFAULT_DELAY = 5.0       # seconds, until the primary has enough samples for a p95
+HEDGE_MIN_DELAY = 0.5
+HEDGE_MAX_DELAY = 30.0
+HEDGE_WORKERS = 32              # threads for in-flight attempts; a hung provider must not starve hedges
+
+ANALYSIS_FIELDS = ("english_title", "status", "commodity", "vpti_impact", "key_changes", "action_required")
+
+class SchemaError(ValueError):
+    pass
+
+class Cancelled(Exception):
+    """
+    Raised by an attempt that stopped because another backend already won.
+    """
+
+def parse_duration(value):
+    """
+    Parses rate-limit reset values such as "7.66s", "1m26.4s", "120ms" or "30".
+    """
+    if not value:
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    seconds = 0.0
+    for amount, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value):
+        seconds += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return seconds
+
+def _check_analysis(entry):
+    missing = [field for field in ANALYSIS_FIELDS if not isinstance(entry.get(field), str) or not entry[field].strip()]
+    if missing:
+        raise SchemaError(f"missing or empty: {', '.join(missing)}")
+
+def validate_analysis(content):
+    """
+    The analysis dict in a single-document answer; raises SchemaError.
+    """
+    try:
+        result = json.loads(content)
+    except (TypeError, ValueError) as e:
+        raise SchemaError(f"not JSON: {e}")
+    if not isinstance(result, dict):
+        raise SchemaError("not a JSON object")
+    _check_analysis(result)
+    return result
+
+def validate_batch(content):
+    """
+    The {"results": [...]} of a packed answer; raises SchemaError when there
+    is no usable entry (single bad entries are re-asked by the caller).
+    """
+    try:
+        result = json.loads(content)
+    except (TypeError, ValueError) as e:
+        raise SchemaError(f"not JSON: {e}")
+    entries = result.get("results") if isinstance(result, dict) else None
+    if not isinstance(entries, list):
+        raise SchemaError("no results list")
+    valid = []
+    for entry in entries:
+        try:
+            _check_analysis(entry)
+        except (SchemaError, AttributeError):
+            continue
+        if "doc_id" in entry:
+            valid.append(entry)
+    if not valid:
+        raise SchemaError("no valid result entry")
+    return {"results": valid}
+
+class BackendStats:
+    """
+    Latency and outcome of a backend's recent attempts, and the start times
+    of those still running. Thread-safe.
+    """
+    def __init__(self, expected_latency):
+        self.expected_latency = expected_latency
+        self._attempts = deque(maxlen=STATS_WINDOW)   # (ok, seconds)
+        self._running = {}                            # attempt id -> start time
+        self._lock = threading.Lock()
+        self.requests = self.failures = self.wins = 0
+
+    def start(self):
+        with self._lock:
+            attempt = object()
+            self._running[attempt] = time.monotonic()
+            return attempt
+
+    def record(self, attempt, ok):
+        with self._lock:
+            seconds = time.monotonic() - self._running.pop(attempt)
+            self._attempts.append((ok, seconds))
+            self.requests += 1
+            self.failures += not ok
+            return seconds
+
+    def discard(self, attempt):
+        """
+        Forgets a running attempt that was cancelled, without an outcome.
+        """
+        with self._lock:
+            self._running.pop(attempt, None)
+
+    def record_win(self):
+        with self._lock:
+            self.wins += 1
+
+    def _latencies(self):
+        with self._lock:
+            return sorted(seconds for ok, seconds in self._attempts if ok)
+
+    def quantile(self, q):
+        latencies = self._latencies()
+        if len(latencies) < STATS_MIN_SAMPLES:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def success_rate(self):
+        with self._lock:
+            ok = sum(1 for success, _ in self._attempts if success)
+            return (ok + 1) / (len(self._attempts) + 2)   # a new backend starts at 50%, not 0 or 100
+
+    def score(self):
+        """
+        Expected seconds to a valid answer: typical latency over success rate.
+        An attempt still running for longer counts as that slow, so a
+        provider that has started to hang loses rank before it times out.
+        """
+        p50 = self.quantile(0.5)
+        with self._lock:
+            oldest = min(self._running.values(), default=None)
+        hanging = time.monotonic() - oldest if oldest is not None else 0.0
+        return max(p50 if p50 is not None else self.expected_latency, hanging) / self.success_rate()
+
+    def summary(self):
+        p50, p95 = self.quantile(0.5), self.quantile(0.95)
+        return {"requests": self.requests, "failures": self.failures, "wins": self.wins,
+                "p50": p50, "p95": p95, "success_rate": round(self.success_rate(), 3)}
+
+class Backend:
+    """
+    One chat completion provider. complete() returns the raw message content
+    of a JSON-mode answer, or raises.
+    """
+    name = "backend"
+    model = None
+    expected_latency = 5.0   # seconds, until real samples exist
+    rate_limited = False     # spends the shared `limiter` budget
+
+    def __init__(self):
+        self.stats = BackendStats(self.expected_latency)
+
+    def complete(self, system_prompt, user_content, limiter=None, tokens=0, cancelled=None):
+        """
+        For a rate-limited backend the caller has already reserved the first
+        request's `tokens` on `limiter`; retries reserve their own. Once the
+        `cancelled` event is set, no new request may be started (raise
+        Cancelled instead).
+        """
+        raise NotImplementedError
+
+class GroqBackend(Backend):
+    """
+    Groq's API through its SDK; the only backend that spends the shared
+    `limiter` budget and follows its rate-limit headers.
+    """
+    name = "groq"
+    expected_latency = 1.5
+    rate_limited = True
+
+    def __init__(self, model=GROQ_MODEL):
+        super().__init__()
+        self.model = model
+        self._client = None
+        self._lock = threading.Lock()
+
+    def client(self):
+        """
+        Built on first use: the key is read from the environment or, failing
+        that, from Streamlit secrets.
+        """
+        with self._lock:
+            if self._client is None:
+                from groq import Groq
+
+                api_key = os.environ.get("GROQ_API_KEY")
+                if not api_key:
+                    import streamlit as st
+                    api_key = st.secrets["GROQ_API_KEY"]
+                # Our own retry loop below handles 429s with the rate-limit headers
+                self._client = Groq(api_key=api_key, max_retries=0)
+            return self._client
+
+    def complete(self, system_prompt, user_content, limiter=None, tokens=0, cancelled=None):
+        import groq
+
+        client = self.client()
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            if attempt > 1:
+                if cancelled is not None and cancelled.is_set():
+                    raise Cancelled()
+                if limiter:
+                    with metrics.span("llm_wait"):
+                        limiter.wait(tokens)
+            try:
+                with metrics.span("llm_request"):
+                    raw = client.chat.completions.with_raw_response.create(
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": user_content}
+                        ],
+                        model=self.model,
+                        temperature=0,
+                        response_format={"type": "json_object"}
+                    )
+                if limiter:
+                    limiter.update_from_headers(raw.headers)
+                completion = raw.parse()
+                if completion.usage:
+                    metrics.incr("llm_tokens_total", completion.usage.prompt_tokens, direction="prompt")
+                    metrics.incr("llm_tokens_total", completion.usage.completion_tokens, direction="completion")
+                return completion.choices[0].message.content
+            except groq.RateLimitError as e:
+                if attempt == MAX_ATTEMPTS:
+                    raise
+                wait = parse_duration(e.response.headers.get("retry-after")) or 2 ** attempt
+                print(f"      ⏳ Groq rate limit, retrying in {wait:.1f}s")
+                if limiter:
+                    limiter.update_from_headers(e.response.headers)
+                    limiter.backoff(wait)
+                else:
+                    time.sleep(wait)
+            except (groq.APITimeoutError, groq.APIConnectionError, groq.InternalServerError):
+                if attempt == MAX_ATTEMPTS:
+                    raise
+                time.sleep(2 ** attempt)
+
+class OpenAICompatibleBackend(Backend):
+    """
+    Any /chat/completions endpoint speaking the OpenAI protocol: another
+    provider, or llama.cpp's `llama-server` on localhost. One attempt per
+    call; the router decides what happens after a failure.
+    """
+    expected_latency = 3.0
+
+    def __init__(self, name, base_url, model, api_key=None, expected_latency=None):
+        import requests   # llm_processor's importers should not pay for it
+
+        self.name = name
+        if expected_latency is not None:
+            self.expected_latency = expected_latency
+        super().__init__()
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.model = model
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._session = requests.Session()
+
+    def complete(self, system_prompt, user_content, limiter=None, tokens=0, cancelled=None):
+        resp = self._session.post(self.url, headers=self.headers, timeout=REQUEST_TIMEOUT, json={
+            "model": self.model,
+            "messages": [{"role": "system", "content": system_prompt},
+                         {"role": "user", "content": user_content}],
+            "temperature": 0,
+            "max_tokens": MAX_OUTPUT_TOKENS,
+            "response_format": {"type": "json_object"},
+        })
+        resp.raise_for_status()
+        return resp.json()["choices"][0]["message"]["content"]
+
+class LlamaCppBackend(Backend):
+    """
+    A GGUF model run in this process by llama-cpp-python, on the CPU. The
+    model loads on first use and serves one request at a time.
+    """
+    name = "local"
+    expected_latency = 20.0
+
+    def __init__(self, model_path=LLAMA_MODEL_PATH):
+        super().__init__()
+        self.model = os.path.basename(model_path)
+        self.model_path = model_path
+        self._llama = None
+        self._lock = threading.Lock()
+
+    def complete(self, system_prompt, user_content, limiter=None, tokens=0, cancelled=None):
+        with self._lock:
+            if cancelled is not None and cancelled.is_set():   # won elsewhere while queued for the model
+                raise Cancelled()
+            if self._llama is None:
+                from llama_cpp import Llama
+
+                self._llama = Llama(model_path=self.model_path, n_ctx=LLAMA_CONTEXT,
+                                    n_threads=os.cpu_count(), verbose=False)
+            completion = self._llama.create_chat_completion(
+                messages=[{"role": "system", "content": system_prompt},
+                          {"role": "user", "content": user_content}],
+                temperature=0,
+                max_tokens=MAX_OUTPUT_TOKENS,
+                response_format={"type": "json_object"},   # grammar-constrained: always parses
+            )
+        return completion["choices"][0]["message"]["content"]
+
+def build_backends(spec=BACKENDS):
+    """
+    Backends for an LLM_BACKENDS string, in its order; "local" is left out
+    when neither LOCAL_LLM_URL nor LLAMA_MODEL_PATH is set.
+    """
+    backends = []
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, url = entry.partition("=")
+        if name == "groq":
+            backends.append(GroqBackend())
+        elif name == "local" and LOCAL_LLM_URL:
+            backends.append(OpenAICompatibleBackend("local", LOCAL_LLM_URL, LOCAL_LLM_MODEL, expected_latency=10.0))
+        elif name == "local" and LLAMA_MODEL_PATH:
+            backends.append(LlamaCppBackend(LLAMA_MODEL_PATH))
+        elif url:
+            prefix = name.upper()
+            backends.append(OpenAICompatibleBackend(name, url, os.environ.get(f"{prefix}_MODEL", GROQ_MODEL),
+                                                    os.environ.get(f"{prefix}_API_KEY")))
+    return backends
+
+class Router:
+    """
+    Sends each request to the best-ranked backend and hedges it with the
+    runner-up once the primary is slower than its p95. Shared by every LLM
+    worker thread.
+    """
+    def __init__(self, backends):
+        self.backends = list(backends)
+        self._executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="llm")
+
+    def ranked(self):
+        # sorted() is stable: equal scores keep the configured order
+        return sorted(self.backends, key=lambda backend: backend.stats.score())
+
+    def hedge_delay(self, backend):
+        p95 = backend.stats.quantile(0.95)
+        return min(max(p95 if p95 is not None else HEDGE_DEFAULT_DELAY, HEDGE_MIN_DELAY), HEDGE_MAX_DELAY)
+
+    def _attempt(self, backend, system_prompt, user_content, validate, limiter, tokens, cancelled, started):
+        if cancelled.is_set():
+            raise Cancelled()
+        started.append(time.monotonic())
+        attempt = backend.stats.start()
+        try:
+            content = backend.complete(system_prompt, user_content, limiter, tokens, cancelled)
+            result = validate(content)
+        except Cancelled:
+            backend.stats.discard(attempt)
+            raise
+        except Exception as e:
+            backend.stats.record(attempt, False)
+            metrics.incr("llm_backend_requests_total", backend=backend.name,
+                         result="invalid" if isinstance(e, SchemaError) else "error")
+            raise
+        seconds = backend.stats.record(attempt, True)
+        metrics.incr("llm_backend_requests_total", backend=backend.name, result="ok")
+        metrics.incr("llm_backend_seconds_total", seconds, backend=backend.name)
+        return result, content, backend
+
+    def complete(self, system_prompt, user_content, validate, limiter=None, tokens=0):
+        """
+        The first answer that passes `validate` (which returns the parsed
+        result or raises SchemaError), as (result, raw content, backend).
+        Raises RuntimeError when every backend failed.
+        """
+        order = self.ranked()
+        if not order:
+            raise RuntimeError("no LLM backend configured (see LLM_BACKENDS)")
+        in_flight, errors = {}, []     # future -> (backend, [start time once running])
+        cancelled = threading.Event()
+        hedge_blocked_until = 0.0
+
+        def launch(hedge=False):
+            backend = order[len(in_flight) + len(errors)]
+            # Reserve the budget before the attempt's clock starts; a hedge
+            # only goes out if it needs no waiting at all
+            if limiter and backend.rate_limited:
+                if hedge:
+                    if not limiter.try_acquire(tokens):
+                        return False
+                else:
+                    with metrics.span("llm_wait"):
+                        limiter.wait(tokens)
+            started = []
+            future = self._executor.submit(self._attempt, backend, system_prompt, user_content,
+                                           validate, limiter, tokens, cancelled, started)
+            in_flight[future] = (backend, started)
+            return True
+
+        def hedge_at():
+            # None while the only attempt is still queued for a worker thread
+            backend, started = next(iter(in_flight.values()))
+            if not started:
+                return None
+            return max(started[0] + self.hedge_delay(backend), hedge_blocked_until)
+
+        launch()
+        try:
+            while in_flight:
+                can_hedge = len(in_flight) == 1 and len(in_flight) + len(errors) < len(order)
+                timeout = None
+                if can_hedge:
+                    at = hedge_at()
+                    timeout = HEDGE_MIN_DELAY if at is None else max(0.0, at - time.monotonic())
+                done, _ = wait(list(in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    backend, _ = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        errors.append(f"{backend.name}: {type(e).__name__}: {e}")
+                        continue
+                    backend.stats.record_win()
+                    if backend is not order[0]:
+                        metrics.incr("llm_hedges_total", result="won")
+                    return result
+                if len(in_flight) + len(errors) >= len(order):
+                    continue
+                if not in_flight:
+                    launch()
+                elif len(in_flight) == 1:
+                    at = hedge_at()
+                    if at is None or time.monotonic() < at:
+                        continue
+                    if launch(hedge=True):
+                        metrics.incr("llm_hedges_total", result="fired")
+                    else:
+                        hedge_blocked_until = time.monotonic() + HEDGE_MIN_DELAY
+            raise RuntimeError("; ".join(errors))
+        finally:
+            # Stop the losers: queued attempts never start, retries are skipped
+            cancelled.set()
+            for future in in_flight:
+                future.cancel()
+
+    def stats(self):
+        return {backend.name: backend.stats.summary() for backend in self.backends}
+
+_router = None
+_router_lock = threading.Lock()
+
+def get_router():
+    """
+    The process-wide router over build_backends(), built on first use so
+    importing this module stays cheap.
+    """
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = Router(build_backends())
+        return _router
+
+def set_backends(backends):
+    """
+    Replaces the process-wide router (benchmarks, tests, other setups).
+    """
+    global _router
+    with _router_lock:
+        _router = Router(backends)
+        return _router
@@ -1,14 +1,18 @@
+import hashlib
 import json
-import streamlit as st
-from groq import Groq
+import re
+import threading
+import time
+from collections import deque
+import condenser
+import database
+import llm_backends
+import metrics
 
-client = Groq(api_key=st.secrets["GROQ_API_KEY"])
+# The primary model; each cached answer is keyed on the model that gave it
+MODEL = llm_backends.GROQ_MODEL
 
-def analyze_regulation(text_content):
-    """
-    Analyzes the extracted PDF text using the specific VPTI Compliance Prompt.
-    """
-    system_prompt = """
+SYSTEM_PROMPT = """
     You are a Trade Compliance AI. Analyze the Indonesian regulation text.
     You MUST output ONLY valid JSON. Do not add markdown formatting like ```json.
     
@@ -22,31 +26,307 @@ def analyze_regulation(text_content):
         "action_required": "What must the surveyor/importer do?"
     }
     """
+
+BATCH_SYSTEM_PROMPT = """
+    You are a Trade Compliance AI. You will receive several Indonesian regulation
+    texts, each introduced by a line "### DOCUMENT <doc_id>". Analyze each one
+    independently. You MUST output ONLY valid JSON. Do not add markdown formatting.
     
+    Required JSON Structure:
+    {
+        "results": [
+            {
+                "doc_id": 1,
+                "english_title": "Translated Title",
+                "status": "New/Amendment/Revocation",
+                "commodity": "Commodity Name or 'General'",
+                "vpti_impact": "High/Medium/Low",
+                "key_changes": "Brief summary of changes (1-2 sentences)",
+                "action_required": "What must the surveyor/importer do?"
+            }
+        ]
+    }
+    Return exactly one entry per document.
+    """
+
+# --- BUDGETS (Groq free tier for llama-3.1-8b-instant) ---
+REQUESTS_PER_MINUTE = 30
+TOKENS_PER_MINUTE = 6000
+MAX_TEXT_CHARS = 15000
+OUTPUT_TOKENS_PER_DOC = 250     # rough size of one JSON analysis
+BATCH_DOC_MAX_TOKENS = 1200     # only documents this short are packed together
+BATCH_TOKEN_BUDGET = 4500       # prompt tokens per packed request
+BATCH_MAX_DOCS = 6
+
+# --- PROMPT CONDENSING ---
+# Send the title metadata and the operative articles instead of the first
+# MAX_TEXT_CHARS of the PDF (mostly letterhead and "Mengingat" recitals).
+USE_CONDENSER = True
+
+# --- RESULT CACHE ---
+# temperature=0 makes the output deterministic, so identical input can
+# safely reuse the stored answer instead of another Groq round trip.
+USE_RESULT_CACHE = True
+CACHE_STATS = {"hits": 0, "misses": 0}
+_cache_lock = threading.Lock()
+_cache_ready = False
+
+def cache_key(text, system_prompt=SYSTEM_PROMPT, model=MODEL):
+    normalized = re.sub(r"\s+", " ", text).strip()
+    payload = json.dumps([normalized, system_prompt.strip(), model], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _cache_get(keys):
+    """
+    The first cached answer among `keys`, counted as one hit or miss.
+    """
+    global _cache_ready
+    with _cache_lock:
+        if not _cache_ready:
+            database.init_llm_cache()
+            _cache_ready = True
+    cached = next(filter(None, map(database.get_cached_analysis, keys)), None)
+    with _cache_lock:
+        CACHE_STATS["hits" if cached else "misses"] += 1
+    metrics.incr("llm_cache_total", result="hit" if cached else "miss")
+    return json.loads(cached) if cached else None
+
+def _cached_analysis(prompt_text, system_prompts=(SYSTEM_PROMPT,)):
+    """
+    The cached answer for a prompt under the first of `system_prompts` that
+    has one, from the primary model, else from any other configured
+    backend's model, or None.
+    """
+    models = dict.fromkeys([MODEL] + [backend.model for backend in llm_backends.get_router().backends])
+    return _cache_get(cache_key(prompt_text, system_prompt, model)
+                      for system_prompt in system_prompts for model in models)
+
+READ_FAILED = {
+    "english_title": "PDF Read Failed",
+    "status": "Unknown",
+    "commodity": "Unknown",
+    "vpti_impact": "Unknown",
+    "key_changes": "Could not extract text from PDF.",
+    "action_required": "Check manually."
+}
+
+def get_cache_stats():
+    with _cache_lock:
+        return dict(CACHE_STATS)
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate (~4 characters per token for Latin-script text).
+    """
+    return len(text) // 4 + 1
+
+def prepare_prompt(text_content):
+    """
+    The document text actually sent to the LLM, at most MAX_TEXT_CHARS.
+    Reports the tokens it saves over sending the raw opening text.
+    """
+    raw_text = text_content[:MAX_TEXT_CHARS]
+    if not USE_CONDENSER:
+        return raw_text
+    prompt_text = condenser.condense(text_content, MAX_TEXT_CHARS)
+    before, after = estimate_tokens(raw_text), estimate_tokens(prompt_text)
+    metrics.incr("llm_document_tokens_total", before, stage="raw")
+    metrics.incr("llm_document_tokens_total", after, stage="condensed")
+    if after < before:
+        print(f"      🗜️ Condensed prompt: {before} -> {after} tokens")
+    return prompt_text
+
+class RateLimiter:
+    """
+    Keeps LLM traffic under both a requests-per-minute and a tokens-per-minute
+    budget, and backs off when the provider says so through its rate-limit
+    headers. Shared by every LLM worker thread of a scan.
+    """
+    def __init__(self, per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=None):
+        self.per_minute = per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._lock = threading.Lock()
+        self._window = deque()        # (start time, tokens) of calls in the last minute
+        self._blocked_until = 0.0
+
+    def _wait_time(self, now, tokens):
+        while self._window and now - self._window[0][0] >= 60:
+            self._window.popleft()
+        delay = max(0.0, self._blocked_until - now)
+        if len(self._window) >= self.per_minute:
+            delay = max(delay, 60 - (now - self._window[0][0]))
+        if self.tokens_per_minute:
+            used = sum(t for _, t in self._window)
+            # Let an oversized request through on an empty window rather than never
+            for start, spent in self._window:
+                if used + tokens <= self.tokens_per_minute:
+                    break
+                used -= spent
+                delay = max(delay, 60 - (now - start))
+        return delay
+
+    def wait(self, tokens=0):
+        """
+        Blocks until a request of `tokens` fits in both budgets, then reserves it.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                delay = self._wait_time(now, tokens)
+                if delay <= 0:
+                    self._window.append((now, tokens))
+                    return
+            time.sleep(delay)
+
+    def try_acquire(self, tokens=0):
+        """
+        Reserves a request of `tokens` if it fits right now; never blocks.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._wait_time(now, tokens) > 0:
+                return False
+            self._window.append((now, tokens))
+            return True
+
+    def update_from_headers(self, headers):
+        """
+        Adapts to the provider's view of our budget (x-ratelimit-* / retry-after).
+        """
+        if not headers:
+            return
+        pause = llm_backends.parse_duration(headers.get("retry-after"))
+        if headers.get("x-ratelimit-remaining-requests") == "0":
+            pause = max(pause, llm_backends.parse_duration(headers.get("x-ratelimit-reset-requests")))
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        if remaining_tokens is not None and remaining_tokens.isdigit() and int(remaining_tokens) < OUTPUT_TOKENS_PER_DOC:
+            pause = max(pause, llm_backends.parse_duration(headers.get("x-ratelimit-reset-tokens")))
+        if pause:
+            self.backoff(pause)
+
+    def backoff(self, seconds):
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+def _chat(system_prompt, user_content, validate, limiter=None, tokens=0):
+    """
+    One JSON-mode chat completion through the backend router (see
+    llm_backends.py). Returns (validated result, raw content, backend).
+    """
+    result, content, backend = llm_backends.get_router().complete(
+        system_prompt, user_content, validate, limiter, tokens)
+    if backend.name != "groq":
+        print(f"      🔀 Answered by the {backend.name} backend ({backend.model})")
+    return result, content, backend
+
+def analyze_regulation(text_content, limiter=None):
+    """
+    Analyzes the extracted PDF text using the specific VPTI Compliance Prompt.
+    Cache hits return immediately; only real Groq calls wait on `limiter`.
+    """
     # Safety: If no PDF text was found, handle it gracefully
     if not text_content or len(text_content) < 50:
-        return {
-            "english_title": "PDF Read Failed",
-            "status": "Unknown",
-            "commodity": "Unknown",
-            "vpti_impact": "Unknown",
-            "key_changes": "Could not extract text from PDF.",
-            "action_required": "Check manually."
-        }
+        return dict(READ_FAILED)
+    return _analyze_prompt(prepare_prompt(text_content), limiter)
+
+def _analyze_prompt(prompt_text, limiter=None):
+    if USE_RESULT_CACHE:
+        cached = _cached_analysis(prompt_text)
+        if cached is not None:
+            return cached
 
     try:
-        completion = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Analyze this text:\n{text_content[:15000]}"}
-            ],
-            model="llama-3.1-8b-instant",
-            temperature=0,
-            response_format={"type": "json_object"}
-        )
-        return json.loads(completion.choices[0].message.content)
+        tokens = estimate_tokens(SYSTEM_PROMPT + prompt_text) + OUTPUT_TOKENS_PER_DOC
+        result, content, backend = _chat(SYSTEM_PROMPT, f"Analyze this text:\n{prompt_text}",
+                                         llm_backends.validate_analysis, limiter, tokens)
+        if USE_RESULT_CACHE:
+            database.save_cached_analysis(cache_key(prompt_text, model=backend.model), backend.model, content)
+        return result
     except Exception as e:
         return {
             "english_title": "Error",
             "key_changes": str(e)
-        }
\ No newline at end of file
+        }
+
+def _pack_batches(docs):
+    """
+    Greedily packs (index, text) pairs into batches under the token budget.
+    """
+    batches, current, current_tokens = [], [], 0
+    for index, text in docs:
+        tokens = estimate_tokens(text)
+        if current and (current_tokens + tokens > BATCH_TOKEN_BUDGET or len(current) >= BATCH_MAX_DOCS):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append((index, text))
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def _analyze_batch(batch, limiter=None):
+    """
+    Sends one packed request. Returns ({index: analysis}, model that
+    answered); missing or malformed entries are simply left out.
+    """
+    user_content = "\n\n".join(f"### DOCUMENT {doc_id}\n{text}" for doc_id, (_, text) in enumerate(batch, start=1))
+    tokens = estimate_tokens(BATCH_SYSTEM_PROMPT + user_content) + OUTPUT_TOKENS_PER_DOC * len(batch)
+    result, _, backend = _chat(BATCH_SYSTEM_PROMPT, user_content, llm_backends.validate_batch, limiter, tokens)
+
+    answered = {}
+    for entry in result["results"]:
+        try:
+            doc_id = int(entry.pop("doc_id"))
+        except (KeyError, TypeError, ValueError):
+            continue
+        if 1 <= doc_id <= len(batch) and entry.get("english_title"):
+            answered[batch[doc_id - 1][0]] = entry
+    return answered, backend.model
+
+def analyze_regulations_batch(texts, limiter=None):
+    """
+    Analyzes many regulation texts, returning one analysis per input in order.
+    Short documents are packed several to a request; long ones (and anything
+    a packed answer missed) go through analyze_regulation on their own.
+    """
+    results = [None] * len(texts)
+    prompts = [None] * len(texts)
+    short_docs, long_docs = [], []
+
+    for index, text in enumerate(texts):
+        if not text or len(text) < 50:
+            results[index] = dict(READ_FAILED)
+            continue
+        prompt_text = prepare_prompt(text)
+        prompts[index] = prompt_text
+        # A packed answer can stand in here, but never for a single-document call
+        cached = _cached_analysis(prompt_text, (SYSTEM_PROMPT, BATCH_SYSTEM_PROMPT)) if USE_RESULT_CACHE else None
+        if cached is not None:
+            results[index] = cached
+        elif estimate_tokens(prompt_text) <= BATCH_DOC_MAX_TOKENS:
+            short_docs.append((index, prompt_text))
+        else:
+            long_docs.append(index)
+
+    for batch in _pack_batches(short_docs):
+        if len(batch) == 1:
+            long_docs.append(batch[0][0])
+            continue
+        try:
+            answered, model = _analyze_batch(batch, limiter)
+        except Exception as e:
+            print(f"      ⚠️ Batch analysis failed, falling back to single requests: {e}")
+            answered = {}
+        for index, text in batch:
+            if index in answered:
+                results[index] = answered[index]
+                if USE_RESULT_CACHE:
+                    # Keyed on the batch prompt: the answer shared its request with other documents
+                    database.save_cached_analysis(cache_key(text, BATCH_SYSTEM_PROMPT, model), model,
+                                                  json.dumps(answered[index]))
+            else:
+                long_docs.append(index)
+
+    for index in long_docs:
+        results[index] = _analyze_prompt(prompts[index], limiter)
+    return results
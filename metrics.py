@@ -0,0 +1,101 @@
+"""
+Lightweight scan instrumentation: per-stage spans and labelled counters.
+
+    with metrics.span("pdf_download"):
+        ...
+    metrics.incr("http_bytes_total", len(body), source="network")
+
+Everything accumulates in one lock-protected dict (a perf_counter call and
+a dict update per event). When a scan ends, export() writes the values to
+the scan_metrics table and to a Prometheus text file that node_exporter's
+textfile collector (or any scraper reading the file) can pick up.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+
+# --- CONFIGURATION ---
+ENABLED = True
+METRICS_FILE = "scan_metrics.prom"
+PREFIX = "kso_watchdog_"
+
+_lock = threading.Lock()
+_values = {}   # (name, sorted label items) -> value
+
+def incr(name, value=1, **labels):
+    if not ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _values[key] = _values.get(key, 0) + value
+
+def observe(stage, seconds):
+    """
+    Records one timed call of a stage (for work timed outside span()).
+    """
+    incr("stage_calls_total", stage=stage)
+    incr("stage_seconds_total", seconds, stage=stage)
+
+@contextlib.contextmanager
+def span(stage):
+    """
+    Times the block as one call of `stage`; an exception escaping it is
+    counted in failures_total by stage and exception type.
+    """
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        incr("failures_total", stage=stage, type=type(e).__name__)
+        raise
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+def snapshot():
+    """
+    Current values as [(name, labels dict, value)].
+    """
+    with _lock:
+        return [(name, dict(labels), value) for (name, labels), value in sorted(_values.items())]
+
+def reset():
+    with _lock:
+        _values.clear()
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def render_prometheus(rows):
+    lines = []
+    typed = set()
+    for name, labels, value in rows:
+        metric = PREFIX + name
+        if metric not in typed:
+            typed.add(metric)
+            lines.append(f"# TYPE {metric} counter")
+        label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+        lines.append(f"{metric}{{{label_text}}} {value}" if label_text else f"{metric} {value}")
+    lines.append(f"# TYPE {PREFIX}last_export_timestamp_seconds gauge")
+    lines.append(f"{PREFIX}last_export_timestamp_seconds {time.time():.0f}")
+    return "\n".join(lines) + "\n"
+
+def export(job_id=None, path=METRICS_FILE):
+    """
+    Persists the current values for a scan job and rewrites the Prometheus file.
+    """
+    import database   # keeps crawler / PDF workers free of the pandas import
+
+    rows = snapshot()
+    database.save_scan_metrics(job_id, [(name, json.dumps(labels, sort_keys=True), value)
+                                        for name, labels, value in rows])
+    if path:
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(render_prometheus(rows))
+        os.replace(temp_path, path)   # scrapers never see a half-written file
+    return rows
@@ -0,0 +1,161 @@
+"""
+Parallel PDF text extraction with an OCR fallback for scanned pages.
+
+A document's page budget is split into small page ranges that run as
+separate tasks in a process pool, so one long document uses several cores
+and pdfplumber never runs on the UI's interpreter. Pages that carry images
+but (almost) no text layer are treated as scans and sent to Tesseract in
+the same worker. OCR is optional: it needs `pip install pytesseract` and
+the tesseract binary with the Indonesian language pack (tesseract-ocr-ind);
+without them scanned pages simply yield no text.
+"""
+import contextlib
+import signal
+import threading
+import time
+from concurrent.futures import Future
+
+import pdfplumber
+
+import crawler
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+# --- CONFIGURATION ---
+PAGE_BUDGET = 6          # pages parsed per document
+PAGES_PER_TASK = 2       # pages handled by one pool task
+MIN_TEXT_CHARS = 25      # less text than this on a page with images = scanned page
+OCR_LANG = "ind+eng"
+OCR_RESOLUTION = 200     # DPI used to render a page for OCR
+
+@contextlib.contextmanager
+def time_limit(seconds):
+    """
+    Raises TimeoutError if the block runs longer than `seconds`. Relies on
+    SIGALRM, so it only applies on the main thread of a process (e.g. the
+    parse workers); elsewhere it is a no-op.
+    """
+    if (not seconds or not hasattr(signal, "SIGALRM")
+            or threading.current_thread() is not threading.main_thread()):
+        yield
+        return
+
+    def on_timeout(signum, frame):
+        raise TimeoutError(f"page took longer than {seconds}s")
+
+    previous = signal.signal(signal.SIGALRM, on_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def _ocr_page(page):
+    image = page.to_image(resolution=OCR_RESOLUTION).original
+    try:
+        return pytesseract.image_to_string(image, lang=OCR_LANG)
+    except pytesseract.TesseractError:
+        # Language pack missing: English still recovers numbers and HS codes
+        return pytesseract.image_to_string(image)
+
+def extract_pages(pdf_path, page_numbers, use_ocr=True):
+    """
+    Worker-process task: returns [(page_number, text, method)] for the given
+    1-based pages, where method is "text", "ocr", "scanned" (no OCR
+    available) or "timeout". Pages past the end of the document are ignored.
+    """
+    results = []
+    with pdfplumber.open(pdf_path, pages=list(page_numbers)) as pdf:
+        for page in pdf.pages:
+            method = "text"
+            try:
+                with time_limit(crawler.PDF_PAGE_TIMEOUT):
+                    text = page.extract_text() or ""
+                if len(text.strip()) < MIN_TEXT_CHARS and page.images:
+                    if use_ocr and pytesseract:
+                        with time_limit(crawler.PDF_PAGE_TIMEOUT * 3):
+                            text = _ocr_page(page)
+                        method = "ocr"
+                    else:
+                        method = "scanned"
+            except TimeoutError:
+                text, method = "", "timeout"
+            finally:
+                page.close()
+            results.append((page.page_number, text, method))
+    return results
+
+def _extract_task(pdf_path, page_numbers, use_ocr):
+    # Pool entry point: also reports the worker time spent, queueing excluded
+    start = time.perf_counter()
+    pages = extract_pages(pdf_path, page_numbers, use_ocr)
+    return time.perf_counter() - start, pages
+
+def _page_ranges(page_budget):
+    pages = list(range(1, page_budget + 1))
+    return [pages[i:i + PAGES_PER_TASK] for i in range(0, len(pages), PAGES_PER_TASK)]
+
+def _combine(results):
+    pages = sorted(page for _, chunk in results for page in chunk)
+    text = "".join(text + "\n" for _, text, _ in pages if text)
+    stats = {"pages": len(pages), "seconds": sum(seconds for seconds, _ in results)}
+    for _, _, method in pages:
+        stats[method] = stats.get(method, 0) + 1
+    return text, stats
+
+def extract_async(pool, pdf_path, on_done, page_budget=PAGE_BUDGET, use_ocr=True):
+    """
+    Submits the document's page ranges to `pool` and calls
+    on_done(text, stats, error) once every range has finished. stats counts
+    pages by method, plus the worker seconds spent on the document.
+    """
+    ranges = _page_ranges(page_budget)
+    results = [None] * len(ranges)
+    remaining = [len(ranges)]
+    errors = []
+    lock = threading.Lock()
+
+    def collect(index):
+        def done(future):
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                results[index] = (0.0, [])
+                errors.append(e)
+            with lock:
+                remaining[0] -= 1
+                finished = remaining[0] == 0
+            if finished:
+                text, stats = _combine(results)
+                on_done(text, stats, errors[0] if errors and not text else None)
+        return done
+
+    for index, pages in enumerate(ranges):
+        try:
+            future = pool.submit(_extract_task, pdf_path, pages, use_ocr)
+        except Exception as e:
+            # e.g. a broken pool: still report, so on_done always fires exactly once
+            future = Future()
+            future.set_exception(e)
+        future.add_done_callback(collect(index))
+
+def extract_text(pdf_path, pool, page_budget=PAGE_BUDGET, use_ocr=True):
+    """
+    Blocking convenience wrapper around extract_async. Returns (text, stats).
+    """
+    finished = threading.Event()
+    outcome = {}
+
+    def on_done(text, stats, error):
+        outcome.update(text=text, stats=stats, error=error)
+        finished.set()
+
+    extract_async(pool, pdf_path, on_done, page_budget, use_ocr)
+    finished.wait()
+    if outcome["error"]:
+        raise outcome["error"]
+    return outcome["text"], outcome["stats"]
@@ -0,0 +1,432 @@
+"""
+Staged deep-processing pipeline for the "Check New Regulation" scan.
+
+    fetch (thread pool) -> parse (process pool) -> analyze (rate-limited threads)
+
+Stages are connected by queues; merged records come back to the caller as
+they finish so the caller (Streamlit) can save them and move the progress bar.
+"""
+import datetime
+import hashlib
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import crawler
+import database
+import embeddings
+import fingerprint
+import llm_processor
+import metrics
+import pdf_engine
+
+# --- CONFIGURATION ---
+FETCH_WORKERS = 6            # detail page + PDF downloads (network bound)
+PARSE_WORKERS = 4            # pdfplumber / OCR page ranges (CPU bound, outside the GIL)
+PDF_PAGE_BUDGET = pdf_engine.PAGE_BUDGET
+LLM_WORKERS = 3              # concurrent Groq requests
+LLM_REQUESTS_PER_MINUTE = llm_processor.REQUESTS_PER_MINUTE
+LLM_TOKENS_PER_MINUTE = llm_processor.TOKENS_PER_MINUTE
+
+# --- FRONTIER ---
+MAX_INDEX_PAGES = 5          # never paginate deeper than this per scan
+KNOWN_RUN_LIMIT = 10         # stop after this many already-processed items in a row
+SAVE_BATCH_SIZE = 10         # records per database transaction
+DEAD_LETTER_MAX_ATTEMPTS = 5 # then a document is analyzed from its index title alone
+REVALIDATE_KNOWN = True      # re-check known links seen on the index with a conditional GET of their PDF
+
+# --- CHANGE DETECTION ---
+AMENDMENT_NOTE = ("[This regulation was already analyzed; the published text has since changed. "
+                  "Only the changed sections are shown below.]")
+RECURRING_SIMILARITY = 0.9   # embedding similarity at which a new link is a re-issue of a stored one
+RECURRING_NOTE = ("[This document closely follows an earlier regulation, \"{title}\", which was analyzed as: "
+                  "{summary} Only the sections that differ from it are shown below.]")
+REUSED_FIELDS = ("english_title", "status", "commodity", "vpti_impact", "action_required")
+FAILED_TITLES = ("Error", "PDF Read Failed")   # stored rows that are no valid earlier version
+
+_STOP = object()
+
+def index_fingerprint(item):
+    """
+    Fingerprint of what the index card shows; a change re-queues the page.
+    An undated card is fingerprinted by its title alone, so it stays known.
+    """
+    return hashlib.sha1(f"{item['original_title']}|{item['date'] or ''}".encode("utf-8")).hexdigest()
+
+def _index_pages(max_pages):
+    """
+    Yields (page, items or the exception it failed with) in page order.
+    Page 1 is fetched alone, since on most scans it already holds the known
+    run that ends the walk; the deeper pages are fetched in parallel batches.
+    """
+    page = 1
+    while page <= max_pages:
+        size = 1 if page == 1 else crawler.INDEX_FETCH_WORKERS
+        batch = range(page, min(max_pages + 1, page + size))
+        yield from zip(batch, crawler.fetch_index_pages(batch, lenient=False))
+        page = batch.stop
+
+def collect_new_items(max_pages=MAX_INDEX_PAGES, known_run_limit=KNOWN_RUN_LIMIT, revalidate=None):
+    """
+    Walks the index pages and returns the frontier: items whose detail page
+    is unseen or whose card changed since it was processed. Pagination stops
+    after `known_run_limit` consecutive known items. A page that fails to
+    load is skipped (its items stay unknown, so the next scan reaches them);
+    only an empty page ends pagination.
+    With `revalidate` (default REVALIDATE_KNOWN) the known items walked past
+    are returned as well, marked "revalidate": a PDF replaced under an
+    unchanged card is only noticed by fetching it again, which the HTTP
+    cache turns into a conditional GET.
+    """
+    revalidate = REVALIDATE_KNOWN if revalidate is None else revalidate
+    frontier = []
+    queued = set()
+    known_run = 0
+    failed_pages = 0
+    today = datetime.date.today().isoformat()
+
+    for page, page_links in _index_pages(max_pages):
+        if isinstance(page_links, Exception):
+            print(f"❌ Error scanning page {page}: {page_links}")
+            failed_pages += 1
+            continue
+        if not page_links:
+            break
+
+        state = database.get_crawl_state([item['link'] for item in page_links])
+        seen = []
+        adopted = []
+        for item in page_links:
+            card_fingerprint = index_fingerprint(item)
+            seen.append((item['link'], card_fingerprint))
+            if item['link'] in state and state[item['link']] in (card_fingerprint, None):
+                if state[item['link']] is None:
+                    # Processed before crawl_state (or imported): no PDF of ours to compare with
+                    adopted.append((item['link'], card_fingerprint))
+                elif revalidate and item['link'] not in queued:
+                    queued.add(item['link'])
+                    frontier.append({**item, "date": item['date'] or today, "fingerprint": card_fingerprint,
+                                     "revalidate": True})
+                known_run += 1
+                continue
+            known_run = 0
+            if item['link'] not in queued:
+                queued.add(item['link'])
+                # An undated card is stored under the day it was first scanned
+                frontier.append({**item, "date": item['date'] or today, "fingerprint": card_fingerprint})
+
+        database.touch_crawl_state(seen)
+        for url, card_fingerprint in adopted:
+            database.mark_crawled(url, card_fingerprint)
+        if known_run >= known_run_limit:
+            print(f"   -> Stopping after {known_run} known items in a row (page {page}).")
+            break
+
+    if failed_pages and failed_pages == page:
+        raise RuntimeError(f"the regulation index could not be loaded ({failed_pages} pages failed)")
+    return frontier
+
+def apply_dead_letters(items):
+    """
+    Carries the earlier failures of frontier items (`attempts`,
+    `next_attempt_at`) over from the dead-letter table, so a link that is
+    still on the index backs off and gives up like a queued retry. Returns
+    (items to process now, number still backing off).
+    """
+    letters = database.get_dead_letters([item['link'] for item in items])
+    due, waiting = [], 0
+    for item in items:
+        letter = letters.get(item['link'])
+        if not letter:
+            due.append(item)
+        elif letter["due"]:
+            due.append({**item, "attempts": letter["attempts"], "next_attempt_at": letter["next_attempt_at"]})
+        else:
+            waiting += 1
+    return due, waiting
+
+def _fetch_stage(fetch_q, parse_q, done_q):
+    while True:
+        item = fetch_q.get()
+        if item is _STOP:
+            break
+        print(f"   🔎 Fetching PDF for: {item['link']}")
+        try:
+            pdf_path = crawler.fetch_document(item['link'])
+            if pdf_path:
+                digest = fingerprint.file_hash(pdf_path)
+                # Archived compressed for audit and re-analysis; a known PDF is not stored again
+                _, size = database.get_blob_store().put_file(pdf_path, digest)
+                item = {**item, "pdf_hash": digest, "pdf_size": size}
+                stored = database.get_stored_version(item['link'], with_text=False)
+                if stored and stored["pdf_hash"] == item["pdf_hash"] and stored["english_title"] not in FAILED_TITLES:
+                    crawler.release_pdf(pdf_path)
+                    metrics.incr("change_detection_total", result="same_pdf")
+                    print("      ♻️ Same PDF as the stored version, skipping analysis.")
+                    done_q.put({**item, "unchanged": True})
+                    continue
+            parse_q.put((item, pdf_path))
+        except Exception as e:
+            print(f"      ⚠️ PDF Download Failed: {e}")
+            if item.get("attempts", 0) + 1 >= DEAD_LETTER_MAX_ATTEMPTS:
+                parse_q.put((item, None))   # give up on the PDF, analyze the title
+            else:
+                done_q.put({**item, "fetch_error": f"{type(e).__name__}: {e}"})
+
+def _parse_stage(parse_q, llm_q, pool):
+    def forward(item, pdf_path):
+        def done(text, stats, error):
+            crawler.release_pdf(pdf_path)
+            metrics.observe("pdf_parse", stats["seconds"])
+            for method, count in stats.items():
+                if method not in ("pages", "seconds"):
+                    metrics.incr("pdf_pages_total", count, method=method)
+            if error:
+                metrics.incr("failures_total", stage="pdf_parse", type=type(error).__name__)
+                print(f"      ⚠️ PDF Extraction Failed: {error}")
+                text = None
+            else:
+                print(f"      📄 Extracted {len(text)} chars from {stats['pages']} pages "
+                      f"({stats.get('ocr', 0)} OCR, {stats.get('scanned', 0)} unreadable scans).")
+            llm_q.put((item, text))
+        return done
+
+    while True:
+        job = parse_q.get()
+        if job is _STOP:
+            break
+        item, pdf_path = job
+        if not pdf_path:
+            llm_q.put((item, None))
+            continue
+        # Page ranges of one document run side by side in the process pool
+        pdf_engine.extract_async(pool, pdf_path, forward(item, pdf_path), page_budget=PDF_PAGE_BUDGET)
+
+def _compare_with_similar(item, pdf_text, index):
+    """
+    For a link seen for the first time: looks up the closest stored
+    regulation in the embedding index. Returns (item, text to analyze,
+    analysis): the same text reuses that regulation's analysis, a close
+    match (a recurring decree) is analyzed from the differences only.
+    """
+    if index is None or not len(index):
+        return item, pdf_text, None
+    matches = index.search(embeddings.embed(embeddings.document_text(item['original_title'], pdf_text)), limit=1)
+    if not matches or matches[0][1] < RECURRING_SIMILARITY:
+        return item, pdf_text, None
+    prior = database.get_regulation(matches[0][0])
+    if not prior or not prior["extracted_text"] or prior["english_title"] in FAILED_TITLES:
+        return item, pdf_text, None
+
+    if fingerprint.is_same_document(item, fingerprint.fingerprint(prior["extracted_text"])):
+        metrics.incr("change_detection_total", result="reused")
+        print(f"      ♻️ Same text as regulation #{prior['id']}, reusing its analysis.")
+        return item, None, {**{key: prior[key] for key in REUSED_FIELDS}, "key_changes": prior["summary"]}
+    changes = fingerprint.changed_sections(prior["extracted_text"], pdf_text)
+    if not changes:
+        return item, pdf_text, None
+    metrics.incr("change_detection_total", result="recurring")
+    print(f"      🔁 Follows regulation #{prior['id']} ({matches[0][1]:.2f}): "
+          f"analyzing {len(changes)} changed of {len(pdf_text)} chars.")
+    note = RECURRING_NOTE.format(title=prior["original_title"], summary=prior["summary"])
+    return item, f"{item['original_title']}\n{note}\n\n{changes}", None
+
+def _prepare_analysis(item, pdf_text, index=None):
+    """
+    Fingerprints the extracted text and compares it with the stored version
+    of the same link, or for a new link with the most similar stored
+    regulation. Returns (item with fingerprints, text to analyze, analysis):
+    the text is None when no LLM call is needed - the document has not
+    (meaningfully) changed, or `analysis` is reused - and only the changed
+    sections when it has. A stored row whose analysis failed is analyzed
+    again in full.
+    """
+    if not pdf_text:
+        return item, item['original_title'], None
+    item = {**item, **fingerprint.fingerprint(pdf_text, item.get("pdf_hash"))}
+    stored = database.get_stored_version(item['link'])
+    if not stored:
+        return _compare_with_similar(item, pdf_text, index)
+    if not stored["extracted_text"] or stored["english_title"] in FAILED_TITLES:
+        return item, pdf_text, None
+    if not stored["text_hash"]:
+        # Saved before fingerprints existed: derive them from the stored text
+        stored.update(fingerprint.fingerprint(stored["extracted_text"], stored["pdf_hash"]))
+    if fingerprint.is_same_document(item, stored):
+        metrics.incr("change_detection_total", result="same_text")
+        print("      ♻️ Text matches the stored version, skipping analysis.")
+        return item, None, None
+    changes = fingerprint.changed_sections(stored["extracted_text"], pdf_text)
+    if not changes:
+        metrics.incr("change_detection_total", result="rewritten")
+        return item, pdf_text, None
+    metrics.incr("change_detection_total", result="diff")
+    print(f"      ✏️ Amended: analyzing {len(changes)} changed of {len(pdf_text)} chars.")
+    return item, f"{item['original_title']}\n{AMENDMENT_NOTE}\n\n{changes}", None
+
+def _llm_stage(llm_q, done_q, limiter, index=None):
+    while True:
+        job = llm_q.get()
+        if job is _STOP:
+            break
+
+        # Drain whatever else is already waiting so short documents can share a request
+        jobs, stop = [job], False
+        while len(jobs) < llm_processor.BATCH_MAX_DOCS:
+            try:
+                job = llm_q.get_nowait()
+            except queue.Empty:
+                break
+            if job is _STOP:
+                stop = True
+                break
+            jobs.append(job)
+
+        pending = []
+        for item, pdf_text in jobs:
+            try:
+                item, prompt, analysis = _prepare_analysis(item, pdf_text, index)
+            except Exception as e:
+                # Every item must come back, or process_items waits for it forever
+                metrics.incr("failures_total", stage="change_detection", type=type(e).__name__)
+                print(f"      ⚠️ Change detection failed: {e}")
+                done_q.put({**item, "english_title": "Error", "key_changes": f"{type(e).__name__}: {e}",
+                            "extracted_text": pdf_text})
+                continue
+            if analysis:
+                done_q.put({**item, **analysis, "extracted_text": pdf_text})
+            elif prompt is None:
+                done_q.put({**item, "unchanged": True})
+            else:
+                pending.append((item, pdf_text, prompt))
+
+        try:
+            analyses = llm_processor.analyze_regulations_batch([prompt for _, _, prompt in pending], limiter=limiter)
+        except Exception as e:
+            analyses = [{"english_title": "Error", "key_changes": str(e)}] * len(pending)
+        for (item, pdf_text, _), analysis in zip(pending, analyses):
+            done_q.put({**item, **analysis, "extracted_text": pdf_text}) # Merge dicts
+        if stop:
+            break
+
+def process_items(items, index=None):
+    """
+    Runs every item through download -> PDF parse -> LLM analysis concurrently.
+    `index` (an embeddings.EmbeddingIndex) lets new documents reuse the
+    analysis of a stored one they closely follow.
+    Yields merged records (item + analysis) in completion order; an item
+    whose download failed comes back early with a "fetch_error" instead, and
+    one whose content matches the stored version with "unchanged" set.
+    """
+    if not items:
+        return
+
+    fetch_q, parse_q, llm_q, done_q = (queue.Queue() for _ in range(4))
+    limiter = llm_processor.RateLimiter(LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE)
+
+    with ProcessPoolExecutor(max_workers=PARSE_WORKERS) as pool:
+        # Fork the parse workers now, while this is the only running thread: a
+        # child forked later could inherit a lock held by a fetch thread and hang
+        pool.submit(int).result()
+        fetchers = [threading.Thread(target=_fetch_stage, args=(fetch_q, parse_q, done_q), daemon=True)
+                    for _ in range(FETCH_WORKERS)]
+        parser = threading.Thread(target=_parse_stage, args=(parse_q, llm_q, pool), daemon=True)
+        analysts = [threading.Thread(target=_llm_stage, args=(llm_q, done_q, limiter, index), daemon=True)
+                    for _ in range(LLM_WORKERS)]
+        threads = fetchers + [parser] + analysts
+        for t in threads:
+            t.start()
+
+        for item in items:
+            fetch_q.put(item)
+        for _ in fetchers:
+            fetch_q.put(_STOP)
+
+        for _ in range(len(items)):
+            yield done_q.get()
+
+        parse_q.put(_STOP)
+        for _ in analysts:
+            llm_q.put(_STOP)
+        for t in threads:
+            t.join()
+
+def run_scan(on_progress=None):
+    """
+    Full scan: index frontier -> deep processing -> batched saves.
+    `on_progress(done, total, message)` is called as the scan advances.
+    Returns the number of regulations saved.
+    """
+    report = on_progress or (lambda done, total, message: None)
+    report(0, 0, "Scanning the index for unseen or changed regulations...")
+
+    # 1. SCAN INDEX (Frontier of unseen / changed detail pages, plus failures due for a retry)
+    with metrics.span("frontier"):
+        frontier = collect_new_items()
+    new_items, backing_off = apply_dead_letters(frontier)
+    queued = {item['link'] for item in frontier}
+    retries = [item for item in database.get_due_dead_letters() if item['link'] not in queued]
+    new_items += retries
+    if backing_off:
+        print(f"   -> {backing_off} failed items are still backing off.")
+    if not new_items:
+        report(0, 0, "System is up to date.")
+        return 0
+
+    # 2. DEEP PROCESS (Download PDF & Analyze), saving in small batches as results land
+    rechecks = sum(1 for item in new_items if item.get("revalidate"))
+    report(0, len(new_items), f"Found {len(new_items) - rechecks} new items ({len(retries)} retries), "
+                              f"re-checking {rechecks} known. Starting Deep Analysis...")
+    # Stored regulations by similarity; extended as this scan saves, so a
+    # decree can also follow one saved a few documents earlier
+    index = embeddings.load_synced()
+    pending = []
+    saved = deferred = unchanged = 0
+    for i, full_record in enumerate(process_items(new_items, index)):
+        if full_record.get("fetch_error") and full_record.get("revalidate"):
+            # The stored version stays; the next scan checks the link again
+            print(f"      ⚠️ Could not re-check {full_record['link']}: {full_record['fetch_error']}")
+        elif full_record.get("fetch_error"):
+            item = {key: value for key, value in full_record.items() if key != "fetch_error"}
+            attempts = database.add_dead_letter(item, "fetch", full_record["fetch_error"])
+            metrics.incr("documents_total", outcome="dead_letter")
+            print(f"      📮 Queued for retry (attempt {attempts}): {item['link']}")
+            deferred += 1
+        elif full_record.get("unchanged"):
+            database.update_fingerprints([full_record])
+            database.mark_crawled(full_record['link'], full_record['fingerprint'])
+            if "attempts" in full_record:
+                database.resolve_dead_letter(full_record['link'])
+            metrics.incr("documents_total", outcome="unchanged")
+            unchanged += 1
+        elif full_record.get("english_title") == "Error":
+            # A failed analysis never replaces the stored row; it is retried instead
+            attempts = database.add_dead_letter(full_record, "analyze", full_record.get('key_changes') or "LLM error")
+            metrics.incr("documents_total", outcome="error")
+            print(f"      📮 Analysis failed, queued for retry (attempt {attempts}): {full_record['link']}")
+            deferred += 1
+        else:
+            pending.append(full_record)
+        if pending and (len(pending) >= SAVE_BATCH_SIZE or i + 1 == len(new_items)):
+            with metrics.span("db_save"):
+                database.save_regulations_bulk(pending)
+            for record in pending:
+                outcome = "read_failed" if record.get('english_title') == "PDF Read Failed" else "analyzed"
+                metrics.incr("documents_total", outcome=outcome)
+                database.mark_crawled(record['link'], record['fingerprint'])
+                if "attempts" in record:
+                    database.resolve_dead_letter(record['link'])
+            saved += len(pending)
+            pending = []
+            embeddings.sync(index)
+        report(i + 1, len(new_items), f"Analyzed {i + 1} of {len(new_items)}")
+
+    index.save()
+    # Texts compress several times better once a dictionary exists; fresh installs train one here
+    dictionary_id = database.train_text_dictionary()
+    if dictionary_id is not None:
+        print(f"📚 Trained text dictionary {dictionary_id} for the blob store.")
+    retry_note = f" {deferred} failed documents will be retried by a later scan." if deferred else ""
+    unchanged_note = f" {unchanged} unchanged documents skipped." if unchanged else ""
+    report(len(new_items), len(new_items), f"Saved {saved} regulations.{unchanged_note}{retry_note}")
+    return saved
@@ -0,0 +1,131 @@
+"""
+Background scan worker, decoupled from the Streamlit request cycle.
+
+The dashboard only queues scan jobs; this process claims them and runs the
+crawl -> PDF -> LLM -> save pipeline, writing progress back to scan_jobs.
+
+    python worker.py enqueue                 # queue a scan (no-op if one is pending)
+    python worker.py run-once                # run the next queued scan, then exit
+    python worker.py daemon --every 360      # serve dashboard jobs + scan every 6 hours
+
+The daemon also writes a compressed archive snapshot (exporter.snapshot)
+once a day for downstream BI tools.
+"""
+import argparse
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+
+import database
+import exporter
+import metrics
+
+# --- CONFIGURATION ---
+POLL_SECONDS = 5
+SCHEDULE_MINUTES = 6 * 60
+SNAPSHOT_MINUTES = 24 * 60
+HEARTBEAT_SECONDS = 60   # well inside database.STALE_JOB_SECONDS
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+def _heartbeat(job_id, stop):
+    # Progress callbacks can be minutes apart (LLM backoff, a slow PDF);
+    # the job must not look dead to another worker meanwhile
+    while not stop.wait(HEARTBEAT_SECONDS):
+        try:
+            database.touch_job(job_id)
+        except Exception as e:
+            print(f"⚠️ Could not refresh the heartbeat of job #{job_id}: {e}")
+
+def run_job(job_id):
+    """
+    Runs one claimed job to completion and records the outcome.
+    """
+    import pipeline   # heavy imports (pdfplumber, groq) only in the worker
+
+    print(f"🐶 Worker {WORKER_ID}: running scan job #{job_id}")
+    metrics.reset()
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job_id, stop), daemon=True)
+    heartbeat.start()
+    try:
+        with metrics.span("scan"):
+            saved = pipeline.run_scan(
+                lambda done, total, message: database.update_job_progress(job_id, done, total, message))
+        database.finish_job(job_id, "done", f"✅ Saved {saved} regulations." if saved else "✅ System is up to date.")
+    except Exception as e:
+        print(f"❌ Scan job #{job_id} failed: {e}")
+        database.finish_job(job_id, "failed", f"❌ {type(e).__name__}: {e}")
+    finally:
+        stop.set()
+        heartbeat.join()
+        try:
+            metrics.export(job_id)
+        except Exception as e:
+            print(f"⚠️ Could not export scan metrics: {e}")
+
+def run_once():
+    job_id = database.claim_next_job(WORKER_ID)
+    if job_id is None:
+        print("Nothing to do (no queued job, or another worker holds the scan).")
+        return False
+    run_job(job_id)
+    return True
+
+def _schedule_due(every_minutes):
+    last = database.get_latest_job(requested_by="schedule")
+    if not last:
+        return True
+    last_at = datetime.strptime(last["requested_at"], "%Y-%m-%d %H:%M:%S")
+    return datetime.now() - last_at >= timedelta(minutes=every_minutes)
+
+def _snapshot_due(every_minutes):
+    snapshots = exporter.list_snapshots()
+    return not snapshots or time.time() - os.path.getmtime(snapshots[-1]) >= every_minutes * 60
+
+def take_snapshot():
+    try:
+        path, rows = exporter.snapshot()
+        print(f"📦 Snapshot of {rows} regulations written to {path}")
+    except Exception as e:
+        print(f"⚠️ Could not write the archive snapshot: {e}")
+
+def daemon(every_minutes, snapshot_minutes=SNAPSHOT_MINUTES):
+    print(f"🐶 Worker {WORKER_ID}: polling every {POLL_SECONDS}s, scheduled scan every {every_minutes} min")
+    while True:
+        if every_minutes and _schedule_due(every_minutes):
+            database.enqueue_scan_job("schedule")
+        if not run_once():
+            # Idle: a good moment for the (bounded-memory) archive snapshot
+            if snapshot_minutes and _snapshot_due(snapshot_minutes):
+                take_snapshot()
+            time.sleep(POLL_SECONDS)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("enqueue", help="queue a scan job")
+    sub.add_parser("run-once", help="run the next queued job and exit")
+    daemon_parser = sub.add_parser("daemon", help="run jobs forever, with a periodic scan")
+    daemon_parser.add_argument("--every", type=int, default=SCHEDULE_MINUTES,
+                               help="minutes between scheduled scans (0 = only dashboard jobs)")
+    daemon_parser.add_argument("--snapshot-every", type=int, default=SNAPSHOT_MINUTES,
+                               help="minutes between archive snapshots (0 = never)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    database.init_db()
+
+    if args.command == "enqueue":
+        print(f"Queued scan job #{database.enqueue_scan_job('cli')}")
+    elif args.command == "run-once":
+        run_once()
+    else:
+        daemon(args.every, args.snapshot_every)
+
+if __name__ == "__main__":
+    main()